@@ -10,17 +10,14 @@
 # 1. stdlib
 import sys
 import os
-import errno
 import getpass
 import socket
-import shutil
 import subprocess
 import stat
 from zipfile import ZipFile
 from enum import Enum
 import time
 class Enabled(Enum):
-#    trash = True
 #    webview = True
     txtedit = True
     vplay = True
@@ -31,16 +28,15 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import QIcon, QPixmap
 from PyQt5.Qt import QKeySequence, QCursor, QDesktopServices
-# 3. 3rd parties
-try:
-    from send2trash import send2trash
-except ModuleNotFoundError:
-    Enabled.trash = False
-    print("Trash not found", file=sys.stderr)
-else:
-    Enabled.trash = True
-# 4. selfmade
+# 3. selfmade
 import findFilesWindow
+import findEngine
+import fileJobs
+import jobWindow
+import renameWindow
+import trashWindow
+import undoJournal
+import zipArchive
 from plugin import QTextEdit
 from plugin import Qt5Player
 from plugin import QAudioPlayer
@@ -139,6 +135,9 @@ class myWindow(QMainWindow):
         self.copyPath = ""
         self.copyList = []
         self.copyListNew = ""
+        ### a saved search result shown in the list pane instead of a folder
+        self.resultModel = findFilesWindow.ResultModel()
+        self.resultsFile = ""
         path = QDir.rootPath()
 
         # GUI
@@ -157,6 +156,21 @@ class myWindow(QMainWindow):
         wid = QWidget()
         wid.setLayout(hlay)
         self.createStatusBar()
+        self.jobBar = jobWindow.JobBar()
+        self.jobBar.jobFinished.connect(self.jobFinished)
+        try:
+            self.undo = undoJournal.UndoJournal(jobWindow.historyFolder)
+        except OSError as e:
+            ### everything works without undo
+            dprint("no undo journal: %s" % e)
+            self.undo = None
+        ### batch id -> the jobs that take it back
+        self.undoPending = {}
+        self.statusBar().addPermanentWidget(self.jobBar)
+        self.jobDock = jobWindow.JobQueueDock(self.jobBar, self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.jobDock)
+        self.jobDock.setVisible(self.settings.value("jobQueue", "false") == "true")
+        self.trashWindow = None
         self.setCentralWidget(wid)
         self.setGeometry(0, 26, 900, 500)
 
@@ -171,12 +185,14 @@ class myWindow(QMainWindow):
         fileMenu.addAction(self.actionFolderDel)
         fileMenu.addSeparator()
         fileMenu.addAction(self.actionFileOpen)
+        fileMenu.addAction(self.actionOpenResults)
         fileOpenMenu = fileMenu.addMenu('Open...')
         fileOpenMenu.addAction(self.actionOpenText)
         fileOpenMenu.addAction(self.actionOpenTextRoot)
         fileOpenMenu.addAction(self.actionOpenImg)
         fileOpenMenu.addAction(self.actionOpenTerm)
         fileMenu.addAction(self.actionFileRename)
+        fileMenu.addAction(self.actionFilesRename)
         fileMenu.addAction(self.actionFile2Trash)
         fileMenu.addAction(self.actionFileDel)
         fileMenu.addSeparator()
@@ -190,9 +206,13 @@ class myWindow(QMainWindow):
         editMenu.addAction(self.actionFileCut)
         editMenu.addAction(self.actionFileCopy)
         editMenu.addAction(self.actionFilePaste)
+        editMenu.addSeparator()
+        editMenu.addAction(self.actionUndo)
         viewMenu = menuBar.addMenu('&View')
         viewMenu.addAction(self.actionHide)
         viewMenu.addAction(self.actionRefresh)
+        viewMenu.addAction(self.jobDock.toggleViewAction())
+        viewMenu.addAction(self.actionTrash)
         goMenu = menuBar.addMenu('&Navigate')
         goMenu.addAction(self.actionGoBack)
         goMenu.addAction(self.actionGoUp)
@@ -239,7 +259,8 @@ class myWindow(QMainWindow):
 
         # tree panel
         # - model
-        self.dirModel = QFileSystemModel()
+        self.dirModel = jobWindow.JobFileSystemModel()
+        self.dirModel.dropRequested.connect(self.submitJob)
         self.dirModel.setReadOnly(False)
         self.dirModel.setFilter(QDir.NoDotAndDotDot | QDir.AllDirs | QDir.Drives)
         self.dirModel.setRootPath(QDir.rootPath())
@@ -266,16 +287,15 @@ class myWindow(QMainWindow):
         self.treeview.sortByColumn(0, Qt.AscendingOrder)
         # files panel
         # - model
-        self.fileModel = QFileSystemModel()
+        self.fileModel = jobWindow.JobFileSystemModel()
+        self.fileModel.dropRequested.connect(self.submitJob)
         self.fileModel.setReadOnly(False)
         self.fileModel.setFilter(QDir.NoDotAndDotDot | QDir.AllDirs | QDir.Files)
         self.fileModel.setResolveSymlinks(True)
         # - view
         self.listview.setModel(self.fileModel)
         if TREEVIEW:
-            self.listview.header().resizeSection(0, 320)
-            self.listview.header().resizeSection(1, 80)
-            self.listview.header().resizeSection(2, 80)
+            self.resizeListColumns()
             self.listview.setSortingEnabled(True)
             self.listview.doubleClicked.connect(self.list_doubleClicked)
         else:   # QListView
@@ -302,10 +322,71 @@ class myWindow(QMainWindow):
         self.getRowCount()
 
     def closeEvent(self, e):
+        self.jobBar.stopAll()
         dprint("writing settings ...\nGoodbye ...")
         self.writeSettings()
 
     ### utilities
+    def resizeListColumns(self):
+        if TREEVIEW:
+            self.listview.header().resizeSection(0, 320)
+            self.listview.header().resizeSection(1, 80)
+            self.listview.header().resizeSection(2, 80)
+
+    ### the list pane shows a folder or a result list, the actions ask here
+    def inResults(self):
+        return self.listview.model() is self.resultModel
+
+    def listInfo(self, index):
+        if self.inResults():
+            return QFileInfo(self.resultModel.filePath(index.row()))
+        return self.fileModel.fileInfo(index)
+
+    def openResults(self):
+        filename, _ = QFileDialog.getOpenFileName(self, "open search results", QDir.homePath(),
+                                                  "result lists (*.ndjson *.csv);;all files (*)")
+        if not filename:
+            return
+        self.resultModel.clear()
+        try:
+            for batch in findEngine.readResults(filename):
+                if self.resultModel.rowCount() == 0:
+                    self.resultModel.clear(len(batch[0]) > 2)
+                self.resultModel.appendRows(batch)
+        except (OSError, ValueError) as e:
+            self.resultModel.clear()
+            self.infobox("cannot read %s\n%s" % (filename, e))
+            return
+        dprint("opened %s results from %s" % (self.resultModel.rowCount(), filename))
+        self.listview.setModel(self.resultModel)
+        if TREEVIEW:
+            self.listview.header().resizeSection(0, 240)
+            self.listview.header().resizeSection(1, 320)
+        self.resultsFile = filename
+        self.setWindowTitle("results: " + filename)
+        self.statusBar().showMessage("%s results from %s" % (self.resultModel.rowCount(), filename), 0)
+
+    def closeResults(self):
+        if self.inResults():
+            self.listview.setModel(self.fileModel)
+            self.resizeListColumns()
+            self.resultModel.clear()
+            self.resultsFile = ""
+
+    ### the paths in a message box, long lists are cut
+    def pathList(self, paths, maxLines=20):
+        text = '\n'.join(paths[:maxLines])
+        if len(paths) > maxLines:
+            text += "\n... and %s more" % (len(paths) - maxLines)
+        return text
+
+    ### forget the rows of the result list whose file is gone
+    def dropMissingResults(self, paths):
+        gone = set(path for path in paths if not os.path.lexists(path))
+        if gone:
+            rows = [row for row in range(self.resultModel.rowCount()) if self.resultModel.filePath(row) in gone]
+            self.resultModel.dropRows(rows)
+
     def readSettings(self):
         dprint("reading settings ...")
         if self.settings.contains("pos"):
@@ -328,6 +409,7 @@ class myWindow(QMainWindow):
         self.settings.setValue("pos", self.pos())
         self.settings.setValue("size", self.size())
         self.settings.setValue("hiddenEnabled", self.hiddenEnabled, )
+        self.settings.setValue("jobQueue", self.jobDock.isVisible())
 
     def getRowCount(self):
         count = 0
@@ -361,17 +443,21 @@ class myWindow(QMainWindow):
         self.actionFolderPaste = QAction(QIcon.fromTheme("edit-paste"), "Folder paste", triggered=self.pasteFolder)
         # - file
         self.actionFileOpen = QAction(QIcon.fromTheme("system-run"), "open File", triggered=self.openFile)
+        self.actionOpenResults = QAction(QIcon.fromTheme("document-open"), "open search results", triggered=self.openResults)
         self.actionFileRename = QAction(QIcon.fromTheme("accessories-text-editor"), "rename File", triggered=self.renameFile)
+        self.actionFilesRename = QAction(QIcon.fromTheme("accessories-text-editor"), "rename File(s) ...", triggered=self.renameFiles)
         self.actionFileDel = QAction(QIcon.fromTheme("edit-delete"), "delete File(s)", triggered=self.deleteFile)
         self.actionFile2Trash = QAction(QIcon.fromTheme("user-trash"), "move to trash", triggered=self.deleteFileTrash)
         self.actionFileCut = QAction(QIcon.fromTheme("edit-cut"), "cut File(s)", triggered=self.cutFile)
         self.actionFileCopy = QAction(QIcon.fromTheme("edit-copy"), "copy File(s)", triggered=self.copyFile)
         self.actionFilePaste = QAction(QIcon.fromTheme("edit-paste"), "paste File(s) / Folder", triggered=self.pasteFile)
+        self.actionUndo = QAction(QIcon.fromTheme("edit-undo"), "undo", triggered=self.undoLast)
         # misc
         self.actionMkExec = QAction(QIcon.fromTheme("applications-utilities"), "make executable", triggered=self.makeExecutable)
         self.actionHide = QAction("show hidden Files", triggered=self.enableHidden)
         self.actionRefresh = QAction(QIcon.fromTheme("view-refresh"), "refresh View", triggered=self.refreshList, shortcut="F5")
         self.actionFindFiles = QAction(QIcon.fromTheme("edit-find"), "find in folder", triggered=self.findFiles)
+        self.actionTrash = QAction(QIcon.fromTheme("user-trash-full"), "show Trash", triggered=self.showTrash)
         self.actionHelp = QAction(QIcon.fromTheme("help"), "Help", triggered=self.showHelp)
         # open/plugins
         # - folder
@@ -400,9 +486,11 @@ class myWindow(QMainWindow):
         self.actionFolderNewWin.setShortcut(QKeySequence("Ctrl+n"))
         self.actionOpenText.setShortcut(QKeySequence(Qt.Key_F6))
         self.actionFileRename.setShortcut(QKeySequence(Qt.Key_F2))
+        self.actionFilesRename.setShortcut(QKeySequence("Ctrl+F2"))
         self.actionFileCopy.setShortcut(QKeySequence("Ctrl+c"))
         self.actionFileCut.setShortcut(QKeySequence("Ctrl+x"))
         self.actionFilePaste.setShortcut(QKeySequence("Ctrl+v"))
+        self.actionUndo.setShortcut(QKeySequence("Ctrl+z"))
         self.actionFileDel.setShortcut(QKeySequence("Shift+Del"))
         self.actionFile2Trash.setShortcut(QKeySequence("Del"))
         self.actionFindFiles.setShortcut(QKeySequence("Ctrl+f"))
@@ -419,6 +507,7 @@ class myWindow(QMainWindow):
         self.actionFolderNewWin.setShortcutVisibleInContextMenu(True)
         self.actionOpenText.setShortcutVisibleInContextMenu(True)
         self.actionFileRename.setShortcutVisibleInContextMenu(True)
+        self.actionFilesRename.setShortcutVisibleInContextMenu(True)
         self.actionFileCopy.setShortcutVisibleInContextMenu(True)
         self.actionFileCut.setShortcutVisibleInContextMenu(True)
         self.actionFilePaste.setShortcutVisibleInContextMenu(True)
@@ -452,6 +541,7 @@ class myWindow(QMainWindow):
         self.listview.addAction(self.actionOpenText)
         self.listview.addAction(self.actionOpenTextRoot)
         self.listview.addAction(self.actionFileRename)
+        self.listview.addAction(self.actionFilesRename)
         self.listview.addAction(self.actionFileCopy)
         self.listview.addAction(self.actionFileCut)
         self.listview.addAction(self.actionFilePaste)
@@ -503,7 +593,7 @@ class myWindow(QMainWindow):
     def playPlaylist(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             self.player = QAudioPlayer.Player('')
             self.player.setGeometry(100, 100, 500, 350)
             self.player.show()
@@ -514,7 +604,7 @@ class myWindow(QMainWindow):
     def showImage(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             dprint("show image: " + path)
             self.win = QImageViewer.ImageViewer()
             self.win.show()
@@ -525,7 +615,7 @@ class myWindow(QMainWindow):
         if self.listview.selectionModel().hasSelection():
             from plugin import DBViewer
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             dprint("show image: ", path)
             self.db_win = DBViewer.MyWindow()
             self.db_win.show()
@@ -544,7 +634,7 @@ class myWindow(QMainWindow):
     def makeExecutable(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             dprint("set " + path + " executable")
             st = os.stat(path)
             os.chmod(path, st.st_mode | stat.S_IEXEC)
@@ -555,7 +645,7 @@ class myWindow(QMainWindow):
             path = self.dirModel.fileInfo(index).absoluteFilePath()
         elif self.listview.hasFocus():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
         self.terminal = QTerminalFolder.MainWindow()
         self.terminal.show()
         if self.terminal.isVisible():
@@ -568,10 +658,10 @@ class myWindow(QMainWindow):
     def startInTerminal(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            filename = self.fileModel.fileInfo(index).fileName()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
-            folderpath = self.fileModel.fileInfo(index).path()
-            if not self.fileModel.fileInfo(index).isDir():
+            filename = self.listInfo(index).fileName()
+            path = self.listInfo(index).absoluteFilePath()
+            folderpath = self.listInfo(index).path()
+            if not self.listInfo(index).isDir():
                 self.terminal = QTerminalFolder.MainWindow()
                 self.terminal.show()
                 if self.terminal.isVisible():
@@ -600,27 +690,27 @@ class myWindow(QMainWindow):
         target, _ = QFileDialog.getSaveFileName(self, "Save as... (do not add .zip)", path + "/" + fname,
                                                 "zip files (*.zip)")
         if (target != ""):
-            shutil.make_archive(target, 'zip', path)
+            self.submitZip([path], target, path)
 
     def createZipFromFiles(self):
         if self.listview.selectionModel().hasSelection():
             index = self.treeview.selectionModel().currentIndex()
             path = self.dirModel.fileInfo(index).filePath()
-            fname = self.dirModel.fileInfo(index).fileName()
             dprint("folder to zip:" + path)
             self.copyFile()
             target, _ = QFileDialog.getSaveFileName(self, "Save as...", path + "/" + "archive.zip", "zip files (*.zip)")
-            if (target != ""):
-                zipText = ""
-                with ZipFile(target, 'w') as myzip:
-                    for file in self.copyList:
-                        fname = os.path.basename(file)
-                        myzip.write(file, fname)
+            if (target != "") and self.copyList:
+                if self.inResults():
+                    ### files from many folders keep their path below the common folder
+                    base = os.path.commonpath([os.path.dirname(file) for file in self.copyList])
+                else:
+                    base = os.path.dirname(self.copyList[0])
+                self.submitZip(self.copyList, target, base)
 
     def unzipHere(self):
         if self.listview.selectionModel().hasSelection():
             file_index = self.listview.selectionModel().currentIndex()
-            file_path = self.fileModel.fileInfo(file_index).filePath()
+            file_path = self.listInfo(file_index).filePath()
             folder_index = self.treeview.selectionModel().currentIndex()
             folder_path = self.dirModel.fileInfo(folder_index).filePath()
             with ZipFile(file_path, 'r') as zipObj:
@@ -629,7 +719,7 @@ class myWindow(QMainWindow):
 
     def unzipTo(self):
         file_index = self.listview.selectionModel().currentIndex()
-        file_path = self.fileModel.fileInfo(file_index).filePath()
+        file_path = self.listInfo(file_index).filePath()
         dirpath = QFileDialog.getExistingDirectory(self, "selectFolder", QDir.homePath(), QFileDialog.ShowDirsOnly)
         if dirpath:
             with ZipFile(file_path, 'r') as zipObj:
@@ -645,18 +735,27 @@ class myWindow(QMainWindow):
         self.w.folderEdit.setText(path)
         self.w.findEdit.setText(self.findfield.text())
 
+    ### one trash window, read again each time it is shown
+    def showTrash(self):
+        if self.trashWindow is None:
+            self.trashWindow = trashWindow.TrashWindow(self.jobBar)
+        elif not self.trashWindow.isVisible():
+            self.trashWindow.reload()
+        self.trashWindow.show()
+        self.trashWindow.raise_()
+
     def refreshList(self):
         dprint("refreshing view")
         index = self.listview.selectionModel().currentIndex()
-        path = self.fileModel.fileInfo(index).path()
+        path = self.listInfo(index).path()
         self.treeview.setCurrentIndex(self.fileModel.index(path))
         self.treeview.setFocus()
 
     def makeMP3(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).filePath()
-            ext = self.fileModel.fileInfo(index).suffix()
+            path = self.listInfo(index).filePath()
+            ext = self.listInfo(index).suffix()
             newpath = path.replace("." + ext, ".mp3")
             dprint(ext)
             self.statusBar().showMessage("%s '%s'" % ("converting:", path))
@@ -707,6 +806,7 @@ class myWindow(QMainWindow):
         return size
 
     def on_selectionChanged(self):
+        self.closeResults()
         self.treeview.selectionModel().clearSelection()
         index = self.treeview.selectionModel().currentIndex()
         path = self.dirModel.fileInfo(index).absoluteFilePath()
@@ -718,7 +818,7 @@ class myWindow(QMainWindow):
     def openFile(self):
         if self.listview.hasFocus():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             self.copyFile()
             for files in self.copyList:
                 dprint("%s '%s'" % ("open file", files))
@@ -730,7 +830,7 @@ class myWindow(QMainWindow):
     def openFileText(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             self.texteditor = QTextEdit.MainWindow()
             self.texteditor.show()
             self.texteditor.loadFile(path)
@@ -738,7 +838,7 @@ class myWindow(QMainWindow):
     def openFileTextRoot(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             file = sys.argv[0]
             mygksu = os.path.join(os.path.dirname(file), "mygksu")
             self.process.startDetached(mygksu, ["xed", path])
@@ -746,7 +846,7 @@ class myWindow(QMainWindow):
     def playInternal(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).filePath()
+            path = self.listInfo(index).filePath()
             self.statusBar().showMessage("%s '%s'" % ("file:", path))
             self.player = Qt5Player.VideoPlayer('')
             self.player.show()
@@ -756,7 +856,7 @@ class myWindow(QMainWindow):
     def playMedia(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).filePath()
+            path = self.listInfo(index).filePath()
             self.statusBar().showMessage("%s '%s'" % ("file:", path))
             self.process.startDetached("cvlc", [path])
             dprint("%s '%s'" % ("playing with vlc:", path))
@@ -767,16 +867,16 @@ class myWindow(QMainWindow):
             return
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             self.webview = QWebViewer.MainWindow()
             self.webview.show()
             self.webview.load_url(path)
 
     def list_doubleClicked(self):
         index = self.listview.selectionModel().currentIndex()
-        path = self.fileModel.fileInfo(index).absoluteFilePath()
-        #        folderpath = self.fileModel.fileInfo(index).path()
-        if not self.fileModel.fileInfo(index).isDir():
+        path = self.listInfo(index).absoluteFilePath()
+        #        folderpath = self.listInfo(index).path()
+        if not self.listInfo(index).isDir():
             if self.checkIsApplication(path) == True:
                 self.process.startDetached(path)
             else:
@@ -789,7 +889,7 @@ class myWindow(QMainWindow):
 
     def goBack(self):
         index = self.listview.selectionModel().currentIndex()
-        path = self.fileModel.fileInfo(index).path()
+        path = self.listInfo(index).path()
         self.treeview.setCurrentIndex(self.dirModel.index(path))
 
     def goUp(self):
@@ -830,7 +930,7 @@ class myWindow(QMainWindow):
 
     def contextMenuEvent(self, event):
         index = self.listview.selectionModel().currentIndex()
-        path = self.fileModel.fileInfo(index).absoluteFilePath()
+        path = self.listInfo(index).absoluteFilePath()
         self.menu = QMenu(self.listview)
         if self.listview.hasFocus():
             self.menu.addAction(self.actionFolderNew)
@@ -842,6 +942,7 @@ class myWindow(QMainWindow):
                 self.menu.addAction(self.actionFolderNewWin)
             self.menu.addSeparator()
             self.menu.addAction(self.actionFileRename)
+            self.menu.addAction(self.actionFilesRename)
             self.menu.addSeparator()
             self.menu.addAction(self.actionFileCopy)
             self.menu.addAction(self.actionFileCut)
@@ -927,38 +1028,59 @@ class myWindow(QMainWindow):
         foldername, ok = dlg.getText(self, 'Folder Name', "Folder Name:", QLineEdit.Normal, "", Qt.Dialog)
         if ok:
             success = QDir(path).mkdir(foldername)
+            if success:
+                self.recordUndo("mkdir", [path + "/" + foldername])
 
     def runPy2(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             self.process.startDetached("python", [path])
 
     def runPy3(self):
         if self.listview.selectionModel().hasSelection():
             index = self.listview.selectionModel().currentIndex()
-            path = self.fileModel.fileInfo(index).absoluteFilePath()
+            path = self.listInfo(index).absoluteFilePath()
             error = QProcess.error(self.process)
             self.process.startDetached("python3", [path])
             if self.process.errorOccurred():
                 self.infobox(error)
 
     def renameFile(self):
-        if self.listview.hasFocus():
+        if self.listview.hasFocus() and len(self.listview.selectionModel().selectedRows()) > 1:
+            self.renameFiles()
+        elif self.listview.hasFocus():
             if self.listview.selectionModel().hasSelection():
                 index = self.listview.selectionModel().currentIndex()
-                path = self.fileModel.fileInfo(index).absoluteFilePath()
-                basepath = self.fileModel.fileInfo(index).path()
+                path = self.listInfo(index).absoluteFilePath()
+                basepath = self.listInfo(index).path()
                 dprint(basepath)
-                oldName = self.fileModel.fileInfo(index).fileName()
+                oldName = self.listInfo(index).fileName()
                 dlg = QInputDialog()
                 newName, ok = dlg.getText(self, 'new Name:', path, QLineEdit.Normal, oldName, Qt.Dialog)
                 if ok:
                     newpath = basepath + "/" + newName
-                    QFile.rename(path, newpath)
+                    if QFile.rename(path, newpath):
+                        self.recordUndo("rename", [(path, newpath)])
         elif self.treeview.hasFocus():
             self.renameFolder()
 
+    ### several files at once with a preview, see renameWindow
+    def renameFiles(self):
+        paths = self.selectedPaths()
+        if not paths:
+            return
+        dlg = renameWindow.RenameDialog(paths, self, self.undo, self.undoPending)
+        accepted = dlg.exec_() == QDialog.Accepted
+        if dlg.undone and self.inResults():
+            self.resultModel.renamePaths(dict((new, old) for old, new in dlg.undone))
+        if accepted:
+            self.recordUndo("rename", dlg.moves)
+            if self.inResults():
+                self.resultModel.renamePaths(dict(dlg.moves))
+            dprint("renamed %s files" % len(dlg.moves))
+            self.statusBar().showMessage("renamed %s files" % len(dlg.moves), 0)
+
     def renameFolder(self):
         index = self.treeview.selectionModel().currentIndex()
         path = self.dirModel.fileInfo(index).absoluteFilePath()
@@ -972,17 +1094,30 @@ class myWindow(QMainWindow):
             dprint(newpath)
             nd = QDir(path)
             check = nd.rename(path, newpath)
+            if check:
+                self.recordUndo("rename", [(path, newpath)])
 
-    def copyFile(self):
-        self.copyList = []
+    ### the selected files of the list pane, each once
+    def selectedPaths(self):
+        paths = []
         selected = self.listview.selectionModel().selectedRows()
-        count = len(selected)
-        for index in selected:
-            path = self.currentPath + "/" + self.fileModel.data(index, self.fileModel.FileNameRole)
-            dprint(path + " copied to clipboard")
-            self.copyList.append(path)
-            self.clip.setText('\n'.join(self.copyList))
-        dprint("%s\n%s" % ("filepath(s) copied:", '\n'.join(self.copyList)))
+        if self.inResults():
+            ### content hits can name the same file several times
+            seen = set()
+            for index in selected:
+                path = self.resultModel.filePath(index.row())
+                if not path in seen:
+                    seen.add(path)
+                    paths.append(path)
+        else:
+            for index in selected:
+                paths.append(self.currentPath + "/" + self.fileModel.data(index, self.fileModel.FileNameRole))
+        return paths
+
+    def copyFile(self):
+        self.copyList = self.selectedPaths()
+        self.clip.setText('\n'.join(self.copyList))
+        dprint("%s\n%s" % ("filepath(s) copied:", self.pathList(self.copyList)))
 
     def copyFolder(self):
         index = self.treeview.selectionModel().currentIndex()
@@ -993,43 +1128,147 @@ class myWindow(QMainWindow):
 
     def pasteFolder(self):
         index = self.treeview.selectionModel().currentIndex()
-        target = self.folder_copied
-        destination = self.dirModel.fileInfo(index).absoluteFilePath() + "/" + QFileInfo(self.folder_copied).fileName()
-        dprint("%s %s %s" % (target, "will be pasted to", destination))
-        try:
-            shutil.copytree(target, destination)
-        except OSError as e:
-            # If the error was caused because the source wasn't a directory
-            if e.errno == errno.ENOTDIR:
-                shutil.copy(target, destination)
-            else:
-                self.infobox('Error', 'Directory not copied. Error: %s' % e)
+        destination = self.dirModel.fileInfo(index).absoluteFilePath()
+        if self.folder_copied:
+            dprint("%s %s %s" % (self.folder_copied, "will be pasted to", destination))
+            self.submitJob([self.folder_copied], destination)
 
     def pasteFile(self):
+        index = self.treeview.selectionModel().currentIndex()
+        destination = self.dirModel.fileInfo(index).absoluteFilePath()
         if len(self.copyList) > 0:
-            index = self.treeview.selectionModel().currentIndex()
-            file_index = self.listview.selectionModel().currentIndex()
-            for target in self.copyList:
-                dprint(target)
-                destination = self.dirModel.fileInfo(index).absoluteFilePath() + "/" + QFileInfo(target).fileName()
-                dprint("%s %s" % ("pasted File to", destination))
-                QFile.copy(target, destination)
-                if self.cut == True:
-                    QFile.remove(target)
-                self.cut == False
+            dprint("%s %s" % ("pasting File(s) to", destination))
+            self.submitJob(self.copyList, destination, self.cut)
+            if self.cut == True:
+                self.copyList = []
+            self.cut = False
+        elif self.folder_copied:
+            self.submitJob([self.folder_copied], destination)
+
+    ### copies run on a worker thread, the job bar in the status bar shows them
+    def submitJob(self, sources, destination, move=False):
+        job = fileJobs.Job(sources, destination, move, journalFolder=jobWindow.journalFolder,
+                           verify=self.jobBar.verify())
+        dprint(job.title())
+        self.jobBar.submit(job)
+
+    ### every copy, move, rename, new folder and trashing goes into the undo journal
+    def recordUndo(self, kind, steps):
+        if self.undo is None:
+            return
+        try:
+            self.undo.record(kind, steps)
+        except OSError as e:
+            dprint("not journaled: %s" % e)
+
+    def markUndone(self, batchId):
+        try:
+            self.undo.markUndone(batchId)
+        except OSError as e:
+            dprint("not journaled: %s" % e)
+
+    ### the undo jobs of a batch are done, it is undone if none failed or skipped something
+    def undoFinished(self, job):
+        for batchId, jobs in list(self.undoPending.items()):
+            if job in jobs and all(other.finished is not None for other in jobs):
+                del self.undoPending[batchId]
+                if all(other.state == "done" and not other.skipped for other in jobs):
+                    self.markUndone(batchId)
+
+    ### Ctrl+Z takes back the last batch, the big ones through the job bar.
+    ### the batch is marked undone when all of it went back, until then it stays
+    def undoLast(self):
+        batch = self.undo.last(self.undoPending) if self.undo is not None else None
+        if batch is None:
+            self.statusBar().showMessage("nothing to undo", 0)
+            return
+        batchId, kind, steps = batch
+        message = "undo %s" % undoJournal.describe(kind, steps)
+        dprint(message)
+        self.statusBar().showMessage(message, 0)
+        jobs = undoJournal.undoJobs(kind, steps)
+        if jobs:
+            self.undoPending[batchId] = jobs
+        for job in jobs:
+            self.jobBar.submit(job)
+        failed = undoJournal.undoNow(kind, steps)
+        if not jobs and not failed:
+            self.markUndone(batchId)
+        if kind == "rename" and not failed and self.inResults():
+            self.resultModel.renamePaths(dict((new, old) for old, new in steps))
+        if failed:
+            self.infobox("%s errors\n%s" % (len(failed), self.pathList(["%s: %s" % error for error in failed])))
+        if kind == "copy":
+            kept = undoJournal.keptCopies(steps)
+            if kept:
+                self.infobox("changed since the copy, left alone:\n%s" % self.pathList(kept))
+
+    ### the archive is written by a job, deflated on all cores
+    def submitZip(self, sources, target, base):
+        if not target.endswith(".zip"):
+            target += ".zip"
+        job = zipArchive.ZipJob(sources, target, base)
+        dprint(job.title())
+        self.statusBar().showMessage(job.title(), 0)
+        self.jobBar.submit(job)
+
+    ### a worker deletes, big trees do not block the window
+    def submitDelete(self, paths):
+        job = fileJobs.DeleteJob(paths)
+        dprint(job.title())
+        self.statusBar().showMessage(job.title(), 0)
+        self.jobBar.submit(job)
+
+    ### the trash is on the same filesystem almost always, a rename per item
+    def submitTrash(self, paths):
+        job = fileJobs.TrashJob(paths)
+        dprint(job.title())
+        self.statusBar().showMessage(job.title(), 0)
+        self.jobBar.submit(job)
+
+    def jobFinished(self, job):
+        what = "moved" if job.move else "copied"
+        if job.undoing:
+            self.undoFinished(job)
+        steps = job.undoSteps() if job.kind in ("copy", "move") else []
+        if job.kind in ("copy", "move") and not job.undoing:
+            self.recordUndo(job.kind, steps)
+        elif job.kind == "trash" and not job.undoing:
+            self.recordUndo("trash", job.trashed)
+        if job.kind == "move" and self.inResults():
+            ### the rows follow the files that were moved, the ones that are gone otherwise are dropped
+            self.resultModel.renamePaths(dict(steps))
+            self.dropMissingResults(job.sources)
+        elif job.kind in ("delete", "trash") and self.inResults():
+            self.dropMissingResults(job.sources)
+        if job.state == "cancelled":
+            message = "%s: cancelled after %s files" % (job.title(), job.doneFiles)
+        elif job.kind == "delete":
+            message = "deleted %s files and folders" % (job.doneFiles - len(job.errors))
+        elif job.kind == "trash":
+            message = "moved %s items to the trash" % len(job.trashed)
+        elif job.kind == "restore":
+            message = "restored %s items from the trash" % len(job.restored)
+        elif job.kind == "purge":
+            message = "deleted %s items from the trash for good" % job.purged
+        elif job.kind == "zip":
+            message = "zipped %s files and folders (%s into %s, %s/s) to %s" % (
+                      job.doneFiles, fileJobs.formatSize(job.doneBytes), fileJobs.formatSize(job.outputBytes),
+                      fileJobs.formatSize(job.averageRate()), job.target)
         else:
-            index = self.treeview.selectionModel().currentIndex()
-            target = self.folder_copied
-            destination = self.dirModel.fileInfo(index).absoluteFilePath() + "/" + QFileInfo(
-                self.folder_copied).fileName()
-            try:
-                shutil.copytree(target, destination)
-            except OSError as e:
-                # If the error was caused because the source wasn't a directory
-                if e.errno == errno.ENOTDIR:
-                    shutil.copy(target, destination)
-                else:
-                    dprint('Directory not copied. Error: %s' % e)
+            message = "%s %s files (%s, %s/s) to %s" % (what, job.doneFiles, job.sizeText(),
+                                                       fileJobs.formatSize(job.averageRate()), job.destination)
+            if job.resumed:
+                message += ", %s already done before" % job.resumed
+            if job.skipped:
+                message += ", %s skipped" % job.skipped
+            if job.verify:
+                message += ", %s verified" % (len(job.report) - len(job.mismatches()))
+        dprint(message)
+        self.statusBar().showMessage(message, 0)
+        if job.errors:
+            errors = ["%s: %s" % error for error in job.errors]
+            self.infobox("%s errors\n%s" % (len(errors), self.pathList(errors)))
 
     def cutFile(self):
         self.cut = True
@@ -1042,45 +1281,28 @@ class myWindow(QMainWindow):
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
         if msg == QMessageBox.Yes:
             dprint('Deletion confirmed.')
-            self.statusBar().showMessage("%s %s" % ("folder deleted", delFolder), 0)
-            self.fileModel.remove(index)
-            dprint("%s %s" % ("folder deleted", delFolder))
+            self.submitDelete([delFolder])
         else:
             dprint('No clicked.')
 
     def deleteFile(self):
         self.copyFile()
-        msg = QMessageBox.question(self, "Info", "Caution!\nReally delete this Files?\n" + '\n'.join(self.copyList),
+        msg = QMessageBox.question(self, "Info", "Caution!\nReally delete this Files?\n" + self.pathList(self.copyList),
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
         if msg == QMessageBox.Yes:
             dprint('Deletion confirmed.')
-            index = self.listview.selectionModel().currentIndex()
-            self.copyPath = self.fileModel.fileInfo(index).absoluteFilePath()
-            dprint("%s %s" % ("file deleted", self.copyPath))
-            self.statusBar().showMessage("%s %s" % ("file deleted", self.copyPath), 0)
-            for delFile in self.listview.selectionModel().selectedIndexes():
-                self.fileModel.remove(delFile)
+            self.submitDelete(self.copyList)
         else:
             dprint('No clicked.')
 
     def deleteFileTrash(self):
-        if not Enabled.trash:
-            QMessageBox.warning(self, "Module disabled", "Send2Trash not installed")
-            return
-        index = self.listview.selectionModel().currentIndex()
         self.copyFile()
         msg = QMessageBox.question(self, "Info",
-                                   "Caution!\nReally move this Files to Trash\n" + '\n'.join(self.copyList),
+                                   "Caution!\nReally move this Files to Trash\n" + self.pathList(self.copyList),
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
         if msg == QMessageBox.Yes:
             dprint('Deletion confirmed.')
-            for delFile in self.copyList:
-                try:
-                    send2trash(delFile)
-                except OSError as e:
-                    self.infobox(str(e))
-                dprint("%s %s" % ("file moved to trash:", delFile))
-                self.statusBar().showMessage("%s %s" % ("file moved to trash:", delFile), 0)
+            self.submitTrash(self.copyList)
         else:
             dprint('No clicked.')
 
@@ -9,7 +9,6 @@
 ############################################
 import sys
 import os
-import errno
 import getpass
 import socket
 import time
@@ -18,6 +17,12 @@ from PyQt5.QtCore import *
 from PyQt5.QtGui import (QIcon, QPixmap)
 from PyQt5.Qt import (QKeySequence, QCursor, QDesktopServices)
 import findFilesWindow
+import fileJobs
+import jobWindow
+import renameWindow
+import trashWindow
+import undoJournal
+import zipArchive
 import QTextEdit
 import Qt5Player
 import QAudioPlayer
@@ -25,10 +30,8 @@ import QImageViewer
 import QWebViewer
 import QTerminalFolder
 from zipfile import ZipFile
-import shutil
 import subprocess
 import stat
-from send2trash import send2trash
 
 home = QStandardPaths.standardLocations(QStandardPaths.HomeLocation)[0]
 username = home.rpartition("/")[-1]
@@ -139,7 +142,21 @@ class myWindow(QMainWindow):
         self.progress_bar.setFixedHeight(18)
         self.progress_bar.setFixedWidth(200)
         self.progress_bar.setMaximum(100)
-        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.jobBar = jobWindow.JobBar(self.progress_bar)
+        self.jobBar.jobFinished.connect(self.jobFinished)
+        try:
+            self.undo = undoJournal.UndoJournal(jobWindow.historyFolder)
+        except OSError as e:
+            ### everything works without undo
+            print("no undo journal:", e)
+            self.undo = None
+        ### batch id -> the jobs that take it back
+        self.undoPending = {}
+        self.statusBar().addPermanentWidget(self.jobBar)
+        self.jobDock = jobWindow.JobQueueDock(self.jobBar, self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.jobDock)
+        self.jobDock.setVisible(self.settings.value("jobQueue", "false") == "true")
+        self.trashWindow = None
 
         self.setCentralWidget(wid)
         self.setGeometry(0, 26, 900,500)
@@ -168,11 +185,15 @@ class myWindow(QMainWindow):
         self.tBar.addAction(self.copyAction)
         self.tBar.addAction(self.cutAction)
         self.tBar.addAction(self.pasteAction)
+        self.tBar.addAction(self.undoAction)
         self.tBar.addSeparator()
         self.tBar.addAction(self.delActionTrash)
         self.tBar.addAction(self.delAction)
         self.tBar.addSeparator()
         self.tBar.addAction(self.terminalAction)
+        self.jobDock.toggleViewAction().setIcon(QIcon.fromTheme("view-list-details"))
+        self.tBar.addAction(self.jobDock.toggleViewAction())
+        self.tBar.addAction(self.trashAction)
         self.tBar.addSeparator()
         self.tBar.addAction(self.helpAction)
         empty = QWidget()
@@ -201,13 +222,15 @@ class myWindow(QMainWindow):
         self.tBar.addWidget(self.findfield)
         self.tBar.addAction(self.findFilesAction)
 
-        self.dirModel = QFileSystemModel()
+        self.dirModel = jobWindow.JobFileSystemModel()
+        self.dirModel.dropRequested.connect(self.submitJob)
         self.dirModel.setReadOnly(False)
         self.dirModel.setFilter(QDir.NoDotAndDotDot | QDir.AllDirs  | QDir.Files)
         self.dirModel.setRootPath(QDir.rootPath())
         self.dirModel.setResolveSymlinks(True)
 
-        self.fileModel = QFileSystemModel()
+        self.fileModel = jobWindow.JobFileSystemModel()
+        self.fileModel.dropRequested.connect(self.submitJob)
         self.fileModel.setReadOnly(False)
         self.fileModel.setFilter(QDir.NoDotAndDotDot | QDir.AllDirs  | QDir.Files)
         self.fileModel.setRootPath(QDir.rootPath())
@@ -344,6 +367,7 @@ class myWindow(QMainWindow):
         return count
 
     def closeEvent(self, e):
+        self.jobBar.stopAll()
         print("writing settings ...\nGoodbye ...")
         self.writeSettings()
 
@@ -371,6 +395,7 @@ class myWindow(QMainWindow):
         self.settings.setValue("pos", self.pos())
         self.settings.setValue("size", self.size())
         self.settings.setValue("hiddenEnabled", self.hiddenEnabled,)
+        self.settings.setValue("jobQueue", self.jobDock.isVisible())
 
     def enableHidden(self):
         if self.hiddenEnabled == False:
@@ -435,6 +460,12 @@ class myWindow(QMainWindow):
         self.listview.addAction(self.renameAction) 
         self.treeview.addAction(self.renameAction) 
 
+        self.renameFilesAction = QAction(QIcon.fromTheme("accessories-text-editor"), "rename File(s) ...",  triggered=self.renameFiles) 
+        self.renameFilesAction.setShortcut(QKeySequence("Ctrl+F2"))
+        self.renameFilesAction.setShortcutVisibleInContextMenu(True)
+        self.listview.addAction(self.renameFilesAction) 
+        self.treeview.addAction(self.renameFilesAction) 
+
         self.renameFolderAction = QAction(QIcon.fromTheme("accessories-text-editor"), "rename Folder",  triggered=self.renameFolder) 
         self.treeview.addAction(self.renameFolderAction) 
 
@@ -453,6 +484,11 @@ class myWindow(QMainWindow):
         self.pasteAction.setShortcutVisibleInContextMenu(True)
         self.listview.addAction(self.pasteAction) 
 
+        self.undoAction = QAction(QIcon.fromTheme("edit-undo"), "undo",  triggered=self.undoLast)
+        self.undoAction.setShortcut(QKeySequence("Ctrl+z"))
+        self.listview.addAction(self.undoAction)
+        self.treeview.addAction(self.undoAction)
+
         self.delAction = QAction(QIcon.fromTheme("edit-delete"), "delete File(s)",  triggered=self.deleteFile)
         self.delAction.setShortcut(QKeySequence("Shift+Del"))
         self.delAction.setShortcutVisibleInContextMenu(True)
@@ -536,6 +572,7 @@ class myWindow(QMainWindow):
         self.listview.addAction(self.helpAction) 
 
         self.terminalAction = QAction(QIcon.fromTheme("terminal"), "open folder in Terminal",  triggered=self.showInTerminal)
+        self.trashAction = QAction(QIcon.fromTheme("user-trash-full"), "show Trash",  triggered=self.showTrash)
         self.terminalAction.setShortcut(QKeySequence(Qt.Key_F7))
         self.terminalAction.setShortcutVisibleInContextMenu(True)
         self.treeview.addAction(self.terminalAction) 
@@ -733,7 +770,7 @@ class myWindow(QMainWindow):
                 self.copyFile()
                 target, _ = QFileDialog.getSaveFileName(self, "Save as... (do not add .zip)", path + "/" + fname,"zip files (*.zip)")
                 if (target != ""):
-                    shutil.make_archive(target, 'zip', path)
+                    self.submitZip([path], target, path)
         elif self.treeview.hasFocus():
             if self.treeview.selectionModel().hasSelection():
                 index = self.listview.selectionModel().currentIndex()
@@ -743,37 +780,27 @@ class myWindow(QMainWindow):
                 self.copyFile()
                 target, _ = QFileDialog.getSaveFileName(self, "Save as... (do not add .zip)", path + "/" + fname,"zip files (*.zip)")
                 if (target != ""):
-                    shutil.make_archive(target, 'zip', path)
+                    self.submitZip([path], target, path)
 
     def createZipFromFiles(self):
         if self.listview.hasFocus():
             if self.listview.selectionModel().hasSelection():
                 index = self.listview.selectionModel().currentIndex()
                 path = self.fileModel.fileInfo(index).path()
-                fname = self.fileModel.fileInfo(index).fileName()
                 print("folder to zip:", path)
                 self.copyFile()
                 target, _ = QFileDialog.getSaveFileName(self, "Save as...", path + "/" + "archive.zip","zip files (*.zip)")
-                if (target != ""):
-                    zipText = ""
-                    with ZipFile(target, 'w') as myzip:
-                        for file in self.copyList:
-                            fname = os.path.basename(file)
-                            myzip.write(file, fname)
+                if (target != "") and self.copyList:
+                    self.submitZip(self.copyList, target, os.path.dirname(self.copyList[0]))
         elif self.treeview.hasFocus():
             if self.treeview.selectionModel().hasSelection():
                 index = self.treeview.selectionModel().currentIndex()
                 path = self.dirModel.fileInfo(index).path()
-                fname = self.dirModel.fileInfo(index).fileName()
                 print("folder to zip:", path)
                 self.copyFile()
                 target, _ = QFileDialog.getSaveFileName(self, "Save as...", path + "/" + "archive.zip","zip files (*.zip)")
-                if (target != ""):
-                    zipText = ""
-                    with ZipFile(target, 'w') as myzip:
-                        for file in self.copyList:
-                            fname = os.path.basename(file)
-                            myzip.write(file, fname)
+                if (target != "") and self.copyList:
+                    self.submitZip(self.copyList, target, os.path.dirname(self.copyList[0]))
 
     def unzipHere(self):
         if self.listview.hasFocus():
@@ -814,6 +841,15 @@ class myWindow(QMainWindow):
                     with ZipFile(file_path, 'r') as zipObj:
                        zipObj.extractall(dirpath + "/" + os.path.basename(file_path).replace(ext[1], ""))
 
+    ### one trash window, read again each time it is shown
+    def showTrash(self):
+        if self.trashWindow is None:
+            self.trashWindow = trashWindow.TrashWindow(self.jobBar)
+        elif not self.trashWindow.isVisible():
+            self.trashWindow.reload()
+        self.trashWindow.show()
+        self.trashWindow.raise_()
+
     def findFiles(self):
         path = self.windowTitle()
         print("open findWindow")
@@ -1121,6 +1157,7 @@ class myWindow(QMainWindow):
                     self.menu.addAction(self.newWinAction) 
                 self.menu.addSeparator()
                 self.menu.addAction(self.renameAction) 
+                self.menu.addAction(self.renameFilesAction) 
                 self.menu.addSeparator()
                 self.menu.addAction(self.copyAction) 
                 self.menu.addAction(self.cutAction) 
@@ -1199,6 +1236,7 @@ class myWindow(QMainWindow):
                     self.menu.addAction(self.newWinAction) 
                 self.menu.addSeparator()
                 self.menu.addAction(self.renameAction) 
+                self.menu.addAction(self.renameFilesAction) 
                 self.menu.addSeparator()
                 self.menu.addAction(self.copyAction) 
                 self.menu.addAction(self.cutAction) 
@@ -1263,6 +1301,8 @@ class myWindow(QMainWindow):
         foldername, ok = dlg.getText(self, 'Folder Name', "Folder Name:", QLineEdit.Normal, "", Qt.Dialog)
         if ok:
             success = QDir(path).mkdir(foldername)
+            if success:
+                self.recordUndo("mkdir", [path + "/" + foldername])
 
     def runPy2(self):
         if self.listview.hasFocus():
@@ -1289,7 +1329,9 @@ class myWindow(QMainWindow):
                 self.process.startDetached("python3", [path])
 
     def renameFile(self):
-        if self.listview.hasFocus():
+        if len(self.selectedPaths()) > 1:
+            self.renameFiles()
+        elif self.listview.hasFocus():
             if self.listview.selectionModel().hasSelection():
                 index = self.listview.selectionModel().currentIndex()
                 path = self.fileModel.fileInfo(index).absoluteFilePath() 
@@ -1299,7 +1341,8 @@ class myWindow(QMainWindow):
                 newName, ok = dlg.getText(self, 'new Name:', path, QLineEdit.Normal, oldName, Qt.Dialog)
                 if ok:
                     newpath = basepath + "/" + newName
-                    QFile.rename(path, newpath)
+                    if QFile.rename(path, newpath):
+                        self.recordUndo("rename", [(path, newpath)])
         elif self.treeview.hasFocus():
             if self.treeview.selectionModel().hasSelection():
                 index = self.treeview.selectionModel().currentIndex()
@@ -1311,7 +1354,8 @@ class myWindow(QMainWindow):
                 newName, ok = dlg.getText(self, 'new Name:', path, QLineEdit.Normal, oldName, Qt.Dialog)
                 if ok:
                     newpath = basepath + "/" + newName
-                    QFile.rename(path, newpath)
+                    if QFile.rename(path, newpath):
+                        self.recordUndo("rename", [(path, newpath)])
 
     def renameFolder(self):
         if self.listview.hasFocus():
@@ -1328,6 +1372,8 @@ class myWindow(QMainWindow):
                     print(newpath)
                     nd = QDir(path)
                     check = nd.rename(path, newpath)
+                    if check:
+                        self.recordUndo("rename", [(path, newpath)])
         elif self.treeview.hasFocus():
             if self.treeview.selectionModel().hasSelection():
                 index = self.treeview.selectionModel().currentIndex()
@@ -1342,6 +1388,27 @@ class myWindow(QMainWindow):
                     print(newpath)
                     nd = QDir(path)
                     check = nd.rename(path, newpath)
+                    if check:
+                        self.recordUndo("rename", [(path, newpath)])
+
+    ### the selected files of the pane with the focus
+    def selectedPaths(self):
+        if self.treeview.hasFocus():
+            view, model = self.treeview, self.dirModel
+        else:
+            view, model = self.listview, self.fileModel
+        return [model.filePath(index) for index in view.selectionModel().selectedRows()]
+
+    ### several files at once with a preview, see renameWindow
+    def renameFiles(self):
+        paths = self.selectedPaths()
+        if not paths:
+            return
+        dlg = renameWindow.RenameDialog(paths, self, self.undo, self.undoPending)
+        if dlg.exec_() == QDialog.Accepted:
+            self.recordUndo("rename", dlg.moves)
+            print("renamed %s files" % len(dlg.moves))
+            self.statusBar().showMessage("renamed %s files" % len(dlg.moves), 0)
 
     def copyFile(self):
         self.copyList = []
@@ -1372,23 +1439,131 @@ class myWindow(QMainWindow):
 
     def pasteFile(self):
         if len(self.copyList) > 0:
-            for target in self.copyList:
-                print(target)
-                destination = self.windowTitle() + "/" + QFileInfo(target).fileName()
-                try:
-                    shutil.copytree(target, destination)
-                    if self.cut == True:
-                        QFile.remove(target)
-                        self.cut == False
-                except OSError as e:
-                    # If the error was caused because the source wasn't a directory
-                    if e.errno == errno.ENOTDIR:
-                        shutil.copy(target, destination)
-                        if self.cut == True:
-                            QFile.remove(target)
-                            self.cut == False
-                    else:
-                        self.infobox('Directory not copied. Error: %s' % e)
+            destination = self.windowTitle()
+            print("pasting", len(self.copyList), "item(s) to", destination)
+            self.submitJob(self.copyList, destination, self.cut)
+            if self.cut == True:
+                self.copyList = []
+            self.cut = False
+
+    ### copies run on a worker thread, progress_bar shows them
+    def submitJob(self, sources, destination, move=False):
+        job = fileJobs.Job(sources, destination, move, journalFolder=jobWindow.journalFolder,
+                           verify=self.jobBar.verify())
+        print(job.title())
+        self.jobBar.submit(job)
+
+    ### every copy, move, rename, new folder and trashing goes into the undo journal
+    def recordUndo(self, kind, steps):
+        if self.undo is None:
+            return
+        try:
+            self.undo.record(kind, steps)
+        except OSError as e:
+            print("not journaled:", e)
+
+    def markUndone(self, batchId):
+        try:
+            self.undo.markUndone(batchId)
+        except OSError as e:
+            print("not journaled:", e)
+
+    ### the undo jobs of a batch are done, it is undone if none failed or skipped something
+    def undoFinished(self, job):
+        for batchId, jobs in list(self.undoPending.items()):
+            if job in jobs and all(other.finished is not None for other in jobs):
+                del self.undoPending[batchId]
+                if all(other.state == "done" and not other.skipped for other in jobs):
+                    self.markUndone(batchId)
+
+    ### Ctrl+Z takes back the last batch, the big ones through the job bar.
+    ### the batch is marked undone when all of it went back, until then it stays
+    def undoLast(self):
+        batch = self.undo.last(self.undoPending) if self.undo is not None else None
+        if batch is None:
+            self.statusBar().showMessage("nothing to undo", 0)
+            return
+        batchId, kind, steps = batch
+        message = "undo %s" % undoJournal.describe(kind, steps)
+        print(message)
+        self.statusBar().showMessage(message, 0)
+        jobs = undoJournal.undoJobs(kind, steps)
+        if jobs:
+            self.undoPending[batchId] = jobs
+        for job in jobs:
+            self.jobBar.submit(job)
+        failed = undoJournal.undoNow(kind, steps)
+        if not jobs and not failed:
+            self.markUndone(batchId)
+        if failed:
+            errors = ["%s: %s" % error for error in failed[:20]]
+            self.infobox("%s errors\n%s" % (len(failed), "\n".join(errors)))
+        if kind == "copy":
+            kept = undoJournal.keptCopies(steps)
+            if kept:
+                self.infobox("changed since the copy, left alone:\n%s" % "\n".join(kept[:20]))
+
+    ### the archive is written by a job, deflated on all cores
+    def submitZip(self, sources, target, base):
+        if not target.endswith(".zip"):
+            target += ".zip"
+        job = zipArchive.ZipJob(sources, target, base)
+        print(job.title())
+        self.statusBar().showMessage(job.title(), 0)
+        self.jobBar.submit(job)
+
+    ### a worker deletes, big trees do not block the window
+    def submitDelete(self, paths):
+        job = fileJobs.DeleteJob(paths)
+        print(job.title())
+        self.statusBar().showMessage(job.title(), 0)
+        self.jobBar.submit(job)
+
+    ### the trash is on the same filesystem almost always, a rename per item
+    def submitTrash(self, paths):
+        job = fileJobs.TrashJob(paths)
+        print(job.title())
+        self.statusBar().showMessage(job.title(), 0)
+        self.jobBar.submit(job)
+
+    def jobFinished(self, job):
+        what = "moved" if job.move else "copied"
+        if job.undoing:
+            self.undoFinished(job)
+        if job.kind in ("copy", "move") and not job.undoing:
+            self.recordUndo(job.kind, job.undoSteps())
+        elif job.kind == "trash" and not job.undoing:
+            self.recordUndo("trash", job.trashed)
+        if job.state == "cancelled":
+            message = "%s: cancelled after %s files" % (job.title(), job.doneFiles)
+        elif job.kind == "delete":
+            message = "deleted %s files and folders" % (job.doneFiles - len(job.errors))
+        elif job.kind == "trash":
+            message = "moved %s items to the trash" % len(job.trashed)
+        elif job.kind == "restore":
+            message = "restored %s items from the trash" % len(job.restored)
+        elif job.kind == "purge":
+            message = "deleted %s items from the trash for good" % job.purged
+        elif job.kind == "zip":
+            message = "zipped %s files and folders (%s into %s, %s/s) to %s" % (
+                      job.doneFiles, fileJobs.formatSize(job.doneBytes), fileJobs.formatSize(job.outputBytes),
+                      fileJobs.formatSize(job.averageRate()), job.target)
+        else:
+            message = "%s %s files (%s, %s/s) to %s" % (what, job.doneFiles, job.sizeText(),
+                                                       fileJobs.formatSize(job.averageRate()), job.destination)
+            if job.resumed:
+                message += ", %s already done before" % job.resumed
+            if job.skipped:
+                message += ", %s skipped" % job.skipped
+            if job.verify:
+                message += ", %s verified" % (len(job.report) - len(job.mismatches()))
+        print(message)
+        self.statusBar().showMessage(message, 0)
+        if job.errors:
+            errors = ["%s: %s" % error for error in job.errors[:20]]
+            if len(job.errors) > 20:
+                errors.append("... and %s more" % (len(job.errors) - 20))
+            self.infobox("%s errors\n%s" % (len(job.errors), "\n".join(errors)))
 
     def cutFile(self):
         self.cut = True
@@ -1397,14 +1572,12 @@ class myWindow(QMainWindow):
     def deleteFolder(self):
         if self.listview.hasFocus():
             if self.listview.selectionModel().hasSelection():
-                index = self.lisview.selectionModel().currentIndex()
+                index = self.listview.selectionModel().currentIndex()
                 delFolder  = self.fileModel.fileInfo(index).absoluteFilePath()
                 msg = QMessageBox.question(self, "Info", "Caution!\nReally delete this Folder?\n" + delFolder, QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
                 if msg == QMessageBox.Yes:
                     print('Deletion confirmed.')
-                    self.statusBar().showMessage("%s %s" % ("folder deleted", delFolder), 0)
-                    self.fileModel.remove(index)
-                    print("%s %s" % ("folder deleted", delFolder))
+                    self.submitDelete([delFolder])
                 else:
                     print('No clicked.')
         elif self.treeview.hasFocus():
@@ -1414,9 +1587,7 @@ class myWindow(QMainWindow):
                 msg = QMessageBox.question(self, "Info", "Caution!\nReally delete this Folder?\n" + delFolder, QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
                 if msg == QMessageBox.Yes:
                     print('Deletion confirmed.')
-                    self.statusBar().showMessage("%s %s" % ("folder deleted", delFolder), 0)
-                    self.dirModel.remove(index)
-                    print("%s %s" % ("folder deleted", delFolder))
+                    self.submitDelete([delFolder])
                 else:
                     print('No clicked.')
         
@@ -1427,12 +1598,7 @@ class myWindow(QMainWindow):
                 msg = QMessageBox.question(self, "Info", "Caution!\nReally delete this Files?\n" + '\n'.join(self.copyList), QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
                 if msg == QMessageBox.Yes:
                     print('Deletion confirmed.')
-                    index = self.listview.selectionModel().currentIndex()
-                    self.copyPath = self.fileModel.fileInfo(index).absoluteFilePath()
-                    print("%s %s" % ("file deleted", self.copyPath))
-                    self.statusBar().showMessage("%s %s" % ("file deleted", self.copyPath), 0)
-                    for delFile in self.listview.selectionModel().selectedIndexes():
-                        self.fileModel.remove(delFile)
+                    self.submitDelete(self.copyList)
                 else:
                     print('No clicked.')
         elif self.treeview.hasFocus():
@@ -1440,46 +1606,27 @@ class myWindow(QMainWindow):
                 msg = QMessageBox.question(self, "Info", "Caution!\nReally delete this Files?\n" + '\n'.join(self.copyList), QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
                 if msg == QMessageBox.Yes:
                     print('Deletion confirmed.')
-                    index = self.treeview.selectionModel().currentIndex()
-                    self.copyPath = self.dirModel.fileInfo(index).absoluteFilePath()
-                    print("%s %s" % ("file deleted", self.copyPath))
-                    self.statusBar().showMessage("%s %s" % ("file deleted", self.copyPath), 0)
-                    for delFile in self.treeview.selectionModel().selectedIndexes():
-                        self.dirModel.remove(delFile)
+                    self.submitDelete(self.copyList)
                 else:
                     print('No clicked.')
 
     def deleteFileTrash(self):
         if self.listview.hasFocus():
             if self.listview.selectionModel().hasSelection():
-                index = self.listview.selectionModel().currentIndex()
                 self.copyFile()
                 msg = QMessageBox.question(self, "Info", "Caution!\nReally move this Files to Trash\n" + '\n'.join(self.copyList), QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
                 if msg == QMessageBox.Yes:
                     print('Deletion confirmed.')
-                    for delFile in self.copyList:
-                        try:
-                            send2trash(delFile)
-                        except OSError as e:
-                            self.infobox(str(e))
-                        print("%s %s" % ("file moved to trash:", delFile))
-                        self.statusBar().showMessage("%s %s" % ("file moved to trash:", delFile), 0)
+                    self.submitTrash(self.copyList)
                 else:
                     print('No clicked.')
         elif self.treeview.hasFocus():
             if self.treeview.selectionModel().hasSelection():
-                index = self.treeview.selectionModel().currentIndex()
                 self.copyFile()
                 msg = QMessageBox.question(self, "Info", "Caution!\nReally move this Files to Trash\n" + '\n'.join(self.copyList), QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
                 if msg == QMessageBox.Yes:
                     print('Deletion confirmed.')
-                    for delFile in self.copyList:
-                        try:
-                            send2trash(delFile)
-                        except OSError as e:
-                            self.infobox(str(e))
-                        print("%s %s" % ("file moved to trash:", delFile))
-                        self.statusBar().showMessage("%s %s" % ("file moved to trash:", delFile), 0)
+                    self.submitTrash(self.copyList)
                 else:
                     print('No clicked.')
 
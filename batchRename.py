@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### batch rename for the file managers (no Qt in here)
+### the new names are built from a template, checked all together,
+### and renamed in two steps through temporary names
+import os
+import re
+import time
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+###################################################################
+### template tokens
+###   [N] name without extension     [E] extension with the dot
+###   [C] counter                    [P] name of the parent folder
+###   [D] date modified              [X] date taken from EXIF, date modified without one
+tokens = re.compile(r"\[([NECPDX])\]")
+cases = ["unchanged", "lower", "upper", "title"]
+### EXIF tags: DateTimeOriginal in the Exif IFD, DateTime in the main one
+exifIfd = 0x8769
+exifDateTaken = 36867
+exifDateTime = 306
+### the first step of a rename, a folder never has a real file with this name
+tempPrefix = ".qfm-rename-"
+### the longest file name on Linux filesystems, in bytes
+maxName = 255
+
+def exifDate(path):
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as image:
+            exif = image.getexif()
+            value = exif.get_ifd(exifIfd).get(exifDateTaken) or exif.get(exifDateTime)
+    except Exception:
+        ### anything that is not an image with EXIF
+        return None
+    try:
+        return time.mktime(time.strptime(str(value).strip("\0 "), "%Y:%m:%d %H:%M:%S"))
+    except ValueError:
+        return None
+
+class Pattern(object):
+    ### raises re.error for a bad expression in find
+    def __init__(self, template="[N][E]", find="", replace="", regex=False, case="unchanged",
+                 start=1, step=1, digits=1, dateFormat="%Y-%m-%d"):
+        self.template = template
+        self.find = find
+        self.replace = replace
+        self.regex = regex
+        self.case = case
+        self.start = start
+        self.step = step
+        self.digits = digits
+        self.dateFormat = dateFormat
+        self.findRe = re.compile(find) if regex and find else None
+        self.exifDates = {}
+
+    def date(self, path, exif):
+        when = None
+        if exif:
+            if path not in self.exifDates:
+                self.exifDates[path] = exifDate(path)
+            when = self.exifDates[path]
+        if when is None:
+            try:
+                when = os.lstat(path).st_mtime
+            except OSError:
+                when = time.time()
+        return time.strftime(self.dateFormat, time.localtime(when))
+
+    ### number counts from 0 in the order of the selection
+    def newName(self, path, number):
+        folder, name = os.path.split(path)
+        if os.path.isdir(path):
+            base, ext = name, ""
+        else:
+            base, ext = os.path.splitext(name)
+        def token(match):
+            key = match.group(1)
+            if key == "N":
+                return base
+            elif key == "E":
+                return ext
+            elif key == "C":
+                return str(self.start + number * self.step).zfill(self.digits)
+            elif key == "P":
+                return os.path.basename(folder)
+            return self.date(path, key == "X")
+        new = tokens.sub(token, self.template)
+        if self.findRe is not None:
+            new = self.findRe.sub(self.replace, new)
+        elif self.find:
+            new = new.replace(self.find, self.replace)
+        if self.case == "lower":
+            new = new.lower()
+        elif self.case == "upper":
+            new = new.upper()
+        elif self.case == "title":
+            new = new.title()
+        return new
+
+###################################################################
+### one pass over the whole batch before anything is renamed,
+### returns [(source, target, problem)] with problem "" if the name is fine
+def check(sources, names):
+    targets = [os.path.join(os.path.dirname(source), name) for source, name in zip(sources, names)]
+    sourceSet = set(sources)
+    counts = {}
+    for target in targets:
+        counts[target] = counts.get(target, 0) + 1
+    changedFolders = set(source for source, target in zip(sources, targets)
+                         if source != target and os.path.isdir(source) and not os.path.islink(source))
+    plan = []
+    for source, name, target in zip(sources, names, targets):
+        problem = ""
+        if not name or name in (".", ".."):
+            problem = "no name"
+        elif "/" in name or "\0" in name:
+            problem = "'/' is not allowed in names"
+        elif len(name.encode("utf-8", "surrogateescape")) > maxName:
+            problem = "name is too long"
+        elif name.startswith(tempPrefix):
+            problem = "name is reserved"
+        elif counts[target] > 1:
+            problem = "same name as another file of the batch"
+        elif target != source and os.path.lexists(target) and target not in sourceSet \
+                and not sameEntry(source, target):
+            problem = "exists already"
+        elif insideChanged(source, changedFolders):
+            problem = "inside a folder that is renamed too"
+        plan.append((source, target, problem))
+    return plan
+
+### a name that differs in case only, on a filesystem that ignores case
+def sameEntry(source, target):
+    try:
+        return os.path.samefile(source, target) and os.path.dirname(source) == os.path.dirname(target)
+    except OSError:
+        return False
+
+def insideChanged(path, folders):
+    parent = os.path.dirname(path)
+    while parent and parent != "/":
+        if parent in folders:
+            return True
+        parent = os.path.dirname(parent)
+    return False
+
+### renames that go in a circle (a -> b -> a), the two steps take care of them
+def cycles(plan):
+    moves = dict((source, target) for source, target, problem in plan if source != target)
+    found = []
+    seen = set()
+    for start in moves:
+        chain = []
+        node = start
+        while node in moves and node not in seen:
+            seen.add(node)
+            chain.append(node)
+            node = moves[node]
+        if node in chain:
+            found.append(chain[chain.index(node):])
+    return found
+
+###################################################################
+### step one moves every source to a temporary name in its folder, step two
+### to the target, so chains and cycles never meet a name that is still taken.
+### after an error the steps done so far are undone in reverse order and the error is raised
+def renameAll(plan):
+    if any(problem for source, target, problem in plan):
+        raise ValueError("the batch has problems, nothing was renamed")
+    moves = [(source, target) for source, target, problem in plan if source != target]
+    done = []
+    try:
+        temps = []
+        for number, (source, target) in enumerate(moves):
+            temp = os.path.join(os.path.dirname(source), "%s%d-%d" % (tempPrefix, os.getpid(), number))
+            renameStep(source, temp, done)
+            temps.append(temp)
+        for temp, (source, target) in zip(temps, moves):
+            ### someone else may have taken the name since the check
+            if os.path.lexists(target) and not sameEntry(temp, target):
+                raise FileExistsError(17, "exists already", target)
+            renameStep(temp, target, done)
+    except OSError:
+        rollback(done)
+        raise
+    return moves
+
+def renameStep(old, new, done):
+    os.rename(old, new)
+    done.append((old, new))
+
+### undoes the steps from the last one, returns the ones that failed
+def rollback(steps):
+    failed = []
+    for old, new in reversed(steps):
+        try:
+            if os.path.lexists(old):
+                raise FileExistsError(17, "exists already", old)
+            os.rename(new, old)
+        except OSError as e:
+            failed.append((new, old, e))
+    return failed
@@ -0,0 +1,593 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### on-disk filename index for findFilesWindow (no Qt in here)
+### one sqlite file, every indexed root folder keeps its folders with
+### their mtime, a folder is only read again when its mtime changed
+import os
+import sys
+import time
+import errno
+import queue
+import select
+import struct
+import sqlite3
+import threading
+import ctypes
+import ctypes.util
+import findEngine
+###################################################################
+indexName = "findindex.sqlite"
+batchSize = 5000
+
+schema = """
+CREATE TABLE IF NOT EXISTS roots (id INTEGER PRIMARY KEY, path TEXT UNIQUE, built REAL);
+CREATE TABLE IF NOT EXISTS dirs (id INTEGER PRIMARY KEY, root INTEGER, path TEXT,
+                                 mtime REAL, dev INTEGER, UNIQUE(root, path));
+CREATE TABLE IF NOT EXISTS files (dir INTEGER, name TEXT, lname TEXT, isdir INTEGER);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS files_lname ON files(lname);
+"""
+
+### all paths below a folder sort between "folder/" and "folder0"
+def subtree(path):
+    path = path.rstrip("/")
+    return path + "/", path + "0"
+
+### symlinked folders count as folders and are read, like findEngine.Walker does
+def scanFolder(path):
+    entries = []
+    subfolders = []
+    st = os.stat(path)
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                isdir = entry.is_dir()
+            except OSError:
+                isdir = False
+            entries.append((entry.name, isdir))
+            if isdir:
+                subfolders.append(entry.path)
+    return st.st_mtime, st.st_dev, st.st_ino, entries, subfolders
+
+### (dev, inode) of the folders above path up to the root, a symlink to one of them is a loop
+def parentKeys(path, root):
+    keys = set()
+    while path != root and path.startswith(root.rstrip("/") + "/"):
+        path = os.path.dirname(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            break
+        keys.add((st.st_dev, st.st_ino))
+    return keys
+
+class FileIndex(object):
+    def __init__(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, indexName)
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(schema)
+        ### indexes from before the device column: every folder is read again by the next refresh
+        if not "dev" in [row[1] for row in self.db.execute("PRAGMA table_info(dirs)")]:
+            with self.db:
+                self.db.execute("ALTER TABLE dirs ADD COLUMN dev INTEGER")
+                self.db.execute("UPDATE dirs SET mtime = 0")
+        self.stopped = False
+
+    def close(self):
+        self.db.close()
+
+    def roots(self):
+        return [row[0] for row in self.db.execute("SELECT path FROM roots ORDER BY path")]
+
+    ### the indexed root a folder belongs to, or None
+    def rootFor(self, path):
+        path = os.path.abspath(path)
+        best = None
+        for rootId, root in self.db.execute("SELECT id, path FROM roots"):
+            if path == root or path.startswith(root.rstrip("/") + "/"):
+                if best is None or len(root) > len(best[1]):
+                    best = (rootId, root)
+        return best
+
+    def build(self, root, progress=None):
+        root = os.path.abspath(root)
+        with self.db:
+            row = self.db.execute("SELECT id FROM roots WHERE path = ?", (root,)).fetchone()
+            if row:
+                rootId = row[0]
+                self.dropFolders(rootId, root, True)
+            else:
+                rootId = self.db.execute("INSERT INTO roots (path, built) VALUES (?, 0)", (root,)).lastrowid
+            count = self.addFolders(rootId, root, [root], progress)
+            ### a half built index would look complete later, keep the old one
+            if self.stopped:
+                self.db.rollback()
+            else:
+                self.db.execute("UPDATE roots SET built = ? WHERE id = ?", (time.time(), rootId))
+        return count
+
+    def remove(self, root):
+        root = os.path.abspath(root)
+        with self.db:
+            row = self.db.execute("SELECT id FROM roots WHERE path = ?", (root,)).fetchone()
+            if row:
+                self.dropFolders(row[0], root, True)
+                self.db.execute("DELETE FROM roots WHERE id = ?", row)
+
+    ### read folders (and everything below them) into the index.
+    ### a folder reached twice (symlinks, bind mounts) is kept under the first path only
+    def addFolders(self, rootId, root, folders, progress=None):
+        folders = list(folders)
+        visited = set()
+        for path in folders:
+            visited |= parentKeys(path, root)
+        files = []
+        count = 0
+        while folders and not self.stopped:
+            path = folders.pop()
+            try:
+                mtime, dev, ino, entries, subfolders = scanFolder(path)
+            except OSError:
+                continue
+            if (dev, ino) in visited:
+                continue
+            visited.add((dev, ino))
+            dirId = self.db.execute("INSERT OR REPLACE INTO dirs (root, path, mtime, dev) VALUES (?, ?, ?, ?)",
+                                    (rootId, path, mtime, dev)).lastrowid
+            for name, isdir in entries:
+                files.append((dirId, name, name.lower(), isdir))
+            folders.extend(sorted(subfolders, reverse=True))
+            count += 1
+            if len(files) >= batchSize:
+                self.db.executemany("INSERT INTO files VALUES (?, ?, ?, ?)", files)
+                files = []
+                if progress:
+                    progress(count)
+        self.db.executemany("INSERT INTO files VALUES (?, ?, ?, ?)", files)
+        if progress:
+            progress(count)
+        return count
+
+    ### forget a folder, everything below it and (if self) the folder itself
+    def dropFolders(self, rootId, path, withSelf):
+        low, high = subtree(path)
+        query = "SELECT id FROM dirs WHERE root = ? AND (path > ? AND path < ?"
+        if withSelf:
+            query += " OR path = ?)"
+            ids = self.db.execute(query, (rootId, low, high, path.rstrip("/") or "/")).fetchall()
+        else:
+            ids = self.db.execute(query + ")", (rootId, low, high)).fetchall()
+        self.db.executemany("DELETE FROM files WHERE dir = ?", ids)
+        self.db.executemany("DELETE FROM dirs WHERE id = ?", ids)
+
+    ### read again only the folders whose mtime changed since the last visit
+    def refresh(self, rootId, root, below=None):
+        changed = 0
+        query = "SELECT id, path, mtime FROM dirs WHERE root = ?"
+        args = (rootId,)
+        if below:
+            low, high = subtree(below)
+            query += " AND (path = ? OR (path > ? AND path < ?))"
+            args = (rootId, below.rstrip("/") or "/", low, high)
+        known = self.db.execute(query, args).fetchall()
+        paths = set(row[1] for row in known)
+        with self.db:
+            for dirId, path, mtime in known:
+                if self.stopped:
+                    break
+                try:
+                    newtime = os.stat(path).st_mtime
+                except OSError:
+                    if self.db.execute("SELECT 1 FROM dirs WHERE id = ?", (dirId,)).fetchone():
+                        self.dropFolders(rootId, path, True)
+                    continue
+                if newtime == mtime:
+                    continue
+                if not self.db.execute("SELECT 1 FROM dirs WHERE id = ?", (dirId,)).fetchone():
+                    continue
+                changed += 1
+                self.rescanFolder(rootId, root, dirId, path, paths)
+        return changed
+
+    def rescanFolder(self, rootId, root, dirId, path, paths):
+        try:
+            mtime, dev, ino, entries, subfolders = scanFolder(path)
+        except OSError:
+            self.dropFolders(rootId, path, True)
+            return
+        old = set(row[0] for row in self.db.execute("SELECT name FROM files WHERE dir = ? AND isdir", (dirId,)))
+        self.db.execute("DELETE FROM files WHERE dir = ?", (dirId,))
+        self.db.executemany("INSERT INTO files VALUES (?, ?, ?, ?)",
+                            [(dirId, name, name.lower(), isdir) for name, isdir in entries])
+        self.db.execute("UPDATE dirs SET mtime = ?, dev = ? WHERE id = ?", (mtime, dev, dirId))
+        current = set(name for name, isdir in entries if isdir)
+        for name in old - current:
+            self.dropFolders(rootId, os.path.join(path, name), True)
+        new = [sub for sub in subfolders if not sub in paths]
+        if new:
+            self.addFolders(rootId, root, new)
+
+    def stats(self):
+        rows = []
+        for rootId, path, built in self.db.execute("SELECT id, path, built FROM roots ORDER BY path").fetchall():
+            dirs = self.db.execute("SELECT count(*) FROM dirs WHERE root = ?", (rootId,)).fetchone()[0]
+            files = self.db.execute("SELECT count(*) FROM files JOIN dirs ON files.dir = dirs.id "
+                                    "WHERE dirs.root = ?", (rootId,)).fetchone()[0]
+            rows.append((path, dirs, files, built))
+        size = 0
+        for name in (self.path, self.path + "-wal"):
+            if os.path.exists(name):
+                size += os.path.getsize(name)
+        return rows, size
+
+class IndexSearch(object):
+    ### same interface as findEngine.Walker, answered from the index
+    def __init__(self, index, root, findName, hidden=False, filesOnly=False,
+                 excludes=(), maxDepth=0, oneFilesystem=False):
+        self.index = index
+        self.root = os.path.abspath(root)
+        if isinstance(findName, findEngine.Matcher):
+            self.matcher = findName
+        else:
+            self.matcher = findEngine.compileQuery(findName)
+        self.hidden = hidden
+        self.filesOnly = filesOnly
+        self.excludeName, self.excludePath = findEngine.compileExcludes(excludes)
+        self.maxDepth = maxDepth
+        self.oneFilesystem = oneFilesystem
+        self.dirs = 0
+        self.hits = 0
+        self.pruned = 0
+
+    ### the index has every folder, the walker rules are applied to the folder paths.
+    ### the index goes into mount points like the walker, every folder keeps its
+    ### device so oneFilesystem can leave out the ones on other filesystems
+    def excluded(self, path):
+        rel = os.path.relpath(path, self.root)
+        if rel == ".":
+            return False
+        parts = rel.split(os.sep)
+        if self.maxDepth and len(parts) > self.maxDepth:
+            return True
+        for i, part in enumerate(parts):
+            if not self.hidden and part.startswith("."):
+                return True
+            if self.excludeName is not None and self.excludeName(part):
+                return True
+            if self.excludePath is not None and self.excludePath(os.path.join(self.root, *parts[:i + 1])):
+                return True
+        return False
+
+    def walk(self):
+        try:
+            rootDev = os.stat(self.root).st_dev
+        except OSError:
+            return
+        found = self.index.rootFor(self.root)
+        if found is None:
+            self.index.build(self.root)
+            found = self.index.rootFor(self.root)
+            if found is None:
+                return
+        elif watcher is None or not watcher.covers(found[1]):
+            ### a root under inotify is up to date already, the others are checked by the folder mtimes
+            self.index.refresh(found[0], found[1], self.root)
+        rootId, root = found
+        low, high = subtree(self.root)
+        query = ("SELECT dirs.path, dirs.dev, files.name FROM files JOIN dirs ON files.dir = dirs.id "
+                 "WHERE dirs.root = ? AND (dirs.path = ? OR (dirs.path > ? AND dirs.path < ?))")
+        args = [rootId, self.root.rstrip("/") or "/", low, high]
+        ### the name terms go to sqlite (lower case GLOB, the column is lower case too),
+        ### the matcher checks every row again for the exact rules and the stat terms
+        for globs in self.matcher.sqlGlobs():
+            if globs:
+                query += " AND (" + " OR ".join(["files.lname GLOB ?"] * len(globs)) + ")"
+                args += globs
+        if not self.hidden:
+            query += " AND NOT files.name GLOB '.*'"
+        if self.filesOnly:
+            query += " AND NOT files.isdir"
+        query += " ORDER BY files.dir"
+        checkPath = self.matcher.types is not None or self.matcher.needStat
+        folder = None
+        names = []
+        skip = False
+        for path, dev, name in self.index.db.execute(query, args):
+            if path != folder:
+                if names:
+                    yield folder, names
+                folder = path
+                names = []
+                skip = self.excluded(path) or self.oneFilesystem and dev != rootDev
+                if skip:
+                    self.pruned += 1
+                else:
+                    self.dirs += 1
+            if skip or not self.matcher.matchName(name):
+                continue
+            if checkPath and not self.matcher.matchPath(os.path.join(path, name)):
+                continue
+            names.append(name)
+            self.hits += 1
+        if names:
+            yield folder, names
+
+###################################################################
+### inotify keeps the index up to date while the app is running
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+watchMask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+eventHeader = struct.Struct("iIII")
+
+try:
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    libc.inotify_init1
+except (OSError, AttributeError):
+    libc = None
+    print("inotify not available, the filename index is refreshed by polling", file=sys.stderr)
+
+class IndexWatcher(threading.Thread):
+    ### events are collected for 'delay' seconds and written in one transaction,
+    ### roots that ran out of inotify watches are rescanned every 'pollInterval'
+    def __init__(self, folder, delay=1.0, pollInterval=300):
+        super(IndexWatcher, self).__init__(daemon=True)
+        self.folder = folder
+        self.delay = delay
+        self.pollInterval = pollInterval
+        self.requests = queue.Queue()
+        self.roots = {}
+        self.polling = set()
+        self.paths = {}
+        self.wds = {}
+        self.pending = []
+        self.fd = -1
+        self.stopped = False
+
+    def addRoot(self, root):
+        self.requests.put(os.path.abspath(root))
+
+    def stop(self):
+        self.stopped = True
+
+    ### true when inotify keeps the root up to date, polled roots are not
+    def covers(self, root):
+        return self.is_alive() and not self.stopped and root in self.roots and not root in self.polling
+
+    def run(self):
+        self.index = FileIndex(self.folder)
+        if libc is not None:
+            self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        for root in self.index.roots():
+            self.watchRoot(root)
+        lastPoll = time.monotonic()
+        while not self.stopped:
+            while not self.requests.empty():
+                self.watchRoot(self.requests.get())
+            timeout = self.delay if self.pending else 1.0
+            if self.fd >= 0:
+                ready = select.select([self.fd], [], [], timeout)[0]
+                if ready:
+                    self.readEvents()
+                    if self.pending:
+                        ### give the burst some time to settle, then write it at once
+                        time.sleep(self.delay)
+                        self.readEvents()
+            else:
+                time.sleep(timeout)
+            if self.pending:
+                self.applyEvents()
+            if self.polling and time.monotonic() - lastPoll > self.pollInterval:
+                lastPoll = time.monotonic()
+                self.poll()
+        if self.fd >= 0:
+            os.close(self.fd)
+        self.index.close()
+
+    def watchRoot(self, root):
+        found = self.index.rootFor(root)
+        if found is None or found[1] != root:
+            return
+        rootId = found[0]
+        if self.fd < 0:
+            self.polling.add(root)
+            self.roots[root] = rootId
+            return
+        for row in self.index.db.execute("SELECT path FROM dirs WHERE root = ?", (rootId,)).fetchall():
+            if not self.addWatch(root, row[0]):
+                break
+        ### what changed before the watches were there, the root counts as covered after that
+        self.index.refresh(rootId, root)
+        self.roots[root] = rootId
+
+    def addWatch(self, root, path):
+        if root in self.polling or path in self.wds:
+            return True
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(path), watchMask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                ### out of watches (fs.inotify.max_user_watches), poll this root instead
+                print("inotify watch limit reached, polling " + root, file=sys.stderr)
+                self.polling.add(root)
+                return False
+            return True
+        if wd in self.paths:
+            ### the same folder under another path (a symlink), inotify has one watch for both
+            return True
+        self.paths[wd] = (root, path)
+        self.wds[path] = wd
+        return True
+
+    def readEvents(self):
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return
+            if not data:
+                return
+            pos = 0
+            while pos < len(data):
+                wd, mask, cookie, length = eventHeader.unpack_from(data, pos)
+                pos += eventHeader.size
+                name = os.fsdecode(data[pos:pos + length].rstrip(b"\0"))
+                pos += length
+                self.pending.append((wd, mask, cookie, name))
+
+    def forget(self, path):
+        low, high = subtree(path)
+        for watched in [p for p in self.wds if p == path or low < p < high]:
+            wd = self.wds.pop(watched)
+            self.paths.pop(wd, None)
+            libc.inotify_rm_watch(self.fd, wd)
+
+    def move(self, old, new):
+        low, high = subtree(old)
+        for watched in [p for p in self.wds if p == old or low < p < high]:
+            wd = self.wds.pop(watched)
+            moved = new + watched[len(old):]
+            self.wds[moved] = wd
+            self.paths[wd] = (self.paths[wd][0], moved)
+
+    def applyEvents(self):
+        events = self.pending
+        self.pending = []
+        ### a rename shows up as MOVED_FROM and MOVED_TO with the same cookie
+        movedFrom = {}
+        movedTo = set()
+        for wd, mask, cookie, name in events:
+            if mask & IN_MOVED_FROM and wd in self.paths:
+                movedFrom[cookie] = os.path.join(self.paths[wd][1], name)
+            elif mask & IN_MOVED_TO:
+                movedTo.add(cookie)
+        touched = set()
+        try:
+            with self.index.db:
+                for wd, mask, cookie, name in events:
+                    if mask & IN_Q_OVERFLOW:
+                        ### the kernel dropped events, fall back to the mtimes
+                        for root, rootId in self.roots.items():
+                            self.index.refresh(rootId, root)
+                        continue
+                    if mask & IN_IGNORED:
+                        watched = self.paths.pop(wd, None)
+                        if watched and self.wds.get(watched[1]) == wd:
+                            del self.wds[watched[1]]
+                        continue
+                    if not wd in self.paths or not name:
+                        continue
+                    root, folder = self.paths[wd]
+                    rootId = self.roots.get(root)
+                    if rootId is None:
+                        continue
+                    ### a symlink to a folder has no IN_ISDIR, the index counts it as a folder
+                    isdir = bool(mask & IN_ISDIR)
+                    touched.add((rootId, folder))
+                    if mask & IN_MOVED_FROM and cookie in movedTo:
+                        continue
+                    if mask & IN_MOVED_TO and cookie in movedFrom:
+                        old = movedFrom[cookie]
+                        self.renameEntry(rootId, root, old, os.path.join(folder, name), isdir)
+                        touched.add((rootId, os.path.dirname(old)))
+                    elif mask & (IN_CREATE | IN_MOVED_TO):
+                        self.createEntry(rootId, root, folder, name, isdir)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        self.deleteEntry(rootId, folder, name, isdir)
+                ### so the mtime refresh does not read these folders again
+                for rootId, folder in touched:
+                    try:
+                        mtime = os.stat(folder).st_mtime
+                    except OSError:
+                        continue
+                    self.index.db.execute("UPDATE dirs SET mtime = ? WHERE root = ? AND path = ?",
+                                          (mtime, rootId, folder))
+        except sqlite3.OperationalError as e:
+            ### index busy (a rebuild is running), try again with the next events
+            print("index update failed: " + str(e), file=sys.stderr)
+            self.pending = events + self.pending
+
+    def dirId(self, rootId, folder):
+        row = self.index.db.execute("SELECT id FROM dirs WHERE root = ? AND path = ?", (rootId, folder)).fetchone()
+        if row:
+            return row[0]
+
+    def createEntry(self, rootId, root, folder, name, isdir):
+        dirId = self.dirId(rootId, folder)
+        if dirId is None:
+            return
+        path = os.path.join(folder, name)
+        isdir = isdir or os.path.isdir(path)
+        self.index.db.execute("DELETE FROM files WHERE dir = ? AND name = ?", (dirId, name))
+        self.index.db.execute("INSERT INTO files VALUES (?, ?, ?, ?)", (dirId, name, name.lower(), isdir))
+        if isdir:
+            self.index.dropFolders(rootId, path, True)
+            self.index.addFolders(rootId, root, [path])
+            low, high = subtree(path)
+            for row in self.index.db.execute("SELECT path FROM dirs WHERE root = ? AND (path = ? OR (path > ? AND path < ?))",
+                                             (rootId, path, low, high)).fetchall():
+                if not self.addWatch(root, row[0]):
+                    break
+
+    def deleteEntry(self, rootId, folder, name, isdir):
+        dirId = self.dirId(rootId, folder)
+        if dirId is None:
+            return
+        row = self.index.db.execute("SELECT isdir FROM files WHERE dir = ? AND name = ?", (dirId, name)).fetchone()
+        isdir = isdir or bool(row and row[0])
+        self.index.db.execute("DELETE FROM files WHERE dir = ? AND name = ?", (dirId, name))
+        if isdir:
+            path = os.path.join(folder, name)
+            self.index.dropFolders(rootId, path, True)
+            self.forget(path)
+
+    def renameEntry(self, rootId, root, old, new, isdir):
+        oldDir = self.dirId(rootId, os.path.dirname(old))
+        newDir = self.dirId(rootId, os.path.dirname(new))
+        if oldDir is None or newDir is None:
+            if oldDir is not None:
+                self.deleteEntry(rootId, os.path.dirname(old), os.path.basename(old), isdir)
+            if newDir is not None:
+                self.createEntry(rootId, root, os.path.dirname(new), os.path.basename(new), isdir)
+            return
+        name = os.path.basename(new)
+        isdir = isdir or os.path.isdir(new)
+        self.index.db.execute("DELETE FROM files WHERE dir = ? AND name = ?", (newDir, name))
+        self.index.db.execute("UPDATE files SET dir = ?, name = ?, lname = ? WHERE dir = ? AND name = ?",
+                              (newDir, name, name.lower(), oldDir, os.path.basename(old)))
+        if isdir:
+            low, high = subtree(old)
+            self.index.dropFolders(rootId, new, True)
+            self.index.db.execute("UPDATE dirs SET path = ? || substr(path, ?) WHERE root = ? "
+                                  "AND (path = ? OR (path > ? AND path < ?))",
+                                  (new, len(old) + 1, rootId, old, low, high))
+            self.move(old, new)
+
+    def poll(self):
+        for root in list(self.polling):
+            rootId = self.roots.get(root)
+            if rootId is not None:
+                self.index.refresh(rootId, root)
+
+watcher = None
+
+### one watcher per process, started by the first indexed search
+def startWatcher(folder):
+    global watcher
+    if watcher is None or not watcher.is_alive():
+        watcher = IndexWatcher(folder)
+        watcher.start()
+    return watcher
@@ -0,0 +1,1296 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### copy and move jobs for the file managers (no Qt in here)
+### a job runs on a worker thread, the window reads the counters
+### and calls pause, resume and cancel from the GUI thread
+import os
+import json
+import time
+import hashlib
+import stat
+import errno
+import fcntl
+import shutil
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+try:
+    import xxhash
+    newHash = xxhash.xxh64
+except ImportError:
+    newHash = hashlib.blake2b
+import xdgTrash
+###################################################################
+bufferSize = 1048576
+### bytes per kernel copy call, small enough to pause and cancel in between
+chunkSize = 8 * 1048576
+### throughput is measured over the last seconds only
+rateWindow = 5.0
+tempNumbers = itertools.count()
+
+### a hidden name next to target, whoever creates it with O_EXCL owns it
+def tempName(target):
+    return os.path.join(os.path.dirname(target), ".qfm-%d-%d" % (os.getpid(), next(tempNumbers)))
+
+class JobCancelled(Exception):
+    pass
+
+###################################################################
+### copy backends, fastest first:
+###   reflink          FICLONE ioctl, the filesystem shares the blocks (btrfs, XFS, ...)
+###   copy_file_range  the kernel copies, server side on NFS and SMB
+###   sendfile         the kernel copies, works across filesystems on older kernels
+###   readwrite        plain loop with a large buffer
+### files with holes (VM images, databases) use reflink or sparse, which copies
+### only the data between the holes and leaves the holes in the copy
+### the first one that works is remembered per (source device, destination device)
+### a verifying job only uses sparse and readwrite, the data has to pass through
+### the hash on its way to the destination
+FICLONE = 0x40049409
+copyMethods = ["reflink", "copy_file_range", "sendfile", "readwrite"]
+copyMethodFor = {}
+### errors that mean 'not here', the next method is tried
+unsupported = set([errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY,
+                   errno.EBADF, errno.EPERM, errno.ETXTBSY])
+
+class CopyUnsupported(Exception):
+    pass
+
+### a file counts as sparse when its holes add up to more than this
+sparseSlack = 1048576
+
+### bytes the file really has on disk, less than its size when it has holes
+def dataSize(st):
+    allocated = st.st_blocks * 512
+    if allocated + sparseSlack < st.st_size:
+        return allocated
+    return st.st_size
+
+###################################################################
+### how many files are copied at once: a spinning disk gets one stream,
+### flash and memory get many, the slower side of a copy decides
+rotationalLanes = 1
+flashLanes = 8
+### network and other filesystems without a block device
+otherLanes = 4
+### large files may use only a part of the lanes so small files keep moving
+bigFile = 64 * 1048576
+memoryFilesystems = set(["tmpfs", "ramfs"])
+lanesForDevice = {}
+
+def readRotational(major, minor):
+    block = os.path.realpath("/sys/dev/block/%d:%d" % (major, minor))
+    ### a partition has no queue of its own, the disk above it has
+    for folder in (block, os.path.dirname(block)):
+        try:
+            with open(os.path.join(folder, "queue", "rotational")) as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+def mountFor(dev):
+    key = "%d:%d" % (os.major(dev), os.minor(dev))
+    try:
+        with open("/proc/self/mountinfo") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and fields[2] == key and " - " in line:
+                    fsType, source = line.split(" - ", 1)[1].split()[:2]
+                    return fsType, source
+    except OSError:
+        pass
+    return None, None
+
+def deviceLanes(path):
+    try:
+        dev = os.stat(path).st_dev
+    except OSError:
+        return rotationalLanes
+    if dev in lanesForDevice:
+        return lanesForDevice[dev]
+    rotational = None
+    if os.major(dev) != 0:
+        rotational = readRotational(os.major(dev), os.minor(dev))
+    else:
+        ### btrfs, overlay, tmpfs and network mounts have anonymous devices
+        fsType, source = mountFor(dev)
+        if fsType in memoryFilesystems:
+            rotational = False
+        elif source and source.startswith("/dev/"):
+            try:
+                rdev = os.stat(source).st_rdev
+                rotational = readRotational(os.major(rdev), os.minor(rdev))
+            except OSError:
+                pass
+    if rotational is None:
+        lanes = otherLanes
+    elif rotational:
+        lanes = rotationalLanes
+    else:
+        lanes = flashLanes
+    lanesForDevice[dev] = lanes
+    return lanes
+
+zeros = memoryview(bytes(bufferSize))
+
+### the holes of a sparse file read as zeros
+def hashZeros(hasher, count):
+    while count > 0:
+        hasher.update(zeros[:min(count, bufferSize)])
+        count -= bufferSize
+
+def formatSize(size):
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size < 1024 or unit == "TB":
+            break
+        size /= 1024.0
+    if unit == "B":
+        return "%d %s" % (size, unit)
+    return "%.1f %s" % (size, unit)
+
+def formatTime(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return "%d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+    return "%d:%02d" % (seconds // 60, seconds % 60)
+
+###################################################################
+### what happens to a file that is already at the destination, decided once per job
+###   skip       leave the existing file alone
+###   overwrite  replace it
+###   newer      replace it if the source is newer
+###   rename     move the existing file aside to "name (old).ext"
+###   keepBoth   the copy becomes "name (2).ext"
+policies = ["skip", "overwrite", "newer", "rename", "keepBoth"]
+### FAT keeps mtimes in 2 second steps
+mtimeSlack = 2.0
+
+def freeName(path, label=""):
+    folder, name = os.path.split(path)
+    base, ext = os.path.splitext(name)
+    number = 1 if label else 2
+    while True:
+        if label and number == 1:
+            tag = label
+        else:
+            tag = ("%s %s" % (label, number)).strip()
+        candidate = os.path.join(folder, "%s (%s)%s" % (base, tag, ext))
+        if not os.path.lexists(candidate):
+            return candidate
+        number += 1
+
+def sameFile(source, target):
+    try:
+        a = os.stat(source)
+        b = os.lstat(target)
+    except OSError:
+        return False
+    return a.st_size == b.st_size and abs(a.st_mtime - b.st_mtime) < mtimeSlack
+
+### True if path is the folder or inside it
+def isInside(path, folder):
+    path = os.path.abspath(path)
+    folder = os.path.abspath(folder)
+    return path == folder or path.startswith(folder.rstrip("/") + "/")
+
+### what all jobs share: the counters the window reads, pause, resume and cancel
+class BaseJob(object):
+    kind = ""
+    move = False
+    verify = False
+    ### jobs that take back an earlier one are not journaled for undo
+    undoing = False
+
+    def __init__(self, sources, destination=None):
+        self.sources = [os.path.abspath(source) for source in sources]
+        self.destination = os.path.abspath(destination) if destination is not None else None
+        self.question = None
+        self.answered = threading.Event()
+        self.state = "waiting"
+        self.totalFiles = 0
+        self.totalBytes = 0
+        self.doneFiles = 0
+        self.doneBytes = 0
+        ### bytes to read and write, the holes of sparse files left out
+        self.totalData = 0
+        self.doneData = 0
+        ### bytes read back from the destinations
+        self.checkedBytes = 0
+        self.skipped = 0
+        self.resumed = 0
+        self.current = ""
+        self.errors = []
+        ### numbers of the sources with errors, a move keeps them
+        self.broken = set()
+        self.started = None
+        self.finished = None
+        self.samples = deque()
+        ### set while running, cleared while paused
+        self.running = threading.Event()
+        self.running.set()
+        self.cancelled = False
+        self.pausedAt = None
+        self.pausedTime = 0.0
+        self.lanes = 1
+        ### counters are shared by the worker threads
+        self.lock = threading.Lock()
+
+    ### the devices the job reads and writes, jobs sharing one run one after the other
+    def devices(self):
+        devices = set()
+        for path in self.sources + ([self.destination] if self.destination else []):
+            try:
+                devices.add(os.stat(path).st_dev)
+            except OSError:
+                pass
+        return devices
+
+    def pause(self):
+        if self.state == "running":
+            self.running.clear()
+            self.pausedAt = time.time()
+            self.state = "paused"
+
+    def resume(self):
+        if self.state == "paused":
+            self.state = "running"
+            self.pausedTime += time.time() - self.pausedAt
+            self.running.set()
+
+    def cancel(self):
+        self.cancelled = True
+        self.running.set()
+        self.answered.set()
+
+    ### called by the worker between chunks, blocks while paused
+    def checkpoint(self):
+        if not self.running.is_set():
+            self.running.wait()
+            self.samples.clear()
+        if self.cancelled:
+            raise JobCancelled()
+
+    ### count is the logical size, data what was really copied (0 for a hole)
+    def addBytes(self, count, data=None):
+        with self.lock:
+            self.doneBytes += count
+            self.doneData += count if data is None else data
+            now = time.time()
+            self.samples.append((now, self.doneData + self.checkedBytes))
+            while len(self.samples) > 2 and now - self.samples[0][0] > rateWindow:
+                self.samples.popleft()
+
+    def addChecked(self, count):
+        with self.lock:
+            self.checkedBytes += count
+            self.samples.append((time.time(), self.doneData + self.checkedBytes))
+
+    ### bytes per second over the last few seconds
+    def rate(self):
+        with self.lock:
+            if len(self.samples) < 2:
+                return 0.0
+            (start, startBytes), (end, endBytes) = self.samples[0], self.samples[-1]
+        if end - start <= 0:
+            return 0.0
+        return (endBytes - startBytes) / (end - start)
+
+    ### bytes per second over the whole job, pauses not counted
+    def averageRate(self):
+        if self.started is None:
+            return 0.0
+        elapsed = (self.finished or time.time()) - self.started - self.pausedTime
+        if elapsed <= 0:
+            return 0.0
+        return self.doneData / elapsed
+
+    ### (done, total) bytes of work, reading back counts when verifying
+    def progress(self):
+        if self.verify:
+            return self.doneData + self.checkedBytes, self.totalData * 2
+        return self.doneData, self.totalData
+
+    ### seconds left or None while unknown
+    def eta(self):
+        rate = self.rate()
+        if rate <= 0:
+            return None
+        done, total = self.progress()
+        return max(0, total - done) / rate
+
+    ### "1.2 GB", with holes "1.2 GB on disk, 40.0 GB logical"
+    def sizeText(self):
+        if self.doneData == self.doneBytes:
+            return formatSize(self.doneBytes)
+        return "%s on disk, %s logical" % (formatSize(self.doneData), formatSize(self.doneBytes))
+
+    def error(self, path, e, number=None):
+        if number is not None:
+            self.broken.add(number)
+        if isinstance(e, OSError) and e.strerror:
+            self.errors.append((path, e.strerror))
+        else:
+            self.errors.append((path, str(e)))
+
+    ### anything unexpected ends the job as failed, the window still hears it finished
+    def fail(self, e):
+        self.error(self.current or self.destination or self.title(), e)
+        self.state = "failed"
+
+class Job(BaseJob):
+    ### policy None asks through 'question' and answer() on the first conflict
+    ### journalFolder keeps the list of finished files, a job started again skips them
+    ### verify hashes every file while copying and compares with the destination read back
+    ### names gives the target name per source, the source names when None
+    def __init__(self, sources, destination, move=False, policy=None, journalFolder=None, verify=False, names=None):
+        super(Job, self).__init__(sources, destination)
+        self.names = names
+        self.move = move
+        self.kind = "move" if move else "copy"
+        self.policy = policy
+        self.verify = verify
+        ### (destination, True if the checksums match) per verified file
+        self.report = []
+        self.askLock = threading.Lock()
+        self.journalFolder = journalFolder
+        self.journalPath = None
+        self.journalFile = None
+        self.journal = set()
+        ### temp file -> its target, from the journal of a crashed run
+        self.temps = {}
+        ### size of the holes per sparse source file
+        self.holes = {}
+        ### numbers of the sources that were moved with a rename
+        self.renamed = set()
+        ### (number, source, target) of the sources written to a name that was free
+        self.created = []
+
+    def title(self):
+        if len(self.sources) == 1:
+            name = os.path.basename(self.sources[0])
+        else:
+            name = "%s items" % len(self.sources)
+        what = "moving" if self.move else "copying"
+        return "%s %s to %s" % (what, name, self.destination)
+
+    ### the copy threads wait here until the window has asked the user
+    def ask(self, target):
+        with self.askLock:
+            if self.policy is None and not self.cancelled:
+                self.question = target
+                self.answered.wait()
+                self.question = None
+        if self.cancelled:
+            raise JobCancelled()
+        return self.policy
+
+    def answer(self, policy):
+        self.policy = policy
+        self.answered.set()
+
+    ###################################################################
+    ### one journal per (sources, destination, move), removed when the job is done
+    def openJournal(self):
+        if self.journalFolder is None:
+            return
+        key = "\0".join(self.sources + [self.destination, str(self.move)])
+        name = hashlib.sha1(key.encode("utf-8", "surrogateescape")).hexdigest()[:16] + ".journal"
+        os.makedirs(self.journalFolder, exist_ok=True)
+        self.journalPath = os.path.join(self.journalFolder, name)
+        try:
+            with open(self.journalPath, encoding="utf-8", errors="surrogateescape") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        ### the last line of a crashed run may be cut
+                        continue
+                    if isinstance(entry, dict):
+                        self.temps[entry.get("temp")] = entry.get("target")
+                    else:
+                        self.journal.add(entry)
+        except OSError:
+            pass
+        ### temp files the crashed run made and did not rename, only those are removed
+        for temp, target in self.temps.items():
+            if temp and not target in self.journal:
+                try:
+                    os.remove(temp)
+                except OSError:
+                    pass
+        self.temps = {}
+        self.journalFile = open(self.journalPath, "a", encoding="utf-8", errors="surrogateescape")
+
+    def record(self, target):
+        if self.journalFile is not None:
+            with self.lock:
+                self.journalFile.write(json.dumps(target) + "\n")
+                self.journalFile.flush()
+
+    def recordTemp(self, temp, target):
+        if self.journalFile is not None:
+            with self.lock:
+                self.journalFile.write(json.dumps({"temp": temp, "target": target}) + "\n")
+                self.journalFile.flush()
+
+    def closeJournal(self):
+        if self.journalFile is None:
+            return
+        self.journalFile.close()
+        self.journalFile = None
+        if self.state == "done":
+            try:
+                os.remove(self.journalPath)
+            except OSError:
+                pass
+
+    def mismatches(self):
+        return [target for target, ok in self.report if not ok]
+
+    ### what undo takes back: the new copies as they are now, or the moves whose source is gone
+    def undoSteps(self):
+        if self.move:
+            return [(source, target) for number, source, target in self.created
+                    if not number in self.broken and not os.path.lexists(source) and os.path.lexists(target)]
+        steps = []
+        for number, source, target in self.created:
+            try:
+                st = os.lstat(target)
+            except OSError:
+                continue
+            steps.append((target, None if stat.S_ISDIR(st.st_mode) else st.st_size, st.st_mtime))
+        return steps
+
+    ###################################################################
+    ### the plan: (source index, kind, source, destination, size), folders before their contents
+    ### kind is "d" folder, "f" file, "l" symlink
+    def scan(self):
+        plan = []
+        try:
+            destinationDev = os.stat(self.destination).st_dev
+        except OSError:
+            destinationDev = None
+        for number, source in enumerate(self.sources):
+            self.checkpoint()
+            name = self.names[number] if self.names else os.path.basename(source)
+            target = os.path.join(self.destination, name)
+            try:
+                st = os.lstat(source)
+            except OSError as e:
+                self.error(source, e, number)
+                continue
+            if target == source:
+                self.error(source, ValueError("source and destination are the same"), number)
+                continue
+            if os.path.isdir(source) and not os.path.islink(source):
+                if isInside(self.destination, source):
+                    self.error(source, ValueError("cannot copy a folder into itself"), number)
+                    continue
+            if self.move and st.st_dev == destinationDev and self.renameSource(source, target):
+                self.renamed.add(number)
+                self.created.append((number, source, target))
+                if not stat.S_ISDIR(st.st_mode):
+                    self.totalBytes += st.st_size
+                    self.totalData += dataSize(st)
+                    self.addBytes(st.st_size, dataSize(st))
+                    if self.verify:
+                        self.addChecked(dataSize(st))
+                self.doneFiles += 1
+                continue
+            if os.path.isdir(source) and not os.path.islink(source):
+                plan.append((number, "d", source, target, 0))
+                self.scanFolder(number, source, target, plan)
+            elif os.path.islink(source):
+                plan.append((number, "l", source, target, 0))
+            else:
+                plan.append((number, "f", source, target, st.st_size))
+                self.countHoles(source, st)
+        self.totalFiles = len(self.renamed) + sum(1 for item in plan if item[1] != "d")
+        self.totalBytes = self.doneBytes + sum(item[4] for item in plan)
+        self.totalData = self.doneData + sum(item[4] for item in plan) - sum(self.holes.values())
+        return plan
+
+    def countHoles(self, source, st):
+        data = dataSize(st)
+        if data < st.st_size:
+            self.holes[source] = st.st_size - data
+        self.totalData += data
+
+    ### a move on the same filesystem is one atomic rename, whole folders too,
+    ### anything else (an existing target, EXDEV from a bind mount) goes the copy way
+    def renameSource(self, source, target):
+        if os.path.lexists(target):
+            return False
+        try:
+            os.rename(source, target)
+        except OSError:
+            return False
+        return True
+
+    def scanFolder(self, number, source, target, plan):
+        folders = [(source, target)]
+        while folders:
+            self.checkpoint()
+            path, dest = folders.pop()
+            subfolders = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        destPath = os.path.join(dest, entry.name)
+                        try:
+                            if entry.is_symlink():
+                                plan.append((number, "l", entry.path, destPath, 0))
+                            elif entry.is_dir():
+                                subfolders.append((entry.path, destPath))
+                            else:
+                                st = entry.stat(follow_symlinks=False)
+                                plan.append((number, "f", entry.path, destPath, st.st_size))
+                                self.totalBytes += st.st_size
+                                self.countHoles(entry.path, st)
+                        except OSError as e:
+                            self.error(entry.path, e, number)
+            except OSError as e:
+                self.error(path, e, number)
+            subfolders.sort(reverse=True)
+            for folder in subfolders:
+                plan.append((number, "d", folder[0], folder[1], 0))
+            folders.extend(subfolders)
+
+    ###################################################################
+    def run(self):
+        self.state = "running"
+        self.started = time.time()
+        try:
+            self.openJournal()
+            plan = self.scan()
+            ### folders first, then the files can be written in any order
+            files = []
+            for item in plan:
+                if item[1] == "d":
+                    self.checkpoint()
+                    self.copyOne(item)
+                else:
+                    files.append(item)
+            self.lanes = min([deviceLanes(self.destination)] +
+                             [deviceLanes(source) for source in self.sources])
+            if self.lanes > 1 and len(files) > 1:
+                self.copyParallel(files)
+            else:
+                for item in files:
+                    self.checkpoint()
+                    self.copyOne(item)
+            ### folders get their times back after the files are written
+            for number, kind, source, target, size in reversed(plan):
+                if kind == "d":
+                    try:
+                        shutil.copystat(source, target)
+                    except OSError:
+                        pass
+            if self.move:
+                for number, source in enumerate(self.sources):
+                    if number in self.broken or number in self.renamed:
+                        continue
+                    self.current = source
+                    try:
+                        if os.path.isdir(source) and not os.path.islink(source):
+                            shutil.rmtree(source)
+                        else:
+                            os.remove(source)
+                    except OSError as e:
+                        self.error(source, e)
+            self.state = "failed" if self.errors else "done"
+        except JobCancelled:
+            self.state = "cancelled"
+        except Exception as e:
+            self.fail(e)
+        finally:
+            self.closeJournal()
+        self.current = ""
+        self.finished = time.time()
+
+    def copyOne(self, item):
+        number, kind, source, target, size = item
+        self.current = source
+        ### only the sources themselves are taken back by undo, not what is inside them
+        top = source == self.sources[number]
+        fresh = not os.path.lexists(target)
+        try:
+            if kind == "d":
+                os.makedirs(target, exist_ok=True)
+            else:
+                if not fresh:
+                    if target in self.journal and (kind == "l" or sameFile(source, target)):
+                        ### finished by an earlier run of this job
+                        self.countSkipped(source, size, resumed=True)
+                        return
+                    resolved = self.resolve(source, target)
+                    if resolved is None:
+                        ### a move keeps the sources that were not copied
+                        self.broken.add(number)
+                        self.countSkipped(source, size)
+                        return
+                    ### keepBoth wrote to a new name
+                    fresh = resolved != target
+                    target = resolved
+                self.copyItem(kind, source, target)
+                ### a move deletes the source, so check what arrived
+                if self.move and kind == "f" and os.lstat(target).st_size != size:
+                    raise OSError(errno.EIO, "size differs after copy: " + target)
+                self.record(target)
+            if top and fresh:
+                with self.lock:
+                    self.created.append((number, source, target))
+        except JobCancelled:
+            raise
+        except (OSError, ValueError) as e:
+            self.error(source, e, number)
+        if kind != "d":
+            with self.lock:
+                self.doneFiles += 1
+
+    def countSkipped(self, source, size, resumed=False):
+        with self.lock:
+            self.doneFiles += 1
+            self.doneBytes += size
+            self.doneData += size - self.holes.get(source, 0)
+            if self.verify:
+                self.checkedBytes += size - self.holes.get(source, 0)
+            if resumed:
+                self.resumed += 1
+            else:
+                self.skipped += 1
+
+    ### the target for a source whose name is taken, None to skip it
+    def resolve(self, source, target):
+        policy = self.ask(target)
+        if policy == "skip":
+            return None
+        elif policy == "newer":
+            try:
+                if os.stat(source).st_mtime <= os.lstat(target).st_mtime:
+                    return None
+            except OSError:
+                pass
+        elif policy == "rename":
+            os.rename(target, freeName(target, "old"))
+        elif policy == "keepBoth":
+            return freeName(target)
+        return target
+
+    ### small files in plan order on all lanes, at most a quarter of the lanes for big files
+    def copyParallel(self, files):
+        small = deque(item for item in files if item[4] < bigFile)
+        big = deque(item for item in files if item[4] >= bigFile)
+        bigLanes = max(1, self.lanes // 4)
+        running = {}
+        bigRunning = 0
+        with ThreadPoolExecutor(self.lanes) as pool:
+            try:
+                while small or big or running:
+                    while len(running) < self.lanes * 2:
+                        if big and bigRunning < bigLanes:
+                            item = big.popleft()
+                            bigRunning += 1
+                        elif small:
+                            item = small.popleft()
+                        else:
+                            break
+                        running[pool.submit(self.copyOne, item)] = item
+                    done = wait(running, return_when=FIRST_COMPLETED)[0]
+                    for future in done:
+                        if running.pop(future)[4] >= bigFile:
+                            bigRunning -= 1
+                        future.result()
+            except JobCancelled:
+                self.cancel()
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+
+    ### written to a temp file of our own next to the target and renamed over it
+    ### when complete, the target is never half written, an existing one is replaced at once
+    def copyItem(self, kind, source, target):
+        link = os.readlink(source) if kind == "l" else None
+        while True:
+            temp = tempName(target)
+            try:
+                if kind == "l":
+                    os.symlink(link, temp)
+                else:
+                    ### verifying reads the copy back through the same descriptor
+                    dst = open(temp, "xb+" if self.verify else "xb")
+            except FileExistsError:
+                continue
+            break
+        self.recordTemp(temp, target)
+        try:
+            if kind != "l":
+                self.copyFile(source, dst, temp, target)
+            os.replace(temp, target)
+        except BaseException:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            raise
+
+    def copyFile(self, source, dst, temp, target):
+        with dst, open(source, "rb") as src:
+            if self.verify:
+                self.copyVerified(src.fileno(), dst.fileno(), target)
+            else:
+                self.copyData(src.fileno(), dst.fileno())
+        shutil.copystat(source, temp)
+
+    ### a bad copy raises and is removed, the target keeps what it had and
+    ### a move keeps its source
+    def copyVerified(self, src, dst, target):
+        size = os.fstat(src).st_size
+        hasher = newHash()
+        methods = ["readwrite"]
+        if size and dataSize(os.fstat(src)) < size:
+            methods = ["sparse", "readwrite"]
+        for method in methods:
+            try:
+                getattr(self, method)(src, dst, size, hasher)
+            except CopyUnsupported:
+                continue
+            break
+        ok = self.readBack(dst) == hasher.digest()
+        with self.lock:
+            self.report.append((target, ok))
+        if not ok:
+            raise OSError(errno.EIO, "checksum differs after copy: " + target)
+
+    ### the hash of what is on the disk now, holes hashed as the zeros they read as
+    def readBack(self, dst):
+        ### from the disk, not from the page cache
+        os.fsync(dst)
+        os.posix_fadvise(dst, 0, 0, os.POSIX_FADV_DONTNEED)
+        size = os.fstat(dst).st_size
+        check = newHash()
+        buffer = bytearray(bufferSize)
+        view = memoryview(buffer)
+        offset = 0
+        while offset < size:
+            self.checkpoint()
+            try:
+                start = os.lseek(dst, offset, os.SEEK_DATA)
+                end = os.lseek(dst, start, os.SEEK_HOLE)
+            except OSError as e:
+                if e.errno != errno.ENXIO:
+                    raise
+                start = end = size
+            hashZeros(check, start - offset)
+            offset = start
+            while offset < end:
+                self.checkpoint()
+                count = os.preadv(dst, [view[:min(bufferSize, end - offset)]], offset)
+                if count == 0:
+                    return check.digest()
+                check.update(view[:count])
+                offset += count
+                self.addChecked(count)
+        return check.digest()
+
+    def copyData(self, src, dst):
+        st = os.fstat(src)
+        size = st.st_size
+        key = (st.st_dev, os.fstat(dst).st_dev)
+        methods = copyMethods
+        ### empty or virtual files (/proc) report size 0, only read() sees their data
+        if size == 0:
+            first = copyMethods.index("readwrite")
+        elif dataSize(st) < size:
+            ### the kernel copies would fill the holes, sparse is not remembered
+            ### because the next file on the same devices may have none
+            methods = ["reflink", "sparse", "readwrite"]
+            first = 0 if copyMethodFor.get(key, "reflink") == "reflink" else 1
+        else:
+            first = copyMethods.index(copyMethodFor.get(key, copyMethods[0]))
+        for method in methods[first:]:
+            try:
+                getattr(self, method)(src, dst, size)
+            except CopyUnsupported:
+                os.lseek(src, 0, os.SEEK_SET)
+                os.lseek(dst, 0, os.SEEK_SET)
+                os.ftruncate(dst, 0)
+                continue
+            if size and method in copyMethods:
+                copyMethodFor[key] = method
+            return
+        raise OSError(errno.EOPNOTSUPP, "no copy method works for this file")
+
+    ### the methods raise CopyUnsupported only before the first byte is copied
+    def reflink(self, src, dst, size):
+        try:
+            fcntl.ioctl(dst, FICLONE, src)
+        except OSError as e:
+            if e.errno in unsupported:
+                raise CopyUnsupported()
+            raise
+        self.addBytes(size, dataSize(os.fstat(src)))
+
+    ### walks the data ranges with SEEK_DATA / SEEK_HOLE and writes only them,
+    ### the holes stay holes because nothing is written there
+    def sparse(self, src, dst, size, hasher=None):
+        buffer = bytearray(bufferSize)
+        view = memoryview(buffer)
+        offset = 0
+        while offset < size:
+            self.checkpoint()
+            try:
+                start = os.lseek(src, offset, os.SEEK_DATA)
+            except OSError as e:
+                ### ENXIO: nothing but a hole up to the end
+                if e.errno == errno.ENXIO:
+                    break
+                if offset == 0 and e.errno in unsupported:
+                    raise CopyUnsupported()
+                raise
+            end = os.lseek(src, start, os.SEEK_HOLE)
+            self.addBytes(start - offset, 0)
+            if hasher is not None:
+                hashZeros(hasher, start - offset)
+            offset = start
+            while offset < end:
+                self.checkpoint()
+                count = os.preadv(src, [view[:min(bufferSize, end - offset)]], offset)
+                if count == 0:
+                    ### the file got shorter while copying
+                    end = offset
+                    break
+                written = 0
+                while written < count:
+                    written += os.pwrite(dst, view[written:count], offset + written)
+                if hasher is not None:
+                    hasher.update(view[:count])
+                offset += count
+                self.addBytes(count)
+        ### a hole at the end is only the file size
+        os.ftruncate(dst, size)
+        if offset < size:
+            self.addBytes(size - offset, 0)
+            if hasher is not None:
+                hashZeros(hasher, size - offset)
+
+    def copy_file_range(self, src, dst, size):
+        if not hasattr(os, "copy_file_range"):
+            raise CopyUnsupported()
+        done = 0
+        while True:
+            self.checkpoint()
+            try:
+                count = os.copy_file_range(src, dst, chunkSize)
+            except OSError as e:
+                if done == 0 and e.errno in unsupported:
+                    raise CopyUnsupported()
+                raise
+            if count == 0:
+                if done == 0:
+                    raise CopyUnsupported()
+                break
+            done += count
+            self.addBytes(count)
+
+    def sendfile(self, src, dst, size):
+        done = 0
+        while True:
+            self.checkpoint()
+            try:
+                count = os.sendfile(dst, src, None, chunkSize)
+            except OSError as e:
+                if done == 0 and e.errno in unsupported:
+                    raise CopyUnsupported()
+                raise
+            if count == 0:
+                if done == 0:
+                    raise CopyUnsupported()
+                break
+            done += count
+            self.addBytes(count)
+
+    def readwrite(self, src, dst, size, hasher=None):
+        buffer = bytearray(bufferSize)
+        view = memoryview(buffer)
+        while True:
+            self.checkpoint()
+            count = os.readv(src, [buffer])
+            if count == 0:
+                break
+            written = 0
+            while written < count:
+                written += os.write(dst, view[written:count])
+            if hasher is not None:
+                hasher.update(view[:count])
+            self.addBytes(count)
+
+###################################################################
+### deleting files and whole trees bottom up: the files are unlinked in
+### batches on the lanes of the device, each batch through a descriptor
+### of its folder, then the folders are removed, the deepest first
+deleteBatch = 512
+
+class DeleteJob(BaseJob):
+    kind = "delete"
+
+    def __init__(self, sources):
+        super(DeleteJob, self).__init__(sources)
+        ### folders that keep something after an error, they and their parents stay
+        self.kept = set()
+
+    def title(self):
+        if len(self.sources) == 1:
+            name = os.path.basename(self.sources[0])
+        else:
+            name = "%s items" % len(self.sources)
+        return "deleting %s" % name
+
+    ### files and folders, there are no bytes to count
+    def progress(self):
+        return self.doneFiles, self.totalFiles
+
+    def run(self):
+        self.state = "running"
+        self.started = time.time()
+        try:
+            folders, batches = self.scan()
+            self.lanes = min([deviceLanes(source) for source in self.sources] or [1])
+            if self.lanes > 1 and len(batches) > 1:
+                self.unlinkParallel(batches)
+            else:
+                for batch in batches:
+                    self.unlinkBatch(*batch)
+            self.removeFolders(folders)
+            self.state = "failed" if self.errors else "done"
+        except JobCancelled:
+            self.state = "cancelled"
+        except Exception as e:
+            self.fail(e)
+        self.current = ""
+        self.finished = time.time()
+
+    ### folders parents first, batches (folder, names, inside a tree)
+    def scan(self):
+        folders = []
+        batches = []
+        for source in self.sources:
+            self.checkpoint()
+            try:
+                st = os.lstat(source)
+            except OSError as e:
+                self.error(source, e)
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                self.scanFolder(source, folders, batches)
+            else:
+                ### the folder of a selected file may be reached through a symlink
+                batches.append((os.path.dirname(source), [os.path.basename(source)], False))
+                self.totalFiles += 1
+        return folders, batches
+
+    def scanFolder(self, source, folders, batches):
+        stack = [source]
+        while stack:
+            self.checkpoint()
+            path = stack.pop()
+            self.current = path
+            folders.append(path)
+            self.totalFiles += 1
+            names = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            isFolder = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            isFolder = False
+                        if isFolder:
+                            stack.append(entry.path)
+                            continue
+                        names.append(entry.name)
+                        if len(names) == deleteBatch:
+                            batches.append((path, names, True))
+                            self.totalFiles += len(names)
+                            names = []
+            except OSError as e:
+                self.error(path, e)
+                self.kept.add(path)
+            if names:
+                batches.append((path, names, True))
+                self.totalFiles += len(names)
+
+    def unlinkParallel(self, batches):
+        pending = deque(batches)
+        running = set()
+        with ThreadPoolExecutor(self.lanes) as pool:
+            try:
+                while pending or running:
+                    while pending and len(running) < self.lanes * 2:
+                        running.add(pool.submit(self.unlinkBatch, *pending.popleft()))
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+            except JobCancelled:
+                self.cancel()
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+
+    ### inside a tree the folder must not have become a symlink since the scan
+    def unlinkBatch(self, folder, names, inTree):
+        self.checkpoint()
+        self.current = folder
+        flags = os.O_RDONLY | os.O_DIRECTORY
+        if inTree:
+            flags |= os.O_NOFOLLOW
+        try:
+            fd = os.open(folder, flags)
+        except OSError as e:
+            self.error(folder, e)
+            with self.lock:
+                self.kept.add(folder)
+                self.doneFiles += len(names)
+            return
+        try:
+            for number, name in enumerate(names):
+                if number % 64 == 63:
+                    self.checkpoint()
+                try:
+                    os.unlink(name, dir_fd=fd)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    self.error(os.path.join(folder, name), e)
+                    with self.lock:
+                        self.kept.add(folder)
+                with self.lock:
+                    self.doneFiles += 1
+        finally:
+            os.close(fd)
+
+    def removeFolders(self, folders):
+        for folder in reversed(folders):
+            self.checkpoint()
+            self.current = folder
+            if folder in self.kept:
+                self.kept.add(os.path.dirname(folder))
+            else:
+                try:
+                    os.rmdir(folder)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    self.error(folder, e)
+                    self.kept.add(os.path.dirname(folder))
+            self.doneFiles += 1
+
+###################################################################
+### moving to the trash: the .trashinfo files of a batch are written and
+### synced together, then every item is renamed into the trash of its mount.
+### only an item without a trash on its own filesystem is copied
+trashBatch = 256
+
+class TrashJob(BaseJob):
+    kind = "trash"
+
+    def __init__(self, sources):
+        super(TrashJob, self).__init__(sources)
+        ### (source, trash folder, name in the trash) of every trashed item
+        self.trashed = []
+
+    def title(self):
+        if len(self.sources) == 1:
+            name = os.path.basename(self.sources[0])
+        else:
+            name = "%s items" % len(self.sources)
+        return "moving %s to the trash" % name
+
+    def progress(self):
+        return self.doneFiles, self.totalFiles
+
+    def run(self):
+        self.state = "running"
+        self.started = time.time()
+        self.totalFiles = len(self.sources)
+        try:
+            trashes = {}
+            for source in self.sources:
+                self.checkpoint()
+                try:
+                    trashes.setdefault(xdgTrash.trashFor(source), []).append(source)
+                except OSError as e:
+                    self.error(source, e)
+                    self.doneFiles += 1
+            for (trash, topdir), sources in trashes.items():
+                for start in range(0, len(sources), trashBatch):
+                    self.trashBatch(trash, topdir, sources[start:start + trashBatch])
+            self.state = "failed" if self.errors else "done"
+        except JobCancelled:
+            self.state = "cancelled"
+        except Exception as e:
+            self.fail(e)
+        self.current = ""
+        self.finished = time.time()
+
+    def trashBatch(self, trash, topdir, sources):
+        self.checkpoint()
+        now = time.time()
+        names = []
+        for source in sources:
+            try:
+                names.append((source, xdgTrash.reserve(trash, source, xdgTrash.infoText(source, topdir, now))))
+            except OSError as e:
+                self.error(source, e)
+                self.doneFiles += 1
+        xdgTrash.syncInfo(trash)
+        done = 0
+        try:
+            for source, name in names:
+                self.checkpoint()
+                self.current = source
+                target = os.path.join(trash, "files", name)
+                try:
+                    try:
+                        os.rename(source, target)
+                    except OSError as e:
+                        if e.errno != errno.EXDEV:
+                            raise
+                        shutil.move(source, target)
+                    self.trashed.append((source, trash, name))
+                except OSError as e:
+                    self.error(source, e)
+                    xdgTrash.release(trash, name)
+                done += 1
+                self.doneFiles += 1
+        finally:
+            ### a cancelled batch leaves no info files without their item
+            for source, name in names[done:]:
+                xdgTrash.release(trash, name)
+
+### items (trash, name, original path) go back where they came from
+class RestoreJob(BaseJob):
+    kind = "restore"
+
+    def __init__(self, items):
+        super(RestoreJob, self).__init__([os.path.join(trash, "files", name) for trash, name, path in items])
+        self.items = items
+        ### original paths of the restored items
+        self.restored = []
+
+    def title(self):
+        if len(self.items) == 1:
+            name = os.path.basename(self.items[0][2])
+        else:
+            name = "%s items" % len(self.items)
+        return "restoring %s from the trash" % name
+
+    def progress(self):
+        return self.doneFiles, self.totalFiles
+
+    def run(self):
+        self.state = "running"
+        self.started = time.time()
+        self.totalFiles = len(self.items)
+        try:
+            for trash, name, path in self.items:
+                self.checkpoint()
+                self.current = path
+                try:
+                    xdgTrash.restore(trash, name, path)
+                    self.restored.append(path)
+                except OSError as e:
+                    self.error(path, e)
+                self.doneFiles += 1
+            self.state = "failed" if self.errors else "done"
+        except JobCancelled:
+            self.state = "cancelled"
+        except Exception as e:
+            self.fail(e)
+        self.current = ""
+        self.finished = time.time()
+
+### deletes items (trash, name) for good, or without items every item of every
+### trash deleted more than maxAge seconds ago, then the oldest ones until
+### the trashes hold less than budget bytes
+class PurgeJob(DeleteJob):
+    kind = "purge"
+
+    def __init__(self, items=None, maxAge=None, budget=None):
+        super(PurgeJob, self).__init__([os.path.join(trash, "files", name) for trash, name in items or []])
+        self.items = items
+        self.maxAge = maxAge
+        self.budget = budget
+        self.purged = 0
+
+    def title(self):
+        if self.items is None:
+            return "purging the trash"
+        elif len(self.items) == 1:
+            return "deleting %s from the trash" % self.items[0][1]
+        return "deleting %s items from the trash" % len(self.items)
+
+    ### without items the job picks from every trash when it runs, it uses all their devices
+    def devices(self):
+        if self.items is not None:
+            return super(PurgeJob, self).devices()
+        devices = set()
+        for trash in xdgTrash.trashes():
+            try:
+                devices.add(os.stat(trash).st_dev)
+            except OSError:
+                pass
+        return devices
+
+    def select(self):
+        now = time.time()
+        found = []
+        for trash in xdgTrash.trashes():
+            for name in xdgTrash.names(trash):
+                self.checkpoint()
+                self.current = name
+                path, when = xdgTrash.readInfo(trash, name)
+                found.append((when or 0.0, trash, name))
+        found.sort()
+        items = []
+        if self.maxAge is not None:
+            old = 0
+            while old < len(found) and now - found[old][0] >= self.maxAge:
+                items.append(found[old][1:])
+                old += 1
+            found = found[old:]
+        if self.budget is not None:
+            sizes = []
+            for when, trash, name in found:
+                self.checkpoint()
+                self.current = name
+                sizes.append(xdgTrash.itemSize(trash, name))
+            total = sum(sizes)
+            for (when, trash, name), size in zip(found, sizes):
+                if total <= self.budget:
+                    break
+                items.append((trash, name))
+                total -= size
+        return items
+
+    def run(self):
+        if self.items is None:
+            self.state = "running"
+            try:
+                self.items = self.select()
+            except JobCancelled:
+                self.state = "cancelled"
+            except Exception as e:
+                self.fail(e)
+            if self.items is None:
+                self.current = ""
+                self.finished = time.time()
+                return
+            self.sources = [os.path.join(trash, "files", name) for trash, name in self.items]
+        super(PurgeJob, self).run()
+        ### the info file goes last, an item that is left stays listed
+        for trash, name in self.items:
+            if not os.path.lexists(os.path.join(trash, "files", name)):
+                xdgTrash.release(trash, name)
+                self.purged += 1
@@ -0,0 +1,489 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### search backend for findFilesWindow (no Qt in here)
+import os
+import re
+import time
+import mmap
+import stat
+import csv
+import json
+import fnmatch
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+###################################################################
+### content search limits
+maxFileSize = 64 * 1048576
+maxMatches = 100
+snippetLength = 160
+binaryProbe = 8192
+chunkFiles = 32
+### the search runs on a QThread, forking that process could copy locks other
+### threads hold. the workers are forked from a server that has no threads,
+### they import the main script without running it (keep it behind __main__)
+mpContext = multiprocessing.get_context("forkserver")
+mpContext.set_forkserver_preload(["findEngine"])
+
+###################################################################
+### query language for the find field, terms separated by spaces:
+###   *.py *.txt          globs, any of them may match
+###   re:^test_.*\.py$    regular expression for the name
+###   ext:jpg,png         extension set
+###   type:f / type:d / type:l   file, folder, symlink (type:fd for both)
+###   size:>10M  size:<1k  size:1M..2G
+###   mtime:<7d (changed in the last 7 days)  mtime:>1y  mtime:2020-01-01..2020-12-31
+### QDir name filters are case insensitive, so are we
+### all terms except the globs must match
+sizeUnits = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+ageUnits = {"s": 1, "min": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "y": 365 * 86400}
+
+def parseSize(text):
+    m = re.match(r"^(\d+(?:\.\d+)?)\s*([kmgt]?)b?$", text.strip().lower())
+    if not m:
+        raise ValueError("invalid size: " + text)
+    return int(float(m.group(1)) * sizeUnits[m.group(2)])
+
+### a date is the period it names, a year, month, day or minute: (start, end, False)
+### an age (7d) is a point counted back from now: (point, point, True)
+def parseTime(text, now):
+    text = text.strip().lower()
+    m = re.match(r"^(\d+(?:\.\d+)?)(s|min|h|d|w|y)$", text)
+    if m:
+        point = now - float(m.group(1)) * ageUnits[m.group(2)]
+        return point, point, True
+    ### the field that is counted up for the start of the next period
+    for form, field in (("%Y-%m-%d %H:%M", 4), ("%Y-%m-%d", 2), ("%Y-%m", 1), ("%Y", 0)):
+        try:
+            t = time.strptime(text, form)
+        except ValueError:
+            continue
+        following = list(t[:6]) + [0, 0, -1]
+        following[field] += 1
+        ### mktime carries over, day 32 is the first of the next month
+        return time.mktime(t), time.mktime(tuple(following)), False
+    raise ValueError("invalid time: " + text)
+
+def parseRange(text, parse):
+    if ".." in text:
+        low, high = text.split("..", 1)
+        return (parse(low) if low else None), (parse(high) if high else None)
+    for op in (">=", "<=", ">", "<", "="):
+        if text.startswith(op):
+            value = parse(text[len(op):])
+            if op[0] == ">":
+                return value, None
+            elif op[0] == "<":
+                return None, value
+            return value, value
+    value = parse(text)
+    return value, value
+
+class Matcher(object):
+    def __init__(self):
+        self.globs = []
+        self.names = None
+        self.regex = None
+        self.exts = None
+        self.types = None
+        self.minSize = None
+        self.maxSize = None
+        self.minTime = None
+        self.maxTime = None
+
+    @property
+    def needStat(self):
+        return (self.minSize is not None or self.maxSize is not None
+                or self.minTime is not None or self.maxTime is not None)
+
+    ### everything that only needs the name, checked first
+    def matchName(self, name):
+        if self.exts is not None:
+            ext = name.rpartition(".")[2].lower() if "." in name else ""
+            if not ext in self.exts:
+                return False
+        if self.names is not None and not self.names(name):
+            return False
+        if self.regex is not None and not self.regex(name):
+            return False
+        return True
+
+    def matchStat(self, st):
+        if self.minSize is not None and st.st_size < self.minSize:
+            return False
+        if self.maxSize is not None and st.st_size > self.maxSize:
+            return False
+        if self.minTime is not None and st.st_mtime < self.minTime:
+            return False
+        ### maxTime is the first moment that is too new
+        if self.maxTime is not None and st.st_mtime >= self.maxTime:
+            return False
+        return True
+
+    ### DirEntry from scandir: type from d_type, stat only if a term needs it
+    def match(self, entry, isdir=None):
+        if not self.matchName(entry.name):
+            return False
+        try:
+            if self.types is not None:
+                if entry.is_symlink():
+                    kind = "l"
+                elif entry.is_dir() if isdir is None else isdir:
+                    kind = "d"
+                else:
+                    kind = "f"
+                if not kind in self.types:
+                    return False
+            if self.needStat:
+                return self.matchStat(entry.stat())
+        except OSError:
+            return False
+        return True
+
+    ### the same for a path without DirEntry (index results)
+    def matchPath(self, path):
+        if not self.matchName(os.path.basename(path)):
+            return False
+        try:
+            if self.types is not None:
+                st = os.lstat(path)
+                if stat.S_ISLNK(st.st_mode):
+                    kind = "l"
+                elif stat.S_ISDIR(st.st_mode):
+                    kind = "d"
+                else:
+                    kind = "f"
+                if not kind in self.types:
+                    return False
+            if self.needStat:
+                return self.matchStat(os.stat(path))
+        except OSError:
+            return False
+        return True
+
+    ### name filters for sqlite GLOB, lower case: (globs) and (extensions)
+    def sqlGlobs(self):
+        globs = [glob.lower().replace("[!", "[^") for glob in self.globs]
+        exts = ["*." + ext for ext in sorted(self.exts)] if self.exts else []
+        return globs, exts
+
+def compileQuery(text):
+    matcher = Matcher()
+    now = time.time()
+    for term in text.split():
+        key, sep, value = term.partition(":")
+        key = key.lower()
+        if not sep or not key in ("re", "ext", "type", "size", "mtime"):
+            matcher.globs.append(term)
+        elif key == "re":
+            try:
+                matcher.regex = re.compile(value, re.IGNORECASE).search
+            except re.error as e:
+                raise ValueError("invalid regular expression: " + str(e))
+        elif key == "ext":
+            exts = set(ext.lstrip(".").lower() for ext in value.split(",") if ext)
+            matcher.exts = exts if matcher.exts is None else matcher.exts & exts
+        elif key == "type":
+            types = set(value.lower())
+            if not types or not types <= set("fdl"):
+                raise ValueError("invalid type: " + value + " (use f, d or l)")
+            matcher.types = types
+        elif key == "size":
+            matcher.minSize, matcher.maxSize = parseRange(value, parseSize)
+            ### sizes are whole bytes, ">10M" starts one byte above
+            if value.startswith(">") and not value.startswith(">="):
+                matcher.minSize += 1
+            elif value.startswith("<") and not value.startswith("<="):
+                matcher.maxSize -= 1
+        else:
+            low, high = parseRange(value, lambda t: parseTime(t, now))
+            if low is None and high is None:
+                raise ValueError("invalid time: " + value)
+            if (low or high)[2]:
+                ### an age is a point, alone it would match nothing
+                if low is not None and high is not None and not ".." in value:
+                    raise ValueError("invalid time: " + value + " (use <, > or a range with an age)")
+                ### ages count backwards: "<7d" means newer than 7 days ago
+                low, high = high, low
+                matcher.minTime = low[0] if low else None
+                matcher.maxTime = high[0] if high else None
+            else:
+                ### dates include the whole period typed,
+                ### "<2020" ends where 2020 starts, ">2020" starts where it ends
+                after = value.startswith(">") and not value.startswith(">=")
+                before = value.startswith("<") and not value.startswith("<=")
+                matcher.minTime = (low[1] if after else low[0]) if low else None
+                matcher.maxTime = (high[0] if before else high[1]) if high else None
+    if matcher.globs:
+        pattern = "|".join(fnmatch.translate(glob) for glob in matcher.globs)
+        matcher.names = re.compile(pattern, re.IGNORECASE).match
+    return matcher
+
+### folders skipped by default, plain names or (with a slash) absolute paths
+defaultExcludes = ".git .svn .hg node_modules __pycache__ /proc /sys /dev /run"
+
+def compileExcludes(patterns):
+    if isinstance(patterns, str):
+        patterns = patterns.split()
+    names = [fnmatch.translate(p) for p in patterns if not "/" in p]
+    paths = [fnmatch.translate(p.rstrip("/") or "/") for p in patterns if "/" in p]
+    nameMatch = re.compile("|".join(names)).match if names else None
+    pathMatch = re.compile("|".join(paths)).match if paths else None
+    return nameMatch, pathMatch
+
+class Walker(object):
+    def __init__(self, root, findName, hidden=False, filesOnly=False,
+                 excludes=(), maxDepth=0, oneFilesystem=False):
+        self.root = root
+        if isinstance(findName, Matcher):
+            self.matcher = findName
+        else:
+            self.matcher = compileQuery(findName)
+        self.hidden = hidden
+        self.filesOnly = filesOnly
+        self.excludeName, self.excludePath = compileExcludes(excludes)
+        self.maxDepth = maxDepth
+        self.oneFilesystem = oneFilesystem
+        self.dirs = 0
+        self.hits = 0
+        self.pruned = 0
+
+    def excluded(self, entry):
+        if self.excludeName is not None and self.excludeName(entry.name):
+            return True
+        if self.excludePath is not None and self.excludePath(entry.path):
+            return True
+        return False
+
+    ### one pass over the tree, every folder is read once
+    ### yields (folder, [matching names]) after each folder
+    def walk(self):
+        try:
+            st = os.stat(self.root)
+        except OSError:
+            return
+        rootDev = st.st_dev
+        ### (dev, inode) of every folder we went into, ends symlink loops and bind mount cycles.
+        ### every folder is listed once, so every path is reported once, hard links each with its own
+        visited = set([(st.st_dev, st.st_ino)])
+        folders = [(self.root, 0)]
+        while folders:
+            path, depth = folders.pop()
+            descend = not self.maxDepth or depth < self.maxDepth
+            names = []
+            subfolders = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        name = entry.name
+                        if not self.hidden and name.startswith("."):
+                            continue
+                        try:
+                            ### d_type from readdir, no stat unless it is a symlink
+                            isdir = entry.is_dir()
+                        except OSError:
+                            isdir = False
+                        if not (isdir and self.filesOnly) and self.matcher.match(entry, isdir):
+                            names.append(name)
+                        if isdir and descend:
+                            if self.excluded(entry):
+                                self.pruned += 1
+                            else:
+                                subfolders.append(entry)
+            except OSError:
+                pass
+            self.dirs += 1
+            self.hits += len(names)
+            ### first come first served for folders seen twice, then popped in name order
+            subfolders.sort(key=lambda entry: entry.name)
+            below = []
+            for entry in subfolders:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if self.oneFilesystem and st.st_dev != rootDev:
+                    self.pruned += 1
+                    continue
+                key = (st.st_dev, st.st_ino)
+                if key in visited:
+                    continue
+                visited.add(key)
+                below.append((entry.path, depth + 1))
+            below.reverse()
+            folders.extend(below)
+            yield path, names
+
+
+###################################################################
+### content search, runs in the worker processes
+def countLines(mm, start, end):
+    count = 0
+    while start < end:
+        stop = min(end, start + 1048576)
+        count += mm[start:stop].count(b"\n")
+        start = stop
+    return count
+
+def grepFile(path, pattern, maxSize):
+    hits = []
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return hits
+    try:
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode) or st.st_size == 0 or st.st_size > maxSize:
+            return hits
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b"\0", 0, binaryProbe) >= 0:
+                return hits
+            line = 1
+            counted = 0
+            match = pattern.search(mm)
+            while match and len(hits) < maxMatches:
+                start = match.start()
+                line += countLines(mm, counted, start)
+                lineStart = mm.rfind(b"\n", 0, start) + 1
+                lineEnd = mm.find(b"\n", start)
+                if lineEnd < 0:
+                    lineEnd = len(mm)
+                begin = max(lineStart, start - snippetLength // 2)
+                snippet = mm[begin:min(lineEnd, begin + snippetLength)]
+                hits.append((line, snippet.decode("utf-8", "replace").strip()))
+                counted = start
+                ### one hit per line is enough
+                match = pattern.search(mm, lineEnd + 1)
+    except (OSError, ValueError):
+        pass
+    finally:
+        os.close(fd)
+    return hits
+
+def grepFiles(files, text, ignoreCase, maxSize):
+    flags = re.IGNORECASE if ignoreCase else 0
+    pattern = re.compile(re.escape(text.encode("utf-8")), flags)
+    results = []
+    for folder, name in files:
+        hits = grepFile(os.path.join(folder, name), pattern, maxSize)
+        if hits:
+            results.append((folder, name, hits))
+    return results
+
+class ContentSearch(object):
+    ### wraps a name search, the files it finds are read on a process pool
+    ### yields (folder, [(name, line, text)])
+    def __init__(self, walker, text, ignoreCase=True, maxSize=maxFileSize, workers=None):
+        self.walker = walker
+        self.text = text
+        self.ignoreCase = ignoreCase
+        self.maxSize = maxSize
+        self.workers = workers or os.cpu_count() or 1
+        self.files = 0
+        self.hits = 0
+
+    @property
+    def dirs(self):
+        return self.walker.dirs
+
+    def walk(self):
+        pool = ProcessPoolExecutor(self.workers, mp_context=mpContext)
+        running = set()
+        chunk = []
+        try:
+            for folder, names in self.walker.walk():
+                for name in names:
+                    chunk.append((folder, name))
+                if len(chunk) >= chunkFiles:
+                    running.add(pool.submit(grepFiles, chunk, self.text, self.ignoreCase, self.maxSize))
+                    self.files += len(chunk)
+                    chunk = []
+                done = set(f for f in running if f.done())
+                if len(running) >= self.workers * 4:
+                    done = wait(running, return_when=FIRST_COMPLETED)[0]
+                running -= done
+                for result in self.collect(done):
+                    yield result
+                ### one yield per folder so the caller can stop and report progress
+                yield folder, []
+            if chunk:
+                running.add(pool.submit(grepFiles, chunk, self.text, self.ignoreCase, self.maxSize))
+                self.files += len(chunk)
+            while running:
+                done = wait(running, return_when=FIRST_COMPLETED)[0]
+                running -= done
+                for result in self.collect(done):
+                    yield result
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def collect(self, futures):
+        for future in futures:
+            for folder, name, hits in future.result():
+                self.hits += len(hits)
+                yield folder, [(name, line, text) for line, text in hits]
+
+###################################################################
+### result lists, written and read one hit at a time
+###   .ndjson  {"path": "/a/b.txt"} or {"path": "/a/b.txt", "line": 3, "text": "..."}
+###   .csv     path,line,text
+### hits are (folder, name) or (folder, name, line, text)
+def writeResults(filename, hits):
+    count = 0
+    with open(filename, "w", encoding="utf-8", errors="surrogateescape", newline="") as f:
+        if filename.lower().endswith(".csv"):
+            writer = csv.writer(f)
+            writer.writerow(["path", "line", "text"])
+            for hit in hits:
+                path = os.path.join(hit[0], hit[1])
+                if len(hit) > 2:
+                    writer.writerow([path, hit[2], hit[3]])
+                else:
+                    writer.writerow([path, "", ""])
+                count += 1
+        else:
+            for hit in hits:
+                record = {"path": os.path.join(hit[0], hit[1])}
+                if len(hit) > 2:
+                    record["line"] = hit[2]
+                    record["text"] = hit[3]
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+### yields batches of (name, folder) or (name, folder, line, text), the rows of the result table
+def readResults(filename, batchSize=500):
+    batch = []
+    with open(filename, "r", encoding="utf-8", errors="surrogateescape", newline="") as f:
+        isCsv = filename.lower().endswith(".csv")
+        rows = csv.DictReader(f) if isCsv else (line for line in f if line.strip())
+        while True:
+            ### records that are broken or no hit are skipped, the rest is read
+            try:
+                row = next(rows)
+                record = row if isCsv else json.loads(row)
+            except StopIteration:
+                break
+            except (csv.Error, ValueError):
+                continue
+            if not isinstance(record, dict):
+                continue
+            path = record.get("path")
+            if not isinstance(path, str) or not os.path.isabs(path):
+                continue
+            folder, name = os.path.split(path)
+            line = record.get("line")
+            if line not in (None, ""):
+                try:
+                    line = int(line)
+                except (TypeError, ValueError):
+                    continue
+                text = record.get("text") or ""
+                batch.append((name, folder, line, text if isinstance(text, str) else str(text)))
+            else:
+                batch.append((name, folder))
+            if len(batch) >= batchSize:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
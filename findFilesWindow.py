@@ -2,12 +2,17 @@
 # -*- coding: utf-8 -*-
 ###################################################################
 import sys
+import time
 import csv, codecs 
-from PyQt5.QtCore import Qt, QDir, QFile, QFileInfo, QUrl, QStandardPaths
-from PyQt5.QtWidgets import (QMainWindow, QTableWidget, QTableWidgetItem, QCheckBox, 
+from array import array
+from PyQt5.QtCore import (Qt, QDir, QFile, QUrl, QStandardPaths, QThread, pyqtSignal,
+                                                            QAbstractTableModel, QModelIndex, QSettings)
+from PyQt5.QtWidgets import (QMainWindow, QTableView, QCheckBox, QSpinBox, 
                                                             QApplication, QAction, QMessageBox, QPushButton, 
                                                             QFileDialog, QHeaderView, QLineEdit, QAbstractItemView)
 from PyQt5.QtGui import QIcon, QDesktopServices
+import findEngine
+import fileIndex
 ###################################################################
 myblue = "#fce94f"
 home = QStandardPaths.standardLocations(QStandardPaths.HomeLocation)[0]
@@ -23,13 +28,287 @@ apps = QStandardPaths.standardLocations(QStandardPaths.ApplicationsLocation)[0]
 temp = QStandardPaths.standardLocations(QStandardPaths.TempLocation)[0]
 config = QStandardPaths.standardLocations(QStandardPaths.ConfigLocation)[0]
 appdata = QStandardPaths.standardLocations(QStandardPaths.AppDataLocation)[0]
+indexFolder = config + "/QFileManager"
+
+### results are sent to the window in batches, not one by one
+batchSize = 500
+batchInterval = 0.2
+
+class FindThread(QThread):
+    found = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, path, findName, hidden, useIndex=False, text="", matchCase=False, prune=None):
+        super(FindThread, self).__init__()
+        self.path = path
+        self.prune = prune or {}
+        self.findName = findName
+        self.hidden = hidden
+        self.useIndex = useIndex
+        self.text = text
+        self.matchCase = matchCase
+        self.index = None
+        self.indexRoot = None
+        self.walker = None
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+        if self.index is not None:
+            self.index.stopped = True
+
+    def run(self):
+        if self.useIndex:
+            self.index = fileIndex.FileIndex(indexFolder)
+            self.walker = fileIndex.IndexSearch(self.index, self.path, self.findName, self.hidden,
+                                                filesOnly=bool(self.text), **self.prune)
+        else:
+            self.walker = findEngine.Walker(self.path, self.findName, self.hidden, filesOnly=bool(self.text),
+                                            **self.prune)
+        if self.text:
+            self.walker = findEngine.ContentSearch(self.walker, self.text, not self.matchCase)
+        batch = []
+        lastEmit = time.monotonic()
+        walk = self.walker.walk()
+        for path, names in walk:
+            if self.stopped:
+                break
+            for name in names:
+                if self.text:
+                    batch.append((name[0], path, name[1], name[2]))
+                else:
+                    batch.append((name, path))
+            if len(batch) >= batchSize or time.monotonic() - lastEmit > batchInterval:
+                self.sendBatch(batch)
+                batch = []
+                lastEmit = time.monotonic()
+        walk.close()
+        self.sendBatch(batch)
+        if self.index is not None:
+            found = self.index.rootFor(self.path)
+            if found is not None:
+                self.indexRoot = found[1]
+            self.index.close()
+
+    def sendBatch(self, batch):
+        if batch:
+            self.found.emit(batch)
+        self.progress.emit(self.walker.dirs, self.walker.hits)
+
+class IndexThread(QThread):
+    progress = pyqtSignal(int)
+
+    def __init__(self, path):
+        super(IndexThread, self).__init__()
+        self.path = path
+        self.index = None
+        self.dirs = 0
+
+    def stop(self):
+        if self.index is not None:
+            self.index.stopped = True
+
+    def run(self):
+        self.index = fileIndex.FileIndex(indexFolder)
+        self.dirs = self.index.build(self.path, self.progress.emit)
+        self.index.close()
+
+### the results live in columns: one interned id per parent folder and the names,
+### rows are only appended at the end, sorting just permutes an index array
+### content search adds the line number and the text of the hit
+class ResultModel(QAbstractTableModel):
+    def __init__(self):
+        super(ResultModel, self).__init__()
+        self.headers = ["Filename", "Path"]
+        self.content = False
+        self.folders = []
+        self.folderIds = {}
+        self.parents = array('L')
+        self.names = []
+        self.lines = array('L')
+        self.texts = []
+        self.order = None
+
+    def clear(self, content=False):
+        self.beginResetModel()
+        self.content = content
+        if content:
+            self.headers = ["Filename", "Path", "Line", "Text"]
+        else:
+            self.headers = ["Filename", "Path"]
+        self.folders = []
+        self.folderIds = {}
+        self.parents = array('L')
+        self.names = []
+        self.lines = array('L')
+        self.texts = []
+        self.order = None
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.names)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole or role == Qt.ToolTipRole:
+            i = self.item(index.row())
+            column = index.column()
+            if column == 0:
+                return self.names[i]
+            elif column == 1:
+                return self.folders[self.parents[i]]
+            elif column == 2:
+                return self.lines[i]
+            return self.texts[i]
+        elif role == Qt.TextAlignmentRole and index.column() == 2:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    def item(self, row):
+        if self.order is None:
+            return row
+        return self.order[row]
+
+    def fileName(self, row):
+        return self.names[self.item(row)]
+
+    def folder(self, row):
+        return self.folders[self.parents[self.item(row)]]
+
+    def filePath(self, row):
+        i = self.item(row)
+        return self.folders[self.parents[i]] + "/" + self.names[i]
+
+    ### (folder, name) or (folder, name, line, text) in the order shown
+    def rows(self):
+        for row in range(len(self.names)):
+            i = self.item(row)
+            if self.content:
+                yield self.folders[self.parents[i]], self.names[i], self.lines[i], self.texts[i]
+            else:
+                yield self.folders[self.parents[i]], self.names[i]
+
+    def appendRows(self, batch):
+        if not batch:
+            return
+        first = len(self.names)
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        folderIds = self.folderIds
+        for hit in batch:
+            folder = hit[1]
+            folderId = folderIds.get(folder)
+            if folderId is None:
+                folderId = len(self.folders)
+                folderIds[folder] = folderId
+                self.folders.append(folder)
+            self.parents.append(folderId)
+            self.names.append(hit[0])
+            if self.content:
+                self.lines.append(hit[2])
+                self.texts.append(hit[3])
+        if self.order is not None:
+            self.order.extend(range(first, len(self.names)))
+        self.endInsertRows()
+
+    ### forget the given rows, for files that are gone
+    def dropRows(self, rows):
+        drop = set(self.item(row) for row in rows)
+        if not drop:
+            return
+        keep = [i for i in range(len(self.names)) if not i in drop]
+        self.beginResetModel()
+        self.parents = array('L', [self.parents[i] for i in keep])
+        self.names = [self.names[i] for i in keep]
+        if self.content:
+            self.lines = array('L', [self.lines[i] for i in keep])
+            self.texts = [self.texts[i] for i in keep]
+        if self.order is not None:
+            newRow = dict((i, n) for n, i in enumerate(keep))
+            self.order = array('L', [newRow[i] for i in self.order if not i in drop])
+        self.endResetModel()
+
+    ### rows of renamed files and of files in renamed folders show the new paths
+    def renamePaths(self, moves):
+        if not moves:
+            return
+        folders = []
+        for folder in self.folders:
+            parent, rest = folder, ""
+            while parent and parent != "/" and not parent in moves:
+                parent, name = parent.rsplit("/", 1)
+                rest = "/" + name + rest
+            folders.append(moves[parent] + rest if parent in moves else folder)
+        self.folders = folders
+        self.folderIds = dict((folder, folderId) for folderId, folder in enumerate(folders))
+        for i in range(len(self.names)):
+            new = moves.get(self.folders[self.parents[i]] + "/" + self.names[i])
+            if new is None:
+                continue
+            folder, self.names[i] = new.rsplit("/", 1)
+            folderId = self.folderIds.get(folder)
+            if folderId is None:
+                folderId = len(self.folders)
+                self.folderIds[folder] = folderId
+                self.folders.append(folder)
+            self.parents[i] = folderId
+        self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, self.columnCount() - 1))
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        oldOrder = self.order
+        count = len(self.names)
+        if column < 0:
+            self.order = None
+        else:
+            lowered = [name.lower() for name in self.names]
+            if column == 0:
+                key = lowered.__getitem__
+            elif column == 2:
+                key = self.lines.__getitem__
+            elif column == 3:
+                key = [text.lower() for text in self.texts].__getitem__
+            else:
+                folderRank = [0] * len(self.folders)
+                for rank, folderId in enumerate(sorted(range(len(self.folders)), key=self.folders.__getitem__)):
+                    folderRank[folderId] = rank
+                parents = self.parents
+                lines = self.lines
+                if self.content:
+                    key = lambda i: (folderRank[parents[i]], lowered[i], lines[i])
+                else:
+                    key = lambda i: (folderRank[parents[i]], lowered[i])
+            self.order = array('L', sorted(range(count), key=key, reverse=(order == Qt.DescendingOrder)))
+        ### keep the selection on the same files
+        newRow = array('L', range(count))
+        if self.order is not None:
+            for row, i in enumerate(self.order):
+                newRow[i] = row
+        persistent = self.persistentIndexList()
+        moved = []
+        for index in persistent:
+            i = index.row() if oldOrder is None else oldOrder[index.row()]
+            moved.append(self.index(newRow[i], index.column()))
+        self.changePersistentIndexList(persistent, moved)
+        self.layoutChanged.emit()
 
 class ListBox(QMainWindow):
     def __init__(self):
       super(ListBox, self).__init__()
-      self.fileList = []
-      self.folderlist = []
-      self.allFolders = []
+      self.findThread = None
+      ### stopped searches finish the folder they are reading
+      self.oldThreads = []
+      self.indexThread = None
       self.dir = QDir.homePath()
       self.subdir = QDir.homePath()
       self.setGeometry(0, 0, 800, 450)
@@ -47,11 +326,20 @@ class ListBox(QMainWindow):
                                             triggered=self.findMyFiles)
       self.findEdit.addAction(self.findAct, QLineEdit.LeadingPosition)
       self.findEdit.setPlaceholderText("find")
-      self.findEdit.setToolTip("for example: *word*")
+      self.findEdit.setToolTip("for example: *word*\n"
+                                          "several patterns: *.jpg *.png\n"
+                                          "re:^IMG_\\d+  ext:py,txt  type:f (f, d, l)\n"
+                                          "size:>10M  size:1k..5M  mtime:<7d  mtime:2020-01-01..2020-12-31")
       self.findEdit.setStatusTip("for example: *word*")
       self.tb.addWidget(self.findEdit)
       self.findEdit.returnPressed.connect(self.findMyFiles)
 
+      self.stopAct = QAction(QIcon.fromTheme('process-stop'), "stop", self,
+                                            statusTip="stop searching",
+                                            triggered=self.stopSearch)
+      self.stopAct.setEnabled(False)
+      self.tb.addAction(self.stopAct)
+
       self.tb.addSeparator()
 
       self.folderEdit = QLineEdit()
@@ -67,27 +355,76 @@ class ListBox(QMainWindow):
 
       self.tb.addSeparator()
 
-#      self.addToolBarBreak()
+      self.useIndex = QCheckBox("use index")
+      self.useIndex.setToolTip("search in the saved filename index\ninstead of reading the folders")
+      self.tb.addWidget(self.useIndex)
+      self.rebuildAct = QAction(QIcon.fromTheme('view-refresh'), "rebuild index", self,
+                                            statusTip="read the folder again into the filename index",
+                                            triggered=self.rebuildIndex)
+      self.tb.addAction(self.rebuildAct)
+      self.statsAct = QAction(QIcon.fromTheme('dialog-information'), "index statistics", self,
+                                            statusTip="show filename index statistics",
+                                            triggered=self.showIndexStats)
+      self.tb.addAction(self.statsAct)
+
+      self.tb.addSeparator()
+
+      self.exportAct = QAction(QIcon.fromTheme('document-save-as'), "export results", self,
+                                            statusTip="save the results as a list (NDJSON or CSV)",
+                                            triggered=self.exportResults)
+      self.tb.addAction(self.exportAct)
+
+      self.addToolBarBreak()
+      self.tb2 = self.addToolBar("Options")
+      self.tb2.setMovable(False)
+      self.tb2.setContextMenuPolicy(Qt.PreventContextMenu)
+      self.textEdit = QLineEdit()
+      self.textEdit.setPlaceholderText("containing text")
+      self.textEdit.setToolTip("search the contents of the found files\nleave empty to find by name only")
+      self.textEdit.setClearButtonEnabled(True)
+      self.textEdit.returnPressed.connect(self.findMyFiles)
+      self.tb2.addWidget(self.textEdit)
+      self.matchCase = QCheckBox("match case")
+      self.tb2.addWidget(self.matchCase)
+      self.tb2.addSeparator()
       self.noDot = QCheckBox("include hidden files")
-#      self.tb2 = self.addToolBar("hidden")
-#      self.tb2.addWidget(self.noDot)
+      self.tb2.addWidget(self.noDot)
+      self.tb2.addSeparator()
+      self.excludeEdit = QLineEdit()
+      self.excludeEdit.setPlaceholderText("exclude folders")
+      self.excludeEdit.setToolTip("folders to skip, names or absolute paths\nfor example: .git node_modules /proc")
+      self.tb2.addWidget(self.excludeEdit)
+      self.depthBox = QSpinBox()
+      self.depthBox.setRange(0, 999)
+      self.depthBox.setSpecialValueText("any depth")
+      self.depthBox.setPrefix("depth ")
+      self.depthBox.setToolTip("how many folder levels to search below the start folder")
+      self.tb2.addWidget(self.depthBox)
+      self.oneFs = QCheckBox("stay on this filesystem")
+      self.oneFs.setToolTip("do not search in mounted drives and network shares")
+      self.tb2.addWidget(self.oneFs)
+      self.settings = QSettings("QFileManager", "QFileManager")
+      self.excludeEdit.setText(self.settings.value("find/excludes", findEngine.defaultExcludes))
+      self.depthBox.setValue(int(self.settings.value("find/maxDepth", 0)))
+      self.oneFs.setChecked(self.settings.value("find/oneFilesystem", "false") == "true")
 ##Listbox########################################################## 
-      self.lb = QTableWidget()
+      self.model = ResultModel()
+      self.lb = QTableView()
+      self.lb.setModel(self.model)
       self.lb.setSelectionBehavior (QAbstractItemView.SelectRows)
-      self.lb.setColumnCount(2)
       self.lb.setColumnWidth(0, 300)
-#      self.lb.setSelectionBehavior(self.lb.SelectRows)
       self.lb.setSelectionMode(self.lb.SingleSelection)
-      self.lb.cellDoubleClicked.connect(self.doubleClicked)
-      self.lb.itemClicked.connect(self.getItem)
+      self.lb.doubleClicked.connect(self.doubleClicked)
+      self.lb.clicked.connect(self.getItem)
       self.lb.setEditTriggers(QAbstractItemView.NoEditTriggers)
-      self.lb.horizontalHeader().setStretchLastSection(True)
       self.lb.setAlternatingRowColors(True)
+      self.lb.setWordWrap(False)
+      self.lb.horizontalHeader().setStretchLastSection(True)
+      self.lb.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+      self.lb.setSortingEnabled(True)
       self.verticalHeader = QHeaderView(Qt.Vertical)
       self.lb.setVerticalHeader(self.verticalHeader)
-      self.lb.horizontalHeader().setStretchLastSection(True)
-      self.lb.setHorizontalHeaderItem(0, QTableWidgetItem("Filename"))
-      self.lb.setHorizontalHeaderItem(1, QTableWidgetItem("Path"))
+      self.verticalHeader.setSectionResizeMode(QHeaderView.Fixed)
       self.verticalHeader.setDefaultSectionSize(24)
       self.lb.verticalHeader().hide()
       self.lb.setToolTip("double click first column to open file\nsecond column to open file parent folder")
@@ -109,14 +446,7 @@ class ListBox(QMainWindow):
 
     def removeAllRows(self):
         print("removing all rows")
-        for row in range(0, self.lb.rowCount()):
-            self.lb.removeRow(row)
-
-    def removeDuplicates(self):
-        for row in range(self.lb.rowCount()):
-            if self.lb.item(row, 1) == self.lb.item(row + 1, 1):
-                print("removing Row", str(row))
-                self.lb.removeRow(row)
+        self.model.clear()
 
     def selectedRow(self):
         if self.lb.selectionModel().hasSelection():
@@ -127,38 +457,31 @@ class ListBox(QMainWindow):
         column =  self.lb.selectionModel().selectedIndexes()[0].column()
         return int(column)
 
-    def getItem(self):
-        row = self.selectedRow()
-        column = self.selectedColumn()
-        item = self.lb.item(row, column)
-        if column == 1:
-            myfile = item.text()
+    def getItem(self, index):
+        if index.column() == 1:
+            myfile = self.model.folder(index.row())
         else:
-            myfile = self.lb.item(row, 1).text() + "/" + self.lb.item(row, 0).text() 
+            myfile = self.model.filePath(index.row())
         self.msg(myfile, 0)
 
     def copyPath(self):
         if self.lb.selectionModel().hasSelection():
             row = self.selectedRow()
-            column = self.selectedColumn()
-            myfile = self.lb.item(row, 1).text() + "/" + self.lb.item(row, 0).text() 
+            myfile = self.model.filePath(row)
             clip = QApplication.clipboard()
             clip.setText(myfile)
             self.msg("filepath copied!", 0)
         else:
             self.msg("nothing selected!", 0)
 
-    def doubleClicked(self):
-        row = self.selectedRow()
-        column = self.selectedColumn()
-        item = self.lb.item(row, column)
-        if column == 1:
-            myfile = item.text()
+    def doubleClicked(self, index):
+        if index.column() == 1:
+            myfile = self.model.folder(index.row())
         else:
-            myfile = self.lb.item(row, 1).text() + "/" + self.lb.item(row, 0).text() 
+            myfile = self.model.filePath(index.row())
         if QFile.exists(myfile):
             print("file exists: ", myfile)
-            QDesktopServices.openUrl(QUrl("file://" + myfile))
+            QDesktopServices.openUrl(QUrl.fromLocalFile(myfile))
 
     def setFolder(self):
         self.dir = ""
@@ -175,62 +498,118 @@ class ListBox(QMainWindow):
         self.dir = self.folderEdit.text()
 
     def findMyFiles(self):
-        self.folderlist = []
-        self.allFolders = []
-        self.lb.clearContents()
+        self.stopSearch()
+        text = self.textEdit.text()
+        self.model.clear(text != "")
+        self.lb.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
         self.dir = self.folderEdit.text()
-        if not self.findEdit.text() == "*":
-            self.lb.setRowCount(0)
-            self.findFiles(self.dir)
-            self.findFolders(self.dir)
-            self.findSufolders()
-            self.getFiles()
-            self.removeDuplicates()
-            if not self.lb.rowCount() == 0:
-                self.msg("found " + str(self.lb.rowCount()) + " Files", 0)
-            else:
-                self.msg("nothing found", 0)
+        if not self.findEdit.text().strip() in ("", "*") or text:
+            try:
+                matcher = findEngine.compileQuery(self.findEdit.text())
+            except ValueError as e:
+                self.msg(str(e), 0)
+                self.msgbox(str(e))
+                return
+            self.msg("searching in " + self.dir, 0)
+            prune = dict(excludes=self.excludeEdit.text(), maxDepth=self.depthBox.value(),
+                                    oneFilesystem=self.oneFs.isChecked())
+            self.findThread = FindThread(self.dir, matcher, self.noDot.isChecked(),
+                                                        self.useIndex.isChecked(), text, self.matchCase.isChecked(), prune)
+            self.findThread.found.connect(self.addResults)
+            self.findThread.progress.connect(self.showProgress)
+            self.findThread.finished.connect(self.searchFinished)
+            self.stopAct.setEnabled(True)
+            self.findThread.start()
         else:
             message = "please type a word to find"
             self.msg(message, 0) 
             self.msgbox(message)  
 
-    def findFolders(self, path):
-        fileName = "*"
-        currentDir = QDir(path)
-        if self.noDot.isChecked():
-            files = currentDir.entryList([fileName], QDir.AllDirs)
+    def stopSearch(self):
+        if self.findThread is not None and self.findThread.isRunning():
+            self.findThread.stop()
+            self.oldThreads = [thread for thread in self.oldThreads
+                               if thread.isRunning() and not thread is self.findThread] + [self.findThread]
+
+    def addResults(self, batch):
+        if not self.sender() is self.findThread:
+            return
+        self.model.appendRows(batch)
+
+    def showProgress(self, dirs, hits):
+        if self.sender() is self.findThread:
+            self.msg("%s dirs scanned, %s hits" % (dirs, hits), 0)
+
+    def searchFinished(self):
+        if not self.sender() is self.findThread:
+            return
+        self.stopAct.setEnabled(False)
+        if self.findThread.indexRoot is not None:
+            fileIndex.startWatcher(indexFolder).addRoot(self.findThread.indexRoot)
+        what = " Lines" if self.model.content else " Files"
+        if self.findThread.stopped:
+            self.msg("search stopped, found " + str(self.model.rowCount()) + what, 0)
+        elif not self.model.rowCount() == 0:
+            self.msg("found " + str(self.model.rowCount()) + what, 0)
+        else:
+            self.msg("nothing found", 0)
+
+    def exportResults(self):
+        if self.model.rowCount() == 0:
+            self.msg("nothing to export", 0)
+            return
+        filename, filter = QFileDialog.getSaveFileName(self, "export results", self.dir + "/results.ndjson",
+                                                "result lists (*.ndjson);;CSV files (*.csv)")
+        if not filename:
+            return
+        if not filename.lower().endswith((".ndjson", ".csv")):
+            filename += ".csv" if "csv" in filter.lower() else ".ndjson"
+        try:
+            count = findEngine.writeResults(filename, self.model.rows())
+        except OSError as e:
+            self.msgbox(str(e))
+            return
+        self.msg("%s results saved to %s" % (count, filename), 0)
+
+    def rebuildIndex(self):
+        if self.indexThread is not None and self.indexThread.isRunning():
+            self.indexThread.stop()
+            return
+        self.dir = self.folderEdit.text()
+        if not QDir(self.dir).exists():
+            self.msgbox("folder not found: " + self.dir)
+            return
+        self.indexThread = IndexThread(self.dir)
+        self.indexThread.progress.connect(self.showIndexProgress)
+        self.indexThread.finished.connect(self.indexFinished)
+        self.rebuildAct.setText("stop indexing")
+        self.msg("indexing " + self.dir, 0)
+        self.indexThread.start()
+
+    def showIndexProgress(self, dirs):
+        self.msg("indexing " + self.indexThread.path + ": " + str(dirs) + " dirs", 0)
+
+    def indexFinished(self):
+        self.rebuildAct.setText("rebuild index")
+        if self.indexThread.index.stopped:
+            self.msg("indexing stopped", 0)
+        else:
+            self.msg("indexed " + str(self.indexThread.dirs) + " dirs in " + self.indexThread.path, 0)
+            fileIndex.startWatcher(indexFolder).addRoot(self.indexThread.path)
+
+    def showIndexStats(self):
+        index = fileIndex.FileIndex(indexFolder)
+        roots, size = index.stats()
+        index.close()
+        if not roots:
+            message = "no folders indexed yet"
         else:
-            files = currentDir.entryList([fileName], QDir.AllDirs | QDir.NoDotAndDotDot)
-        for line in files:
-            self.folderlist.append(path + "/" + line)
-    
-    def findSufolders(self):
-        for folders in self.folderlist:   
-            self.allFolders.append(folders)
-            self.findNewFolders(folders)
-    
-    def findNewFolders(self, path):
-        fileName = "*"
-        currentDir = QDir(path)
-        files = currentDir.entryList([fileName], QDir.AllDirs | QDir.NoDotAndDotDot)
-        for line in files:
-            self.allFolders.append(path + "/" + line)
-            self.findNewFolders(path + "/" + line)
-    
-    def findFiles(self, path):
-        findName = self.findEdit.text()
-        currentDir = QDir(path)
-        self.msg("searching in " + currentDir.path(), 0)
-        files = currentDir.entryList([findName], QDir.AllEntries | QDir.System | QDir.Drives)
-        for line in files:
-            self.lb.insertRow(0)
-            self.lb.setItem(0, 0, QTableWidgetItem(line))
-            self.lb.setItem(0, 1, QTableWidgetItem(path)) # + "/" + line))
-    
-    def getFiles(self):
-        for mf in self.allFolders:
-            self.findFiles(mf)
+            message = ""
+            for path, dirs, files, built in roots:
+                message += "%s\n    %s dirs, %s entries, built %s\n" % (path, dirs, files,
+                                    time.strftime("%Y-%m-%d %H:%M", time.localtime(built)))
+            message += "\nindex size: %.1f MB" % (size / 1048576.0)
+        QMessageBox.information(self, "Filename Index", message)
 
     def changeFolder(self):
         newfolder = QFileDialog.getExistingDirectory(self, "Find Files", self.dir)
@@ -238,6 +617,17 @@ class ListBox(QMainWindow):
             self.folderEdit.setText(newfolder)
 
     def closeEvent(self, event):
+        for thread in self.oldThreads + [self.findThread]:
+            if thread is not None:
+                thread.stop()
+                thread.wait()
+        self.oldThreads = []
+        if self.indexThread is not None:
+            self.indexThread.stop()
+            self.indexThread.wait()
+        self.settings.setValue("find/excludes", self.excludeEdit.text())
+        self.settings.setValue("find/maxDepth", self.depthBox.value())
+        self.settings.setValue("find/oneFilesystem", self.oneFs.isChecked())
         print("goodbye")
 
     def msg(self, message, timeout):
@@ -249,7 +639,7 @@ class ListBox(QMainWindow):
 ##stylesheet##########################################################
 def stylesheet(self):
         return """
-QTableWidget
+QTableView
 {
 background: #e9e9e9;
 selection-color: white;
@@ -258,10 +648,10 @@ selection-background-color: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1, stop: 0
 color: #202020;
 outline: 0;
 } 
-QTableWidget::item::hover{
+QTableView::item::hover{
 background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1, stop: 0 #babdb6, stop: 0.5 #d3d7cf, stop: 1 #babdb6);
 }
-QTableWidget::item::focus
+QTableView::item::focus
 {
 background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1, stop: 0 #729fcf, stop: 1  #204a87);
 border: 0px;
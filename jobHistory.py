@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### finished copy, move, delete and zip jobs (no Qt in here)
+### one small sqlite file, the oldest rows go when there are too many
+import os
+import time
+import sqlite3
+###################################################################
+historyName = "jobs.sqlite"
+maxRows = 1000
+
+schema = """
+CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY, finished REAL, kind TEXT, title TEXT,
+                                    state TEXT, files INTEGER, bytes INTEGER, seconds REAL,
+                                    rate REAL, errors INTEGER);
+"""
+
+class JobHistory(object):
+    def __init__(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, historyName)
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.executescript(schema)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def add(self, job):
+        finished = job.finished or time.time()
+        seconds = finished - job.started - job.pausedTime if job.started else 0.0
+        self.db.execute("INSERT INTO history (finished, kind, title, state, files, bytes, seconds, rate, errors) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (finished, job.kind, job.title(), job.state, job.doneFiles, job.doneBytes,
+                         max(0.0, seconds), job.averageRate(), len(job.errors)))
+        self.db.execute("DELETE FROM history WHERE id <= (SELECT MAX(id) FROM history) - ?", (maxRows,))
+        self.db.commit()
+
+    ### (finished, kind, title, state, files, bytes, seconds, rate, errors), newest first
+    def recent(self, limit=200):
+        return self.db.execute("SELECT finished, kind, title, state, files, bytes, seconds, rate, errors "
+                               "FROM history ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+    def clear(self):
+        self.db.execute("DELETE FROM history")
+        self.db.commit()
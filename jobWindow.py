@@ -0,0 +1,394 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### runs fileJobs on worker threads and shows their progress
+### in the status bar of the file managers and in the job queue dock
+from PyQt5.QtCore import Qt, QThread, QTimer, QStandardPaths, QSettings, QPointF, pyqtSignal
+from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout, QLabel, QProgressBar, QToolButton, QMessageBox,
+                             QFileSystemModel, QDockWidget, QTableWidget, QTableWidgetItem, QHeaderView,
+                             QAbstractItemView, QPushButton, QSplitter)
+from PyQt5.QtGui import QIcon, QPainter, QPen, QColor, QPolygonF
+import os
+import time
+import sqlite3
+from collections import deque
+import fileJobs
+import jobHistory
+###################################################################
+refreshInterval = 250
+config = QStandardPaths.standardLocations(QStandardPaths.ConfigLocation)[0]
+### journals of unfinished jobs, pasting the same again resumes them
+journalFolder = config + "/QFileManager/jobs"
+historyFolder = config + "/QFileManager"
+### rate samples per job for the graph, one per refresh: the last minute
+graphPoints = 240
+historyRows = 200
+policyButtons = [("skip", "Skip"), ("overwrite", "Overwrite"), ("newer", "Overwrite if newer"),
+                 ("rename", "Rename existing"), ("keepBoth", "Keep both")]
+
+class JobThread(QThread):
+    def __init__(self, job):
+        super(JobThread, self).__init__()
+        self.job = job
+
+    def run(self):
+        self.job.run()
+
+### QFileSystemModel copies dropped files itself and the window hangs until it is done,
+### this one hands copy and move drops (SHIFT) to the window as a job
+class JobFileSystemModel(QFileSystemModel):
+    dropRequested = pyqtSignal(list, str, bool)
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if not data.hasUrls() or action not in (Qt.CopyAction, Qt.MoveAction):
+            ### links are quick, Qt makes them
+            return super(JobFileSystemModel, self).dropMimeData(data, action, row, column, parent)
+        destination = self.filePath(parent) if parent.isValid() else self.rootPath()
+        if not os.path.isdir(destination):
+            destination = os.path.dirname(destination)
+        ### dropped back onto the folder they came from
+        sources = [url.toLocalFile() for url in data.urls()
+                   if url.isLocalFile() and os.path.dirname(url.toLocalFile().rstrip("/")) != destination]
+        if not sources:
+            return False
+        self.dropRequested.emit(sources, destination, action == Qt.MoveAction)
+        return True
+
+class JobBar(QWidget):
+    jobFinished = pyqtSignal(object)
+    ### a job was started, queued or has finished
+    jobsChanged = pyqtSignal()
+
+    def __init__(self, progressBar=None, parent=None):
+        super(JobBar, self).__init__(parent)
+        self.threads = []
+        ### jobs waiting for a device that a running job uses
+        self.queued = []
+        self.devices = {}
+        self.rates = {}
+        self.asking = False
+        try:
+            self.history = jobHistory.JobHistory(historyFolder)
+        except (sqlite3.Error, OSError) as e:
+            ### the jobs work without a history
+            print("no job history:", e)
+            self.history = None
+        if progressBar is None:
+            progressBar = QProgressBar()
+            progressBar.setFixedHeight(18)
+            progressBar.setFixedWidth(200)
+        self.progressBar = progressBar
+        self.progressBar.setMaximum(100)
+        self.progressBar.setValue(0)
+        self.label = QLabel()
+        self.pauseBtn = QToolButton()
+        self.pauseBtn.setIcon(QIcon.fromTheme("media-playback-pause"))
+        self.pauseBtn.setToolTip("pause / resume the jobs")
+        self.pauseBtn.setCheckable(True)
+        self.pauseBtn.toggled.connect(self.pauseJobs)
+        self.cancelBtn = QToolButton()
+        self.cancelBtn.setIcon(QIcon.fromTheme("process-stop"))
+        self.cancelBtn.setToolTip("cancel the jobs")
+        self.cancelBtn.clicked.connect(self.cancelJobs)
+        ### stays enabled while idle, it is for the next paste
+        self.settings = QSettings("QFileManager", "QFileManager")
+        self.verifyBtn = QToolButton()
+        self.verifyBtn.setIcon(QIcon.fromTheme("security-high"))
+        self.verifyBtn.setToolTip("verify copies: compare checksums of source and destination\n"
+                                  "a move removes the source only when they match")
+        self.verifyBtn.setCheckable(True)
+        self.verifyBtn.setChecked(self.settings.value("jobs/verify", "false") == "true")
+        self.verifyBtn.toggled.connect(self.verifyToggled)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.label)
+        layout.addWidget(self.progressBar)
+        layout.addWidget(self.pauseBtn)
+        layout.addWidget(self.cancelBtn)
+        layout.addWidget(self.verifyBtn)
+        self.setLayout(layout)
+        self.timer = QTimer(self)
+        self.timer.setInterval(refreshInterval)
+        self.timer.timeout.connect(self.updateProgress)
+        self.setIdle()
+
+    def verify(self):
+        return self.verifyBtn.isChecked()
+
+    def verifyToggled(self, checked):
+        self.settings.setValue("jobs/verify", "true" if checked else "false")
+
+    def jobs(self):
+        return [thread.job for thread in self.threads]
+
+    ### a disk does one job at a time, two jobs on it would only make both slow.
+    ### while the bar is paused new jobs wait too, resuming starts them
+    def submit(self, job):
+        self.devices[job] = job.devices()
+        self.pauseBtn.setEnabled(True)
+        self.cancelBtn.setEnabled(True)
+        if self.pauseBtn.isChecked() or self.busy(job):
+            job.state = "queued"
+            self.queued.append(job)
+        else:
+            self.start(job)
+        self.timer.start()
+        self.updateProgress()
+        self.jobsChanged.emit()
+
+    def busy(self, job):
+        return any(self.devices[job] & self.devices[other] for other in self.jobs())
+
+    def start(self, job):
+        thread = JobThread(job)
+        thread.finished.connect(self.threadFinished)
+        self.threads.append(thread)
+        self.rates[job] = deque(maxlen=graphPoints)
+        thread.start()
+
+    ### in the order they came, a job waits behind an earlier one for the same device
+    def startQueued(self):
+        if self.pauseBtn.isChecked():
+            return
+        waiting = []
+        for job in self.queued:
+            if self.busy(job) or any(self.devices[job] & self.devices[other] for other in waiting):
+                waiting.append(job)
+            else:
+                self.start(job)
+        self.queued = waiting
+
+    def pauseJobs(self, paused):
+        for job in self.jobs():
+            if paused:
+                job.pause()
+            else:
+                job.resume()
+        if not paused:
+            self.startQueued()
+            self.jobsChanged.emit()
+        self.updateProgress()
+
+    def cancelJobs(self):
+        for job in self.jobs():
+            job.cancel()
+        queued, self.queued = self.queued, []
+        for job in queued:
+            job.cancel()
+            job.state = "cancelled"
+            job.finished = time.time()
+            self.finish(job)
+        if queued and not self.threads:
+            self.setIdle()
+
+    ### cancel everything and wait, before the window goes away
+    def stopAll(self):
+        self.cancelJobs()
+        for thread in self.threads:
+            thread.wait()
+
+    def updateProgress(self):
+        jobs = self.jobs()
+        if not jobs:
+            return
+        for job in jobs:
+            if job.question is not None and not self.asking:
+                self.askPolicy(job)
+        ### progress and rate count the data, sparse files would jump over their holes
+        total = sum(job.totalData for job in jobs)
+        done = sum(job.doneData for job in jobs)
+        ### copies count bytes, deletes count files, so each job gets the same share of the bar
+        work = [job.progress() for job in jobs]
+        logical = sum(job.totalBytes for job in jobs)
+        files = sum(job.doneFiles for job in jobs)
+        totalFiles = sum(job.totalFiles for job in jobs)
+        rate = sum(job.rate() for job in jobs)
+        fraction = sum(min(1.0, float(done) / total) for done, total in work if total)
+        self.progressBar.setValue(int(fraction * 100 / len(jobs)))
+        if totalFiles == 0:
+            text = "counting files ... %s" % fileJobs.formatSize(total)
+        elif total == 0:
+            text = "%s of %s files" % (files, totalFiles)
+        else:
+            text = "%s of %s files, %s of %s" % (files, totalFiles, fileJobs.formatSize(done),
+                                                 fileJobs.formatSize(total))
+            if logical != total:
+                text += " on disk (%s of %s logical)" % (fileJobs.formatSize(sum(job.doneBytes for job in jobs)),
+                                                        fileJobs.formatSize(logical))
+        if self.pauseBtn.isChecked():
+            text += ", paused"
+        elif rate > 0:
+            left = [job.eta() for job in jobs if job.eta() is not None]
+            text += ", %s/s, %s left" % (fileJobs.formatSize(rate), fileJobs.formatTime(max(left or [0])))
+        if any(job.verify for job in jobs):
+            text += ", verifying"
+        if self.queued:
+            text += ", %s waiting" % len(self.queued)
+        self.label.setText(text)
+        self.setToolTip("\n".join([job.title() for job in jobs] +
+                                  ["waiting: " + job.title() for job in self.queued]))
+        for job in jobs:
+            if job in self.rates:
+                self.rates[job].append(job.rate())
+
+    ### one question per job, the answer counts for all its conflicts
+    def askPolicy(self, job):
+        self.asking = True
+        msg = QMessageBox(QMessageBox.Question, "File exists",
+                          "%s\nalready exists.\n\nWhat should happen to the files of this job "
+                          "that are already there?" % job.question, QMessageBox.NoButton, self.window())
+        buttons = {}
+        for policy, text in policyButtons:
+            buttons[msg.addButton(text, QMessageBox.AcceptRole)] = policy
+        msg.addButton(QMessageBox.Cancel)
+        msg.exec_()
+        policy = buttons.get(msg.clickedButton())
+        if policy is None:
+            job.cancel()
+        else:
+            job.answer(policy)
+        self.asking = False
+
+    def threadFinished(self):
+        thread = self.sender()
+        if thread in self.threads:
+            self.threads.remove(thread)
+        self.finish(thread.job)
+        self.startQueued()
+        if self.threads or self.queued:
+            self.updateProgress()
+        else:
+            self.setIdle()
+
+    def finish(self, job):
+        self.devices.pop(job, None)
+        self.rates.pop(job, None)
+        if self.history is not None:
+            try:
+                self.history.add(job)
+            except sqlite3.Error as e:
+                print("job history:", e)
+        self.jobFinished.emit(job)
+        self.jobsChanged.emit()
+
+    def setIdle(self):
+        self.timer.stop()
+        self.progressBar.setValue(0)
+        self.label.setText("")
+        self.setToolTip("")
+        self.pauseBtn.setChecked(False)
+        self.pauseBtn.setEnabled(False)
+        self.cancelBtn.setEnabled(False)
+
+### the rate of a job over the last minute
+class Sparkline(QWidget):
+    def __init__(self, rates, parent=None):
+        super(Sparkline, self).__init__(parent)
+        self.rates = rates
+        self.setMinimumSize(120, 20)
+
+    def paintEvent(self, event):
+        if len(self.rates) < 2:
+            return
+        top = max(self.rates) or 1.0
+        width = self.width() - 1
+        height = self.height() - 2
+        step = width / float(graphPoints - 1)
+        start = width - step * (len(self.rates) - 1)
+        line = QPolygonF([QPointF(start + n * step, 1 + height - rate * height / top)
+                          for n, rate in enumerate(self.rates)])
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor("#204a87"), 1.5))
+        painter.drawPolyline(line)
+        painter.end()
+
+### running and waiting jobs with their rate graphs, and the jobs of the last sessions
+class JobQueueDock(QDockWidget):
+    def __init__(self, jobBar, parent=None):
+        super(JobQueueDock, self).__init__("Jobs", parent)
+        self.setObjectName("jobQueue")
+        self.jobBar = jobBar
+        self.shown = []
+        self.active = QTableWidget(0, 5)
+        self.active.setHorizontalHeaderLabels(["Job", "State", "Progress", "Rate", "last Minute"])
+        self.history = QTableWidget(0, 7)
+        self.history.setHorizontalHeaderLabels(["Finished", "Job", "State", "Files", "Size", "Time", "Rate"])
+        for table in (self.active, self.history):
+            table.verticalHeader().hide()
+            table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            table.setSelectionBehavior(QAbstractItemView.SelectRows)
+            table.setWordWrap(False)
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.active.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.history.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.clearBtn = QPushButton("clear history")
+        self.clearBtn.setFlat(True)
+        self.clearBtn.clicked.connect(self.clearHistory)
+        self.clearBtn.setEnabled(jobBar.history is not None)
+        bottom = QWidget()
+        bottomLayout = QVBoxLayout()
+        bottomLayout.setContentsMargins(0, 0, 0, 0)
+        bottomLayout.addWidget(self.history)
+        bottomLayout.addWidget(self.clearBtn, 0, Qt.AlignRight)
+        bottom.setLayout(bottomLayout)
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.active)
+        splitter.addWidget(bottom)
+        self.setWidget(splitter)
+        self.timer = QTimer(self)
+        self.timer.setInterval(refreshInterval)
+        self.timer.timeout.connect(self.updateActive)
+        jobBar.jobsChanged.connect(self.jobsChanged)
+        self.visibilityChanged.connect(self.jobsChanged)
+        self.loadHistory()
+
+    def jobsChanged(self):
+        if not self.isVisible():
+            self.timer.stop()
+            return
+        self.shown = self.jobBar.jobs() + self.jobBar.queued
+        self.active.setRowCount(len(self.shown))
+        for row, job in enumerate(self.shown):
+            self.active.setItem(row, 0, QTableWidgetItem(job.title()))
+            for column in range(1, 4):
+                self.active.setItem(row, column, QTableWidgetItem())
+            if job in self.jobBar.rates:
+                self.active.setCellWidget(row, 4, Sparkline(self.jobBar.rates[job]))
+            else:
+                self.active.removeCellWidget(row, 4)
+        if self.shown:
+            self.timer.start()
+        else:
+            self.timer.stop()
+        self.updateActive()
+        self.loadHistory()
+
+    def updateActive(self):
+        for row, job in enumerate(self.shown):
+            done, total = job.progress()
+            self.active.item(row, 1).setText(job.state)
+            if total:
+                self.active.item(row, 2).setText("%s%%" % min(100, int(done * 100 / total)))
+            rate = job.rate()
+            self.active.item(row, 3).setText(fileJobs.formatSize(rate) + "/s" if rate > 0 else "")
+            widget = self.active.cellWidget(row, 4)
+            if widget is not None:
+                widget.update()
+
+    def loadHistory(self):
+        if self.jobBar.history is None:
+            return
+        rows = self.jobBar.history.recent(historyRows)
+        self.history.setRowCount(len(rows))
+        for row, (finished, kind, title, state, files, size, seconds, rate, errors) in enumerate(rows):
+            if errors:
+                state = "%s, %s errors" % (state, errors)
+            values = [time.strftime("%Y-%m-%d %H:%M", time.localtime(finished)), title, state, str(files),
+                      fileJobs.formatSize(size), fileJobs.formatTime(seconds), fileJobs.formatSize(rate) + "/s"]
+            for column, value in enumerate(values):
+                self.history.setItem(row, column, QTableWidgetItem(value))
+
+    def clearHistory(self):
+        self.jobBar.history.clear()
+        self.loadHistory()
@@ -0,0 +1,198 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### batch rename dialog with a preview of the new names
+import os
+import re
+from PyQt5.QtCore import Qt, QSettings
+from PyQt5.QtWidgets import (QDialog, QGridLayout, QLabel, QLineEdit, QCheckBox, QComboBox, QSpinBox,
+                             QTableWidget, QTableWidgetItem, QDialogButtonBox, QHeaderView, QMessageBox,
+                             QAbstractItemView)
+from PyQt5.QtGui import QIcon, QColor
+import batchRename
+import undoJournal
+###################################################################
+problemColor = QColor("#cc0000")
+changedColor = QColor("#204a87")
+
+### 'undo last batch' takes back the last batch of the undo journal of the window
+### if it is a rename, the same one Ctrl+Z would take back
+class RenameDialog(QDialog):
+    def __init__(self, paths, parent=None, undo=None, pending=()):
+        super(RenameDialog, self).__init__(parent)
+        self.paths = paths
+        self.plan = []
+        self.moves = []
+        self.undo = undo
+        ### the batches the window is still taking back
+        self.pending = pending
+        ### (old, new) of the renames taken back here, the window updates its views
+        self.undone = []
+        self.setWindowTitle("rename %s Files" % len(paths))
+        self.setWindowIcon(QIcon.fromTheme("accessories-text-editor"))
+        self.resize(760, 520)
+        self.settings = QSettings("QFileManager", "QFileManager")
+
+        self.templateEdit = QLineEdit(self.settings.value("rename/template", "[N][E]"))
+        self.templateEdit.setToolTip("[N] name without extension\n[E] extension with the dot\n"
+                                     "[C] counter\n[P] parent folder name\n[D] date modified\n"
+                                     "[X] date taken (EXIF), date modified if there is none\n\n"
+                                     "for example: [X]_[C][E]")
+        self.findEdit = QLineEdit()
+        self.findEdit.setPlaceholderText("find")
+        self.replaceEdit = QLineEdit()
+        self.replaceEdit.setPlaceholderText("replace with")
+        self.regexBox = QCheckBox("regular expression")
+        self.regexBox.setToolTip("find is a Python regular expression,\nreplace may use \\1 for groups")
+        self.caseBox = QComboBox()
+        self.caseBox.addItems(batchRename.cases)
+        self.startBox = QSpinBox()
+        self.startBox.setRange(0, 999999)
+        self.startBox.setValue(1)
+        self.startBox.setPrefix("start ")
+        self.stepBox = QSpinBox()
+        self.stepBox.setRange(1, 1000)
+        self.stepBox.setPrefix("step ")
+        self.digitsBox = QSpinBox()
+        self.digitsBox.setRange(1, 10)
+        self.digitsBox.setValue(int(self.settings.value("rename/digits", 3)))
+        self.digitsBox.setPrefix("digits ")
+        self.dateEdit = QLineEdit(self.settings.value("rename/dateFormat", "%Y-%m-%d"))
+        self.dateEdit.setToolTip("date format for [D] and [X]\n%Y year %m month %d day\n%H hour %M minute %S second")
+
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Name", "new Name", "Problem"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionMode(QAbstractItemView.NoSelection)
+        self.table.setWordWrap(False)
+        self.summary = QLabel()
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.buttons.button(QDialogButtonBox.Ok).setText("rename")
+        self.undoBtn = self.buttons.addButton("undo last batch", QDialogButtonBox.ResetRole)
+        self.undoBtn.setEnabled(self.lastRename() is not None)
+        self.undoBtn.clicked.connect(self.undoLast)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+
+        layout = QGridLayout()
+        layout.addWidget(QLabel("Name"), 0, 0)
+        layout.addWidget(self.templateEdit, 0, 1, 1, 3)
+        layout.addWidget(QLabel("Replace"), 1, 0)
+        layout.addWidget(self.findEdit, 1, 1)
+        layout.addWidget(self.replaceEdit, 1, 2)
+        layout.addWidget(self.regexBox, 1, 3)
+        layout.addWidget(QLabel("Counter"), 2, 0)
+        layout.addWidget(self.startBox, 2, 1)
+        layout.addWidget(self.stepBox, 2, 2)
+        layout.addWidget(self.digitsBox, 2, 3)
+        layout.addWidget(QLabel("Case"), 3, 0)
+        layout.addWidget(self.caseBox, 3, 1)
+        layout.addWidget(QLabel("Date"), 3, 2, Qt.AlignRight)
+        layout.addWidget(self.dateEdit, 3, 3)
+        layout.addWidget(self.table, 4, 0, 1, 4)
+        layout.addWidget(self.summary, 5, 0, 1, 4)
+        layout.addWidget(self.buttons, 6, 0, 1, 4)
+        self.setLayout(layout)
+
+        for edit in (self.templateEdit, self.findEdit, self.replaceEdit, self.dateEdit):
+            edit.textChanged.connect(self.updatePreview)
+        for box in (self.startBox, self.stepBox, self.digitsBox):
+            box.valueChanged.connect(self.updatePreview)
+        self.regexBox.toggled.connect(self.updatePreview)
+        self.caseBox.currentIndexChanged.connect(self.updatePreview)
+        self.pattern = None
+        self.updatePreview()
+
+    def updatePreview(self):
+        okButton = self.buttons.button(QDialogButtonBox.Ok)
+        try:
+            pattern = batchRename.Pattern(self.templateEdit.text(), self.findEdit.text(), self.replaceEdit.text(),
+                                          self.regexBox.isChecked(), self.caseBox.currentText(),
+                                          self.startBox.value(), self.stepBox.value(), self.digitsBox.value(),
+                                          self.dateEdit.text())
+        except re.error as e:
+            self.summary.setText("find: %s" % e)
+            okButton.setEnabled(False)
+            return
+        ### EXIF dates are read once per dialog
+        if self.pattern is not None:
+            pattern.exifDates = self.pattern.exifDates
+        self.pattern = pattern
+        try:
+            names = [pattern.newName(path, number) for number, path in enumerate(self.paths)]
+        except (re.error, IndexError, ValueError) as e:
+            self.summary.setText("replace: %s" % e)
+            okButton.setEnabled(False)
+            return
+        self.plan = batchRename.check(self.paths, names)
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(self.plan))
+        changed = 0
+        problems = 0
+        for row, (source, target, problem) in enumerate(self.plan):
+            old = QTableWidgetItem(os.path.basename(source))
+            old.setToolTip(source)
+            new = QTableWidgetItem(os.path.basename(target))
+            note = QTableWidgetItem(problem)
+            if problem:
+                problems += 1
+                new.setForeground(problemColor)
+                note.setForeground(problemColor)
+            elif source != target:
+                changed += 1
+                new.setForeground(changedColor)
+            self.table.setItem(row, 0, old)
+            self.table.setItem(row, 1, new)
+            self.table.setItem(row, 2, note)
+        self.table.setUpdatesEnabled(True)
+        text = "%s of %s names change" % (changed, len(self.plan))
+        if problems:
+            text += ", %s problems" % problems
+        loops = batchRename.cycles(self.plan)
+        if loops:
+            text += ", %s names swap places" % sum(len(loop) for loop in loops)
+        self.summary.setText(text)
+        okButton.setEnabled(changed > 0 and problems == 0)
+
+    def accept(self):
+        try:
+            self.moves = batchRename.renameAll(self.plan)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "rename Files", "%s\n\nall names were set back" % e)
+            self.updatePreview()
+            return
+        self.settings.setValue("rename/template", self.templateEdit.text())
+        self.settings.setValue("rename/digits", self.digitsBox.value())
+        self.settings.setValue("rename/dateFormat", self.dateEdit.text())
+        super(RenameDialog, self).accept()
+
+    def lastRename(self):
+        if self.undo is None:
+            return None
+        batch = self.undo.last(self.pending)
+        return batch if batch is not None and batch[1] == "rename" else None
+
+    def undoLast(self):
+        batch = self.lastRename()
+        if batch is None:
+            return
+        batchId, kind, steps = batch
+        ### a failed batch was set back as it was, it stays in the journal
+        failed = undoJournal.undoNow(kind, steps)
+        if failed:
+            QMessageBox.warning(self, "undo last batch", "\n".join("%s: %s" % error for error in failed[:20]))
+            return
+        try:
+            self.undo.markUndone(batchId)
+        except OSError as e:
+            QMessageBox.warning(self, "undo last batch", str(e))
+        self.undone.extend(steps)
+        self.undoBtn.setEnabled(self.lastRename() is not None)
+        ### the files of this dialog may be among them, they get their old names here too
+        back = dict((new, old) for old, new in steps)
+        self.paths = [back.get(path, path) for path in self.paths]
+        self.paths = [path for path in self.paths if os.path.lexists(path)]
+        self.updatePreview()
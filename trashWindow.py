@@ -0,0 +1,298 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### the trash: items listed from their .trashinfo files, sizes read in the
+### background, restore and purge run as jobs on the job bar of the window
+import os
+import time
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QAbstractTableModel, QModelIndex, QSettings
+from PyQt5.QtWidgets import (QMainWindow, QTableView, QSpinBox, QAction, QMessageBox, QHeaderView,
+                             QAbstractItemView, QLabel)
+from PyQt5.QtGui import QIcon
+import xdgTrash
+import fileJobs
+###################################################################
+### info files read per fetchMore, the view asks for more while scrolling
+fetchSize = 256
+### sizes are sent to the window in batches
+batchInterval = 0.2
+gigabyte = 1073741824
+
+class SizeThread(QThread):
+    sized = pyqtSignal(list)
+
+    def __init__(self):
+        super(SizeThread, self).__init__()
+        self.stopped = False
+        self.items = 0
+        self.total = 0
+
+    def stop(self):
+        self.stopped = True
+
+    def run(self):
+        batch = []
+        last = time.time()
+        for trash in xdgTrash.trashes():
+            for name in xdgTrash.names(trash):
+                if self.stopped:
+                    return
+                size = xdgTrash.itemSize(trash, name)
+                self.items += 1
+                self.total += size
+                batch.append((trash, name, size))
+                if time.time() - last > batchInterval:
+                    self.sized.emit(batch)
+                    batch = []
+                    last = time.time()
+        self.sized.emit(batch)
+
+class TrashModel(QAbstractTableModel):
+    def __init__(self):
+        super(TrashModel, self).__init__()
+        self.headers = ["Name", "Original Location", "Deleted", "Size"]
+        ### (trash, name, original path, deletion time)
+        self.items = []
+        self.rowOf = {}
+        self.sizes = {}
+        self.pending = None
+        self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        self.items = []
+        self.rowOf = {}
+        self.sizes = {}
+        self.pending = ((trash, name) for trash in xdgTrash.trashes() for name in xdgTrash.names(trash))
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.pending is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.pending is None:
+            return
+        batch = []
+        for trash, name in self.pending:
+            path, when = xdgTrash.readInfo(trash, name)
+            batch.append((trash, name, path, when))
+            if len(batch) == fetchSize:
+                break
+        else:
+            self.pending = None
+        if not batch:
+            return
+        first = len(self.items)
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        for row, item in enumerate(batch, first):
+            self.rowOf[item[:2]] = row
+        self.items.extend(batch)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.items)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        trash, name, path, when = self.items[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return name if path is None else os.path.basename(path)
+            elif column == 1:
+                return "unknown" if path is None else os.path.dirname(path)
+            elif column == 2:
+                return "" if when is None else time.strftime("%Y-%m-%d %H:%M", time.localtime(when))
+            size = self.sizes.get((trash, name))
+            return "" if size is None else fileJobs.formatSize(size)
+        elif role == Qt.ToolTipRole:
+            return os.path.join(trash, "files", name)
+        elif role == Qt.TextAlignmentRole and column == 3:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    def addSizes(self, batch):
+        rows = []
+        for trash, name, size in batch:
+            self.sizes[(trash, name)] = size
+            row = self.rowOf.get((trash, name))
+            if row is not None:
+                rows.append(row)
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), 3), self.index(max(rows), 3))
+
+class TrashWindow(QMainWindow):
+    def __init__(self, jobBar, parent=None):
+        super(TrashWindow, self).__init__(parent)
+        self.jobBar = jobBar
+        self.sizeThread = None
+        ### stopped threads finish the item they are reading
+        self.oldThreads = []
+        self.setGeometry(0, 0, 800, 450)
+        self.setMinimumSize(500, 300)
+        self.setWindowIcon(QIcon.fromTheme("user-trash"))
+        self.setWindowTitle("Trash")
+        self.settings = QSettings("QFileManager", "QFileManager")
+
+        self.tb = self.addToolBar("Trash")
+        self.tb.setMovable(False)
+        self.tb.setContextMenuPolicy(Qt.PreventContextMenu)
+        self.restoreAct = QAction(QIcon.fromTheme("edit-undo"), "restore", self,
+                                  statusTip="move the selected items back where they were",
+                                  triggered=self.restoreItems)
+        self.tb.addAction(self.restoreAct)
+        self.deleteAct = QAction(QIcon.fromTheme("edit-delete"), "delete", self,
+                                 statusTip="delete the selected items for good",
+                                 triggered=self.deleteItems)
+        self.tb.addAction(self.deleteAct)
+        self.emptyAct = QAction(QIcon.fromTheme("trash-empty"), "empty trash", self,
+                                statusTip="delete everything in the trash for good",
+                                triggered=self.emptyTrash)
+        self.tb.addAction(self.emptyAct)
+        self.tb.addSeparator()
+        self.ageBox = QSpinBox()
+        self.ageBox.setRange(0, 3650)
+        self.ageBox.setSpecialValueText("any age")
+        self.ageBox.setPrefix("older than ")
+        self.ageBox.setSuffix(" days")
+        self.ageBox.setValue(int(self.settings.value("trash/maxDays", 30)))
+        self.tb.addWidget(self.ageBox)
+        self.budgetBox = QSpinBox()
+        self.budgetBox.setRange(0, 100000)
+        self.budgetBox.setSpecialValueText("any size")
+        self.budgetBox.setPrefix("keep ")
+        self.budgetBox.setSuffix(" GB")
+        self.budgetBox.setToolTip("the oldest items go until the trash is smaller")
+        self.budgetBox.setValue(int(self.settings.value("trash/budget", 0)))
+        self.tb.addWidget(self.budgetBox)
+        self.purgeAct = QAction(QIcon.fromTheme("edit-clear"), "purge", self,
+                                statusTip="delete the items older than that and the oldest over the size",
+                                triggered=self.purge)
+        self.tb.addAction(self.purgeAct)
+        self.tb.addSeparator()
+        self.reloadAct = QAction(QIcon.fromTheme("view-refresh"), "reload", self,
+                                 statusTip="read the trash again", triggered=self.reload)
+        self.tb.addAction(self.reloadAct)
+
+        self.model = TrashModel()
+        self.lb = QTableView()
+        self.lb.setModel(self.model)
+        self.lb.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.lb.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.lb.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.lb.setAlternatingRowColors(True)
+        self.lb.setWordWrap(False)
+        self.lb.setColumnWidth(0, 250)
+        self.lb.setColumnWidth(1, 300)
+        self.lb.horizontalHeader().setStretchLastSection(True)
+        self.lb.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.lb.verticalHeader().setDefaultSectionSize(24)
+        self.lb.verticalHeader().hide()
+        self.setCentralWidget(self.lb)
+        self.totalLabel = QLabel()
+        self.statusBar().addPermanentWidget(self.totalLabel)
+        self.jobBar.jobFinished.connect(self.jobFinished)
+        self.startSizes()
+
+    def startSizes(self):
+        if self.sizeThread is not None:
+            self.sizeThread.stop()
+            self.oldThreads = [thread for thread in self.oldThreads if thread.isRunning()] + [self.sizeThread]
+        self.sizeThread = SizeThread()
+        self.sizeThread.sized.connect(self.addSizes)
+        self.sizeThread.finished.connect(self.showTotal)
+        self.totalLabel.setText("reading sizes ...")
+        self.sizeThread.start()
+
+    def addSizes(self, batch):
+        if not self.sender() is self.sizeThread:
+            return
+        self.model.addSizes(batch)
+        self.totalLabel.setText("%s items, %s so far" % (self.sizeThread.items,
+                                                        fileJobs.formatSize(self.sizeThread.total)))
+
+    def showTotal(self):
+        if not self.sender() is self.sizeThread:
+            return
+        self.totalLabel.setText("%s items, %s" % (self.sizeThread.items, fileJobs.formatSize(self.sizeThread.total)))
+
+    def reload(self):
+        self.model.reload()
+        self.startSizes()
+
+    def selectedItems(self):
+        rows = sorted(index.row() for index in self.lb.selectionModel().selectedRows())
+        return [self.model.items[row] for row in rows]
+
+    def restoreItems(self):
+        items = [(trash, name, path) for trash, name, path, when in self.selectedItems() if path is not None]
+        if not items:
+            self.statusBar().showMessage("nothing to restore", 0)
+            return
+        job = fileJobs.RestoreJob(items)
+        self.statusBar().showMessage(job.title(), 0)
+        self.jobBar.submit(job)
+
+    def deleteItems(self):
+        items = [(trash, name) for trash, name, path, when in self.selectedItems()]
+        if not items:
+            return
+        msg = QMessageBox.question(self, "Info", "Caution!\nReally delete %s items for good?" % len(items),
+                                   QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if msg == QMessageBox.Yes:
+            self.submit(fileJobs.PurgeJob(items))
+
+    def emptyTrash(self):
+        msg = QMessageBox.question(self, "Info", "Caution!\nReally delete everything in the trash for good?",
+                                   QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if msg == QMessageBox.Yes:
+            self.submit(fileJobs.PurgeJob(maxAge=0))
+
+    def purge(self):
+        days = self.ageBox.value()
+        budget = self.budgetBox.value()
+        if not days and not budget:
+            self.statusBar().showMessage("set an age or a size to purge", 0)
+            return
+        self.settings.setValue("trash/maxDays", days)
+        self.settings.setValue("trash/budget", budget)
+        self.submit(fileJobs.PurgeJob(maxAge=days * 86400 if days else None,
+                                      budget=budget * gigabyte if budget else None))
+
+    def submit(self, job):
+        self.statusBar().showMessage(job.title(), 0)
+        self.jobBar.submit(job)
+
+    def jobFinished(self, job):
+        if not job.kind in ("trash", "restore", "purge") or not self.isVisible():
+            return
+        if job.kind == "restore":
+            message = "restored %s items" % len(job.restored)
+        elif job.kind == "purge":
+            message = "deleted %s items for good" % job.purged
+        else:
+            message = "moved %s items to the trash" % len(job.trashed)
+        if job.errors:
+            message += ", %s errors" % len(job.errors)
+        self.statusBar().showMessage(message, 0)
+        self.reload()
+
+    def closeEvent(self, event):
+        for thread in self.oldThreads + [self.sizeThread]:
+            if thread is not None:
+                thread.stop()
+                thread.wait()
+        self.oldThreads = []
+        self.settings.setValue("trash/maxDays", self.ageBox.value())
+        self.settings.setValue("trash/budget", self.budgetBox.value())
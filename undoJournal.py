@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### what the file managers did, to take it back with Ctrl+Z (no Qt in here)
+### one JSON line per batch, however many files it has, appended and synced
+### once; undoing a batch appends a line that marks it undone
+###   copy    [(target, size, mtime)]    the copies go to the trash, unless changed since
+###   move    [(source, target)]         moved back
+###   rename  [(old, new)]               renamed back
+###   mkdir   [path]                     removed if still empty
+###   trash   [(source, trash, name)]    restored
+import os
+import json
+import time
+import fileJobs
+import batchRename
+###################################################################
+journalName = "undo.journal"
+### the journal is rewritten with the newest batches when it gets bigger
+maxBytes = 16 * 1048576
+keepBatches = 50
+kinds = ["copy", "move", "rename", "mkdir", "trash"]
+
+class UndoJournal(object):
+    def __init__(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, journalName)
+        self.lastId = 0
+        try:
+            if os.path.getsize(self.path) > maxBytes:
+                self.compact()
+        except OSError:
+            pass
+
+    def append(self, record):
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with open(self.path, "a", encoding="utf-8", errors="surrogateescape") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    ### returns the id of the batch, None for an empty one
+    def record(self, kind, steps):
+        if not steps:
+            return None
+        self.lastId = max(self.lastId + 1, int(time.time() * 1000000))
+        self.append({"id": self.lastId, "kind": kind, "time": time.time(), "steps": steps})
+        return self.lastId
+
+    def markUndone(self, batchId):
+        self.append({"undone": batchId})
+
+    ### (id, kind, steps) of the batches that are not undone, oldest first
+    def batches(self):
+        found = []
+        undone = set()
+        try:
+            f = open(self.path, encoding="utf-8", errors="surrogateescape")
+        except FileNotFoundError:
+            return found
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    ### cut by a crash while writing
+                    continue
+                if "undone" in record:
+                    undone.add(record["undone"])
+                elif record.get("kind") in kinds:
+                    found.append((record["id"], record["kind"], record["steps"]))
+        return [batch for batch in found if not batch[0] in undone]
+
+    ### the newest batch, batches whose undo is still running are passed over
+    def last(self, pending=()):
+        found = [batch for batch in self.batches() if not batch[0] in pending]
+        return found[-1] if found else None
+
+    def compact(self):
+        found = self.batches()[-keepBatches:]
+        temp = self.path + ".new"
+        with open(temp, "w", encoding="utf-8", errors="surrogateescape") as f:
+            for batchId, kind, steps in found:
+                f.write(json.dumps({"id": batchId, "kind": kind, "steps": steps},
+                                   separators=(",", ":"), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+
+###################################################################
+### a copy that was changed after it was made is left alone, folders only
+### by their mtime. batches from before the sizes were kept count as unchanged
+def changedSince(step):
+    if isinstance(step, str):
+        return False
+    target, size, mtime = step
+    try:
+        st = os.lstat(target)
+    except OSError:
+        return False
+    return st.st_mtime != mtime or size is not None and st.st_size != size
+
+### the copies an undo leaves where they are
+def keptCopies(steps):
+    return [step[0] for step in steps if changedSince(step)]
+
+### copies, moves and the trash go back through jobs on the job bar
+def undoJobs(kind, steps):
+    if kind == "copy":
+        targets = [step if isinstance(step, str) else step[0] for step in steps if not changedSince(step)]
+        ### the ones removed since are gone already
+        targets = [target for target in targets if os.path.lexists(target)]
+        jobs = [fileJobs.TrashJob(targets)] if targets else []
+    elif kind == "trash":
+        jobs = [fileJobs.RestoreJob([(trash, name, source) for source, trash, name in steps])]
+    elif kind == "move":
+        ### a job moves into one folder, the sources may come from several
+        ### a target may have been given a new name by keepBoth, it goes back under the old one
+        folders = {}
+        for source, target in steps:
+            folders.setdefault(os.path.dirname(source), []).append((target, os.path.basename(source)))
+        jobs = [fileJobs.Job([target for target, name in items], folder, move=True, policy="skip",
+                             names=[name for target, name in items]) for folder, items in folders.items()]
+    else:
+        jobs = []
+    for job in jobs:
+        job.undoing = True
+    return jobs
+
+### renames and new folders are quick, returns [(path, error)]
+def undoNow(kind, steps):
+    failed = []
+    if kind == "rename":
+        ### the batch may have swapped names, back in two steps like it was done
+        try:
+            batchRename.renameAll([(new, old, "") for old, new in steps])
+        except OSError as e:
+            failed.append((e.filename or "", e.strerror or str(e)))
+    elif kind == "mkdir":
+        for path in reversed(steps):
+            try:
+                os.rmdir(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                failed.append((path, e.strerror or str(e)))
+    return failed
+
+def describe(kind, steps):
+    what = {"copy": "copy of", "move": "move of", "rename": "rename of", "mkdir": "new folder",
+            "trash": "trashing of"}[kind]
+    if len(steps) == 1:
+        step = steps[0]
+        path = step if isinstance(step, str) else step[0]
+        return "%s %s" % (what, os.path.basename(path))
+    return "%s %s items" % (what, len(steps))
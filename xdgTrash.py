@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### the freedesktop.org trash for the file managers (no Qt in here)
+### files on the home device go to ~/.local/share/Trash, files on other
+### mounts to $topdir/.Trash/$uid or $topdir/.Trash-$uid of that mount,
+### so trashing is a rename and a small .trashinfo file.
+### items are (trash folder, name), the name is the same in files/ and info/
+import os
+import stat
+import time
+import errno
+import shutil
+from urllib.parse import quote, unquote_to_bytes
+###################################################################
+infoSuffix = ".trashinfo"
+dateFormat = "%Y-%m-%dT%H:%M:%S"
+
+def homeTrash():
+    data = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(data, "Trash")
+
+### the folder on the same filesystem that holds path
+def mountPoint(path):
+    path = os.path.realpath(path)
+    dev = os.lstat(path).st_dev
+    while path != "/":
+        parent = os.path.dirname(path)
+        if os.lstat(parent).st_dev != dev:
+            break
+        path = parent
+    return path
+
+### a trash somebody else could read or swap for a symlink is not used
+def makeTrash(trash):
+    os.makedirs(trash, mode=0o700, exist_ok=True)
+    st = os.lstat(trash)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(13, "not a trash of this user", trash)
+    for sub in ("files", "info"):
+        os.makedirs(os.path.join(trash, sub), mode=0o700, exist_ok=True)
+    return trash
+
+### an admin made $topdir/.Trash sticky and not a symlink, users get a folder in it
+def sharedTrash(topdir):
+    shared = os.path.join(topdir, ".Trash")
+    try:
+        st = os.lstat(shared)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode) or not st.st_mode & stat.S_ISVTX:
+        return None
+    try:
+        return makeTrash(os.path.join(shared, str(os.getuid())))
+    except OSError:
+        return None
+
+### (trash folder, topdir) for path, topdir None for the home trash.
+### the home trash is used too if the mount has none and none can be made
+def trashFor(path):
+    home = homeTrash()
+    makeTrash(home)
+    try:
+        dev = os.lstat(path).st_dev
+    except OSError:
+        return home, None
+    if os.stat(home).st_dev == dev:
+        return home, None
+    topdir = mountPoint(os.path.dirname(os.path.abspath(path)))
+    trash = sharedTrash(topdir)
+    if trash is None:
+        try:
+            trash = makeTrash(os.path.join(topdir, ".Trash-%d" % os.getuid()))
+        except OSError:
+            return home, None
+    if os.stat(trash).st_dev != dev:
+        return home, None
+    return trash, topdir
+
+def infoText(path, topdir=None, when=None):
+    if topdir is not None:
+        ### topdir is a real path, the folder of path may be reached through a symlink
+        path = os.path.join(os.path.realpath(os.path.dirname(path)), os.path.basename(path))
+        path = os.path.relpath(path, topdir)
+    return "[Trash Info]\nPath=%s\nDeletionDate=%s\n" % (
+           quote(os.fsencode(path), safe="/"), time.strftime(dateFormat, time.localtime(when)))
+
+### creating the info file with O_EXCL reserves the name in files/ too,
+### returns the name used in both folders
+def reserve(trash, path, text):
+    base = os.path.basename(path.rstrip("/")) or "root"
+    stem, ext = os.path.splitext(base)
+    number = 1
+    name = base
+    while True:
+        try:
+            fd = os.open(os.path.join(trash, "info", name + infoSuffix),
+                         os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            number += 1
+            name = "%s.%d%s" % (stem, number, ext)
+            continue
+        if os.path.lexists(os.path.join(trash, "files", name)):
+            os.close(fd)
+            os.remove(os.path.join(trash, "info", name + infoSuffix))
+            number += 1
+            name = "%s.%d%s" % (stem, number, ext)
+            continue
+        try:
+            os.write(fd, text.encode("utf-8"))
+            ### the contents, syncInfo makes the names durable
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return name
+
+def release(trash, name):
+    try:
+        os.remove(os.path.join(trash, "info", name + infoSuffix))
+    except OSError:
+        pass
+
+### the names of the info files of a batch reach the disk together, before the renames
+def syncInfo(trash):
+    try:
+        fd = os.open(os.path.join(trash, "info"), os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+###################################################################
+### every trash of this user that exists now, the home trash first
+def trashes():
+    found = []
+    home = homeTrash()
+    if os.path.isdir(os.path.join(home, "info")):
+        found.append(home)
+    uid = os.getuid()
+    try:
+        with open("/proc/self/mounts") as f:
+            topdirs = [line.split()[1].replace("\\040", " ") for line in f]
+    except OSError:
+        topdirs = []
+    seen = set(os.path.realpath(trash) for trash in found)
+    for topdir in topdirs:
+        for trash in (os.path.join(topdir, ".Trash", str(uid)), os.path.join(topdir, ".Trash-%d" % uid)):
+            try:
+                if not os.path.isdir(os.path.join(trash, "info")) or os.path.realpath(trash) in seen:
+                    continue
+            except OSError:
+                continue
+            seen.add(os.path.realpath(trash))
+            found.append(trash)
+    return found
+
+### the folder the paths of a per-mount trash are relative to, None for the home trash
+def topdirOf(trash):
+    trash = trash.rstrip("/")
+    if trash == homeTrash().rstrip("/"):
+        return None
+    parent = os.path.dirname(trash)
+    if os.path.basename(parent) == ".Trash":
+        return os.path.dirname(parent)
+    return parent
+
+### names of the items of a trash, the ones with an info file
+def names(trash):
+    try:
+        with os.scandir(os.path.join(trash, "info")) as it:
+            for entry in it:
+                if entry.name.endswith(infoSuffix):
+                    yield entry.name[:-len(infoSuffix)]
+    except OSError:
+        return
+
+### (original path, deletion time), None for what is missing or unreadable
+def readInfo(trash, name):
+    path = None
+    when = None
+    try:
+        with open(os.path.join(trash, "info", name + infoSuffix), "rb") as f:
+            for line in f:
+                key, sep, value = line.strip().partition(b"=")
+                if key == b"Path" and path is None:
+                    path = os.fsdecode(unquote_to_bytes(value))
+                elif key == b"DeletionDate" and when is None:
+                    try:
+                        when = time.mktime(time.strptime(value.decode("ascii"), dateFormat))
+                    except (ValueError, UnicodeDecodeError):
+                        pass
+    except OSError:
+        return None, None
+    if path is not None and not os.path.isabs(path):
+        topdir = topdirOf(trash)
+        path = os.path.join(topdir, path) if topdir is not None else None
+    return path, when
+
+### bytes on disk of a trashed file or tree
+def itemSize(trash, name):
+    path = os.path.join(trash, "files", name)
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return 0
+    size = st.st_blocks * 512
+    if not stat.S_ISDIR(st.st_mode):
+        return size
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        size += entry.stat(follow_symlinks=False).st_blocks * 512
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return size
+
+### back to where it was, nothing there is overwritten
+def restore(trash, name, path):
+    source = os.path.join(trash, "files", name)
+    if os.path.lexists(path):
+        raise FileExistsError(errno.EEXIST, "exists already", path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.rename(source, path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(source, path)
+    release(trash, name)
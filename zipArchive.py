@@ -0,0 +1,334 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+### zip archives made on all cores (no Qt in here)
+### every file is cut into chunks that are deflated on a worker pool, each
+### chunk primed with the end of the one before, like pigz does, so the
+### pieces make one deflate stream. the job thread reads the files, keeps
+### the CRC and writes the pieces in order, entries and the central
+### directory come from a small writer of our own with zip64 where needed
+import os
+import stat
+import time
+import zlib
+import errno
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+import fileJobs
+###################################################################
+chunkSize = 1048576
+level = 6
+### deflate looks back this far, the next chunk gets it as dictionary
+window = 32768
+### chunks deflated or waiting to be written, per worker
+aheadPerWorker = 4
+### smaller files are deflated right away, handing them to a worker costs more
+inlineSize = 16384
+workers = os.cpu_count() or 1
+
+zip64Limit = 0xFFFFFFFF
+### files this big get zip64 sizes, deflate can make data a little bigger
+zip64Size = 0xF0000000
+versionNeeded = 20
+versionZip64 = 45
+madeByUnix = 3 << 8
+flagDescriptor = 0x08
+flagUtf8 = 0x800
+stored = 0
+deflated = 8
+
+def dosTime(mtime):
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+### all but the last chunk end on a byte with a sync flush, the pieces join
+def deflate(data, prime, last):
+    if prime:
+        c = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=prime)
+    else:
+        c = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return c.compress(data) + c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+def encodeName(name):
+    try:
+        return name.encode("ascii"), 0
+    except UnicodeEncodeError:
+        pass
+    try:
+        return name.encode("utf-8"), flagUtf8
+    except UnicodeEncodeError:
+        ### bytes that were no UTF-8 on disk either
+        return name.encode("utf-8", "surrogateescape"), 0
+
+class ZipWriter(object):
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+        ### [name, flags, method, time, date, crc, csize, usize, offset, attributes, zip64]
+        self.entries = []
+
+    def write(self, data):
+        self.f.write(data)
+        self.offset += len(data)
+
+    ### without crc and sizes they follow the data in a descriptor
+    def begin(self, name, st, method, crc=None, csize=0, usize=0, zip64=False):
+        raw, flags = encodeName(name)
+        modTime, modDate = dosTime(st.st_mtime)
+        attributes = (st.st_mode & 0xFFFF) << 16
+        if stat.S_ISDIR(st.st_mode):
+            attributes |= 0x10
+        extra = b""
+        if crc is None:
+            flags |= flagDescriptor
+            headerCrc, headerCsize, headerUsize = 0, 0, 0
+            if zip64:
+                extra = struct.pack("<HHQQ", 1, 16, 0, 0)
+                headerCsize = headerUsize = zip64Limit
+        else:
+            headerCrc, headerCsize, headerUsize = crc, csize, usize
+        entry = [raw, flags, method, modTime, modDate, crc or 0, csize, usize, self.offset, attributes, zip64]
+        self.write(struct.pack("<LHHHHHLLLHH", 0x04034b50, versionZip64 if zip64 else versionNeeded, flags,
+                               method, modTime, modDate, headerCrc, headerCsize, headerUsize,
+                               len(raw), len(extra)) + raw + extra)
+        self.entries.append(entry)
+        return entry
+
+    def end(self, entry, crc, csize, usize):
+        entry[5:8] = [crc, csize, usize]
+        if entry[10]:
+            self.write(struct.pack("<LLQQ", 0x08074b50, crc, csize, usize))
+        elif csize > zip64Limit or usize > zip64Limit:
+            raise OSError(errno.EFBIG, "the file grew while zipping", entry[0].decode("utf-8", "replace"))
+        else:
+            self.write(struct.pack("<LLLL", 0x08074b50, crc, csize, usize))
+
+    def finish(self):
+        start = self.offset
+        for raw, flags, method, modTime, modDate, crc, csize, usize, offset, attributes, zip64 in self.entries:
+            extra = []
+            if csize > zip64Limit or usize > zip64Limit:
+                extra += [usize, csize]
+                csize = usize = zip64Limit
+            if offset > zip64Limit:
+                extra.append(offset)
+                offset = zip64Limit
+            extra = struct.pack("<HH%dQ" % len(extra), 1, 8 * len(extra), *extra) if extra else b""
+            version = versionZip64 if extra or zip64 else versionNeeded
+            self.write(struct.pack("<LHHHHHHLLLHHHHHLL", 0x02014b50, madeByUnix | version, version, flags,
+                                   method, modTime, modDate, crc, csize, usize, len(raw), len(extra), 0, 0,
+                                   0, attributes, offset) + raw + extra)
+        size = self.offset - start
+        count = len(self.entries)
+        if count > 0xFFFF or start > zip64Limit or size > zip64Limit:
+            end64 = self.offset
+            self.write(struct.pack("<LQHHLLQQQQ", 0x06064b50, 44, madeByUnix | versionZip64, versionZip64,
+                                   0, 0, count, count, size, start))
+            self.write(struct.pack("<LLQL", 0x07064b50, 0, end64, 1))
+        self.write(struct.pack("<LHHHHLLH", 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                               min(size, zip64Limit), min(start, zip64Limit), 0))
+
+###################################################################
+### sources below base go into target, their names relative to base
+class ZipJob(fileJobs.BaseJob):
+    kind = "zip"
+
+    def __init__(self, sources, target, base):
+        super(ZipJob, self).__init__(sources, os.path.dirname(os.path.abspath(target)))
+        self.target = os.path.abspath(target)
+        self.base = os.path.abspath(base)
+        ### bytes written to the archive
+        self.outputBytes = 0
+
+    def title(self):
+        if len(self.sources) == 1:
+            name = os.path.basename(self.sources[0])
+        else:
+            name = "%s items" % len(self.sources)
+        return "zipping %s to %s" % (name, os.path.basename(self.target))
+
+    def run(self):
+        self.state = "running"
+        self.started = time.time()
+        part = None
+        try:
+            ### a temp file of our own next to the target, renamed over it when complete
+            while part is None:
+                name = fileJobs.tempName(self.target)
+                try:
+                    f = open(name, "xb")
+                except FileExistsError:
+                    continue
+                part = name
+            with f:
+                members = self.scan(part)
+                self.lanes = workers
+                with ThreadPoolExecutor(self.lanes) as pool:
+                    writer = ZipWriter(f)
+                    self.writeMembers(writer, pool, members)
+                    writer.finish()
+                    self.outputBytes = writer.offset
+            os.replace(part, self.target)
+            self.state = "failed" if self.errors else "done"
+        except fileJobs.JobCancelled:
+            self.state = "cancelled"
+            self.removePart(part)
+        except Exception as e:
+            self.error(self.target, e)
+            self.state = "failed"
+            self.removePart(part)
+        self.current = ""
+        self.finished = time.time()
+
+    def removePart(self, part):
+        if part is None:
+            return
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+
+    ### (path, name in the archive, stat), folders before what is in them
+    def scan(self, part):
+        members = []
+        skip = set([part, self.target])
+        for source in self.sources:
+            self.checkpoint()
+            stack = [(source, os.path.relpath(source, self.base))]
+            while stack:
+                path, name = stack.pop()
+                if path in skip:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError as e:
+                    self.error(path, e)
+                    continue
+                if stat.S_ISDIR(st.st_mode):
+                    if name != ".":
+                        members.append((path, name + "/", st))
+                    ### a symlink to a folder is kept as an empty folder
+                    if os.path.islink(path):
+                        continue
+                    self.current = path
+                    try:
+                        names = sorted(os.listdir(path), reverse=True)
+                    except OSError as e:
+                        self.error(path, e)
+                        continue
+                    prefix = "" if name == "." else name + "/"
+                    stack.extend((os.path.join(path, entry), prefix + entry) for entry in names)
+                elif stat.S_ISREG(st.st_mode):
+                    members.append((path, name, st))
+                    self.totalBytes += st.st_size
+        self.totalFiles = len(members)
+        self.totalData = self.totalBytes
+        return members
+
+    def writeMembers(self, writer, pool, members):
+        self.queue = deque()
+        self.ahead = 0
+        limit = self.lanes * aheadPerWorker
+        for path, name, st in members:
+            self.checkpoint()
+            item = Pending(path, name, st)
+            if name.endswith("/"):
+                item.complete = True
+                self.queue.append(item)
+                continue
+            try:
+                f = open(path, "rb")
+            except OSError as e:
+                self.error(path, e)
+                with self.lock:
+                    self.totalBytes -= st.st_size
+                    self.totalData -= st.st_size
+                    self.totalFiles -= 1
+                continue
+            self.current = path
+            self.queue.append(item)
+            with f:
+                prime = b""
+                data = f.read(chunkSize)
+                while True:
+                    self.checkpoint()
+                    following = f.read(chunkSize) if len(data) == chunkSize else b""
+                    last = not following
+                    item.crc = zlib.crc32(data, item.crc)
+                    item.size += len(data)
+                    if last and len(data) < inlineSize:
+                        future = Future()
+                        future.set_result(deflate(data, prime, last))
+                    else:
+                        future = pool.submit(deflate, data, prime, last)
+                    item.chunks.append((future, data))
+                    self.ahead += 1
+                    prime = data[-window:]
+                    item.complete = last
+                    self.writeReady(writer, limit)
+                    if last:
+                        break
+                    data = following
+        self.writeReady(writer, 0)
+
+    ### writes from the front of the queue, waits for the workers only
+    ### while more than limit chunks are ahead
+    def writeReady(self, writer, limit):
+        while self.queue:
+            item = self.queue[0]
+            if item.entry is None:
+                if item.name.endswith("/"):
+                    writer.begin(item.name, item.st, stored, 0, 0, 0)
+                elif item.complete and len(item.chunks) == 1:
+                    ### a file of one chunk gets its sizes in the header, stored if deflate did not help
+                    future, data = item.chunks[0]
+                    if self.ahead <= limit and not future.done():
+                        return
+                    packed = future.result()
+                    self.ahead -= 1
+                    if len(packed) < item.size:
+                        writer.begin(item.name, item.st, deflated, item.crc, len(packed), item.size)
+                        writer.write(packed)
+                    else:
+                        writer.begin(item.name, item.st, stored, item.crc, item.size, item.size)
+                        writer.write(data)
+                    self.addBytes(item.size)
+                else:
+                    if len(item.chunks) < 2 or self.ahead <= limit and not item.chunks[0][0].done():
+                        return
+                    item.entry = writer.begin(item.name, item.st, deflated, zip64=item.st.st_size >= zip64Size)
+                if item.entry is None:
+                    self.doneFiles += 1
+                    self.queue.popleft()
+                    continue
+            while item.chunks and (self.ahead > limit or item.chunks[0][0].done()):
+                future, data = item.chunks.popleft()
+                packed = future.result()
+                writer.write(packed)
+                item.written += len(packed)
+                self.ahead -= 1
+                self.addBytes(len(data))
+            if item.chunks or not item.complete:
+                return
+            writer.end(item.entry, item.crc, item.written, item.size)
+            self.doneFiles += 1
+            self.queue.popleft()
+
+### a member on its way into the archive
+class Pending(object):
+    def __init__(self, path, name, st):
+        self.path = path
+        self.name = name
+        self.st = st
+        ### (future of the deflated chunk, the chunk)
+        self.chunks = deque()
+        self.crc = 0
+        self.size = 0
+        self.written = 0
+        self.complete = False
+        ### set once the header is written, the rest follows as it comes
+        self.entry = None